@@ -1,8 +1,11 @@
-from fastapi import Depends, HTTPException, status
+from datetime import date, timedelta
+from typing import Optional, Tuple
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
 from app.core.config import settings
+from app.core.security import STREAM_TICKET_SCOPE
 from app.db.firestore import get_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/users/login")
@@ -11,6 +14,26 @@ def get_current_user(
     token: str = Depends(oauth2_scheme),
     db = Depends(get_db)
 ):
+    return _get_user_for_token(token, db)
+
+def get_current_user_from_stream_ticket(
+    ticket: str = Query(..., description="Stream ticket from POST /market/stream/ticket (EventSource cannot send headers)"),
+    db = Depends(get_db)
+):
+    """
+    Authenticates long-lived streaming connections once, from a short-lived
+    ?ticket= parameter. Access tokens are not accepted in the query string.
+    """
+    return _get_user_for_token(ticket, db, scope=STREAM_TICKET_SCOPE)
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
+    """
+    Validates the token without reading the user document, for endpoints
+    that only need the caller's id (e.g. cached leaderboards).
+    """
+    return _get_user_id_for_token(token)
+
+def _get_user_id_for_token(token: str, scope: Optional[str] = None) -> str:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -24,10 +47,21 @@ def get_current_user(
         if user_id is None:
             print("DEBUG: User ID is None")
             raise credentials_exception
+        # Stream tickets open the stream only, and only stream tickets do
+        if payload.get("scope") != scope:
+            raise credentials_exception
     except (JWTError, ValidationError) as e:
         print(f"DEBUG: JWT Error: {e}")
         raise credentials_exception
-        
+    return user_id
+
+def _get_user_for_token(token: str, db, scope: Optional[str] = None):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user_id = _get_user_id_for_token(token, scope)
     user_ref = db.collection("users").document(user_id)
     user_doc = user_ref.get()
     
@@ -35,3 +69,15 @@ def get_current_user(
         raise credentials_exception
         
     return user_doc.to_dict()
+
+def get_date_range(
+    start: Optional[date] = Query(None, description="First day (default: 90 days before end)"),
+    end: Optional[date] = Query(None, description="Last day (default: today)")
+) -> Tuple[date, date]:
+    end = end or date.today()
+    start = start or end - timedelta(days=90)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+    if (end - start).days > 3660:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Range must be at most 10 years")
+    return start, end
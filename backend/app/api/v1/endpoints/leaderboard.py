@@ -1,32 +1,148 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from app.api import deps
-from app.services.evaluation import update_all_portfolios_total_value, generate_leaderboards
-from app.models.leaderboard import Leaderboard
-from typing import List
+from app.core.config import settings
+from app.services import leaderboards
+from app.services.evaluation import BOARDS
+from app.services.evaluation_jobs import evaluation_jobs
+from app.services.performance import portfolio_performance
+from app.models.job import EvaluationJob
+from app.models.leaderboard import Leaderboard, LeaderboardChanges, LeaderboardStanding
+from app.models.snapshot import PerformanceRanking
+from datetime import date
+from typing import Optional, Tuple
+
+# PPG windows, then risk-adjusted leaderboards such as sharpe_90d
+WINDOWS = BOARDS
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
 
 router = APIRouter()
 
-@router.post("/admin/evaluate", status_code=200)
+@router.post("/admin/evaluate", status_code=202, response_model=EvaluationJob)
 async def trigger_evaluation(
     db = Depends(deps.get_db),
     current_user: dict = Depends(deps.get_current_user)
 ):
+    """
+    Starts revaluing all portfolios and rebuilding the leaderboards in the
+    background. While a run is active, its job is returned instead.
+    Poll GET /admin/jobs/{job_id} for progress.
+    """
+    # In real app, check for admin role here
+    job, _ = evaluation_jobs.submit(db)
+    return job
+
+@router.get("/admin/jobs/{job_id}", response_model=EvaluationJob)
+def get_evaluation_job(
+    job_id: str,
+    current_user: dict = Depends(deps.get_current_user)
+):
+    job = evaluation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/admin/performance", response_model=PerformanceRanking)
+def get_performance_ranking(
+    date_range: Tuple[date, date] = Depends(deps.get_date_range),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.LEADERBOARD_TOP_K, gt=0, le=settings.LEADERBOARD_PAGE_SIZE),
+    db = Depends(deps.get_db),
+    current_user: dict = Depends(deps.get_current_user)
+):
+    """
+    Every user's PPG over an arbitrary range, best first: a leaderboard for a
+    custom window, computed on request from the snapshot series (one read
+    per user per year covered).
+    """
     # In real app, check for admin role here
-    await update_all_portfolios_total_value(db)
-    await generate_leaderboards(db)
-    return {"message": "Evaluation triggered successfully"}
+    start, end = date_range
+    usernames = {doc.id: doc.to_dict().get("username") for doc in db.collection("users").stream()}
+    performances = [
+        performance for performance in portfolio_performance(db, usernames, start, end).values()
+        if performance is not None
+    ]
+    performances.sort(key=lambda performance: (-performance.ppg, performance.user_id))
+    for performance in performances[offset:offset + limit]:
+        performance.username = usernames[performance.user_id]
+    return PerformanceRanking(
+        start=start.isoformat(), end=end.isoformat(), total=len(performances),
+        entries=performances[offset:offset + limit]
+    )
+
+@router.get("/{window}/me", response_model=LeaderboardStanding)
+def get_my_standing(
+    window: str,
+    neighbours: int = Query(2, ge=0, le=10, description="Entries to include above and below"),
+    db = Depends(deps.get_db),
+    user_id: str = Depends(deps.get_current_user_id)
+):
+    """
+    The caller's rank and PPG with the entries around them, read from the one
+    leaderboard page that holds them.
+    """
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail="Invalid window")
+
+    standing = leaderboards.get_standing(db, window, user_id, neighbours)
+    if standing is None:
+        raise HTTPException(status_code=404, detail="Not ranked on this leaderboard")
+    return standing
+
+@router.get("/{window}/changes", response_model=LeaderboardChanges)
+def get_leaderboard_changes(
+    window: str,
+    since: int = Query(..., ge=0, description="The leaderboard version the client has"),
+    db = Depends(deps.get_db),
+    user_id: str = Depends(deps.get_current_user_id)
+):
+    """
+    Entries whose rank or PPG changed after version `since`, and users no
+    longer ranked. If `full_reload` is set, refetch the leaderboard instead.
+    """
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail="Invalid window")
+
+    changes = leaderboards.get_changes(db, window, since)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Leaderboard not found")
+    return changes
 
 @router.get("/{window}", response_model=Leaderboard)
-def get_leaderboard(
+async def get_leaderboard(
     window: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.LEADERBOARD_TOP_K, gt=0, le=settings.LEADERBOARD_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
     db = Depends(deps.get_db),
-    current_user: dict = Depends(deps.get_current_user)
+    user_id: str = Depends(deps.get_current_user_id)
 ):
-    if window not in ["1d", "7d", "30d", "90d"]:
+    """
+    Entries ranked offset + 1 to offset + limit; `total` is the number of
+    ranked users.
+
+    Served from the in-process leaderboard cache with a strong ETag that
+    changes only when a new evaluation publishes; a matching If-None-Match
+    gets 304 Not Modified.
+    """
+    if window not in WINDOWS:
         raise HTTPException(status_code=400, detail="Invalid window")
-        
-    doc = db.collection("leaderboards").document(window).get()
-    if not doc.exists:
+
+    cached = await leaderboards.get_cached_leaderboard(db, window, offset, limit)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Leaderboard not found")
-        
-    return doc.to_dict()
+
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"private, max-age={int(settings.LEADERBOARD_CACHE_TTL)}"
+    }
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
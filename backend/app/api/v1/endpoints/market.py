@@ -1,7 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from app.api import deps
-from app.services.market_data import get_real_time_quote
-from app.models.market import StockQuote
+from app.core import security
+from app.core.config import settings
+from app.services import market_data
+from app.services.market_data import get_real_time_quote, get_real_time_quotes, get_market_data_metrics, dedupe_symbols
+from app.services.history import get_market_history, get_aligned_history, parse_fields
+from app.services.indicators import parse_indicators
+from app.services.symbols import ensure_known_symbol, is_known_symbol, search_symbols
+from app.services.price_broadcast import StreamCapacityError
+from app.models.market import StockQuote, StockQuoteBatch, StreamTicket, SymbolInfo
 
 router = APIRouter()
 
@@ -10,15 +19,123 @@ async def get_quote(
     symbol: str,
     current_user: dict = Depends(deps.get_current_user)
 ):
+    ensure_known_symbol(symbol)
     quote = await get_real_time_quote(symbol)
     return quote
 
+@router.get("/symbols", response_model=List[SymbolInfo])
+def find_symbols(
+    q: str = Query(..., min_length=1, max_length=50, description="Ticker or company name prefix"),
+    limit: int = Query(10, gt=0, le=50),
+    current_user: dict = Depends(deps.get_current_user)
+):
+    return search_symbols(q, limit)
+
+def _parse_symbols(symbols: str):
+    symbol_list = dedupe_symbols(symbols.split(","))
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+    if len(symbol_list) > settings.QUOTE_BATCH_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many symbols (max {settings.QUOTE_BATCH_MAX_SYMBOLS})"
+        )
+    return symbol_list
+
+@router.get("/quotes", response_model=StockQuoteBatch)
+async def get_quotes(
+    symbols: str = Query(..., description="Comma-separated symbols, e.g. AAPL,MSFT"),
+    current_user: dict = Depends(deps.get_current_user)
+):
+    symbol_list = _parse_symbols(symbols)
+    known = [symbol for symbol in symbol_list if is_known_symbol(symbol)]
+    batch = await get_real_time_quotes(known)
+    for symbol in symbol_list:
+        if symbol not in known:
+            batch.errors[symbol] = f"Symbol {symbol} not found"
+    return batch
+
+@router.post("/stream/ticket", response_model=StreamTicket)
+def create_stream_ticket(
+    current_user_id: str = Depends(deps.get_current_user_id)
+):
+    """
+    A short-lived ticket for opening /stream, so the access token never goes
+    into a URL.
+    """
+    return StreamTicket(
+        ticket=security.create_stream_ticket(current_user_id),
+        expires_in=settings.STREAM_TICKET_EXPIRE_SECONDS
+    )
+
+@router.get("/stream")
+async def stream_quotes(
+    symbols: str = Query(..., description="Comma-separated symbols, e.g. AAPL,MSFT"),
+    current_user: dict = Depends(deps.get_current_user_from_stream_ticket)
+):
+    """
+    Server-Sent Events feed of price updates for the requested symbols.
+    The caller is authenticated once per connection, with a stream ticket;
+    the subscription is released when the client disconnects and the
+    generator is cancelled.
+    """
+    symbol_list = _parse_symbols(symbols)
+    for symbol in symbol_list:
+        ensure_known_symbol(symbol)
+    try:
+        subscription = market_data.price_broadcaster.subscribe(symbol_list)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except StreamCapacityError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    async def events():
+        try:
+            while True:
+                quotes = await subscription.next_batch(timeout=settings.PRICE_PUSH_HEARTBEAT)
+                if not quotes:
+                    yield ": keepalive\n\n"
+                    continue
+                for quote in quotes:
+                    yield f"event: quote\ndata: {quote.model_dump_json()}\n\n"
+        finally:
+            market_data.price_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/metrics")
+def get_metrics(
+    current_user: dict = Depends(deps.get_current_user)
+):
+    return get_market_data_metrics()
+
+@router.get("/history")
+async def get_multi_history(
+    symbols: str = Query(..., description="Comma-separated symbols, e.g. AAPL,ES,NQ"),
+    resolution: str = 'D',
+    limit: int = Query(100, gt=0, le=5000),
+    fields: str = Query("close", description="Comma-separated: open,high,low,close,volume"),
+    points: Optional[int] = Query(None, ge=3, description="Downsample to at most this many points (LTTB)"),
+    current_user: dict = Depends(deps.get_current_user)
+):
+    """
+    Several series in one round trip, aligned on a shared time axis.
+    """
+    return await get_aligned_history(_parse_symbols(symbols), resolution, limit, parse_fields(fields), points=points)
+
 @router.get("/history/{symbol}")
 async def get_history(
     symbol: str,
     resolution: str = 'D',
-    limit: int = 100,
+    limit: int = Query(100, gt=0, le=50000),
+    base: Optional[str] = Query(None, description="Native resolution to resample from, e.g. 1 for 1-minute bars"),
+    points: Optional[int] = Query(None, ge=3, description="Downsample to at most this many points (LTTB)"),
+    indicators: Optional[str] = Query(None, description="Comma-separated, e.g. sma:20,ema:50,rsi:14,macd:12:26:9,bbands:20:2,vwap"),
     current_user: dict = Depends(deps.get_current_user)
 ):
-    from app.services.market_data import get_market_history
-    return await get_market_history(symbol, resolution, limit)
+    specs = parse_indicators(indicators) if indicators else None
+    return await get_market_history(symbol, resolution, limit, base=base, points=points, indicators=specs)
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.api import deps
 from app.models.portfolio import Portfolio, PortfolioCreate, PortfolioInDB
-from datetime import datetime, timezone
+from app.models.snapshot import PortfolioPerformance, SnapshotPoint
+from app.services.performance import portfolio_performance
+from app.services.snapshot_series import values_between
+from datetime import date, datetime, timezone
+from typing import List, Tuple
 
 router = APIRouter()
 
@@ -55,3 +59,33 @@ def get_portfolio(
         return new_portfolio
         
     return portfolio_doc.to_dict()
+
+@router.get("/me/snapshots", response_model=List[SnapshotPoint])
+def get_portfolio_snapshots(
+    date_range: Tuple[date, date] = Depends(deps.get_date_range),
+    db = Depends(deps.get_db),
+    current_user: dict = Depends(deps.get_current_user)
+):
+    """
+    Daily portfolio values from start to end inclusive.
+    """
+    start, end = date_range
+    points = values_between(db, [current_user["id"]], start, end)[current_user["id"]]
+    return [SnapshotPoint(date=day.isoformat(), total_value=value) for day, value in points]
+
+@router.get("/me/performance", response_model=PortfolioPerformance)
+def get_portfolio_performance(
+    date_range: Tuple[date, date] = Depends(deps.get_date_range),
+    db = Depends(deps.get_db),
+    current_user: dict = Depends(deps.get_current_user)
+):
+    """
+    PPG and value change from start to end, measured between the nearest
+    snapshots on or before each day.
+    """
+    start, end = date_range
+    performance = portfolio_performance(db, [current_user["id"]], start, end)[current_user["id"]]
+    if performance is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No snapshots in range")
+    performance.username = current_user.get("username")
+    return performance
@@ -5,6 +5,107 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     FINNHUB_API_KEY: str = "mock-key"
+    FINNHUB_BASE_URL: str = "https://finnhub.io/api/v1"
+
+    # Shared upstream HTTP client (see app.services.market_data)
+    MARKET_DATA_MAX_CONNECTIONS: int = 100
+    MARKET_DATA_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    MARKET_DATA_KEEPALIVE_EXPIRY: float = 30.0
+    MARKET_DATA_HTTP2: bool = False
+    MARKET_DATA_TIMEOUT: float = 5.0
+    MARKET_DATA_CONNECT_TIMEOUT: float = 2.0
+
+    # In-process quote cache. Trades may demand a stricter age than UI reads.
+    QUOTE_CACHE_TTL: float = 5.0
+    QUOTE_CACHE_MAX_SIZE: int = 5000
+    QUOTE_CACHE_TRADE_MAX_AGE: float = 1.0
+
+    # Batch quotes: max concurrent upstream fetches, max symbols per request
+    QUOTE_BATCH_CONCURRENCY: int = 10
+    QUOTE_BATCH_MAX_SYMBOLS: int = 100
+
+    # Finnhub call budget shared by all upstream calls (see upstream_scheduler).
+    # Batch evaluation may not consume the last UPSTREAM_BATCH_RESERVE tokens.
+    FINNHUB_CALLS_PER_MINUTE: int = 60
+    FINNHUB_BURST: int = 10
+    UPSTREAM_BATCH_RESERVE: int = 3
+
+    # Upstream circuit breaker. While it is open, quotes fall back to the last
+    # good price if it is no older than QUOTE_STALE_MAX_AGE (trades: the
+    # stricter QUOTE_TRADE_MAX_STALE_AGE); otherwise the request fails with 503.
+    UPSTREAM_FAILURE_THRESHOLD: int = 5
+    UPSTREAM_RESET_TIMEOUT: float = 30.0
+    QUOTE_STALE_MAX_AGE: float = 3600.0
+    QUOTE_TRADE_MAX_STALE_AGE: float = 5.0
+
+    # Optional secondary quote provider. When it has a key, trade and UI quotes
+    # not answered by Finnhub within its recent QUOTE_HEDGE_PERCENTILE latency
+    # (clamped to the min/max delay) are also requested from it.
+    TWELVEDATA_API_KEY: str = ""
+    TWELVEDATA_BASE_URL: str = "https://api.twelvedata.com"
+    TWELVEDATA_CALLS_PER_MINUTE: int = 8
+    TWELVEDATA_BURST: int = 2
+    QUOTE_HEDGE_PERCENTILE: float = 95.0
+    QUOTE_HEDGE_MIN_DELAY: float = 0.05
+    QUOTE_HEDGE_MAX_DELAY: float = 1.0
+    QUOTE_HEDGE_MIN_SAMPLES: int = 20
+
+    # Optional streaming ingestion from the Finnhub trade WebSocket
+    PRICE_STREAM_ENABLED: bool = False
+    FINNHUB_WS_URL: str = "wss://ws.finnhub.io"
+    PRICE_STREAM_MAX_AGE: float = 5.0
+    PRICE_STREAM_MAX_SYMBOLS: int = 50
+    PRICE_STREAM_REFRESH_SECONDS: float = 60.0
+    PRICE_STREAM_WATCH_TTL: float = 300.0
+
+    # Server-push quotes (GET /api/v1/market/stream)
+    PRICE_PUSH_INTERVAL: float = 1.0
+    PRICE_PUSH_HEARTBEAT: float = 15.0
+    PRICE_PUSH_MAX_CONNECTIONS: int = 1000
+    PRICE_PUSH_MAX_SYMBOLS_PER_CONNECTION: int = 50
+    # Distinct symbols polled for all streams together
+    PRICE_PUSH_MAX_SYMBOLS: int = 500
+    # Lifetime of the ticket that opens a stream (POST /market/stream/ticket)
+    STREAM_TICKET_EXPIRE_SECONDS: int = 60
+
+    # Symbol listing (symbol,name,exchange,type CSV) behind /market/symbols and
+    # local symbol validation; build it with scripts/fetch_symbol_universe.py
+    # (deploy_app.sh does, into the build context). Not under data/, which is
+    # left out of deploys.
+    SYMBOL_UNIVERSE_FILE: str = "listings/symbols.csv"
+
+    # Documents per get_all round trip in evaluation and leaderboard generation
+    FIRESTORE_READ_BATCH_SIZE: int = 300
+    # Evaluation writes go out as WriteBatch chunks (max 500 writes), this many
+    # committing at once; contended chunks are retried with backoff
+    FIRESTORE_WRITE_BATCH_SIZE: int = 500
+    FIRESTORE_WRITE_MAX_IN_FLIGHT: int = 8
+    FIRESTORE_WRITE_MAX_ATTEMPTS: int = 5
+
+    # Leaderboards: ranks per stored page, and ranks kept on the window document
+    LEADERBOARD_PAGE_SIZE: int = 500
+    LEADERBOARD_TOP_K: int = 100
+    # Seconds a worker serves a cached leaderboard before checking for a newer publish
+    LEADERBOARD_CACHE_TTL: float = 30.0
+    LEADERBOARD_CACHE_MAX_SIZE: int = 256
+    # Change sets kept per window, and the size (entries, removals and shifts) above which clients are told to reload
+    LEADERBOARD_CHANGES_KEEP: int = 48
+    LEADERBOARD_CHANGES_MAX_ENTRIES: int = 2000
+    # Risk leaderboards: annual risk-free rate, and the share of a window's days a user needs to be ranked
+    RISK_FREE_RATE: float = 0.0
+    RISK_MIN_COVERAGE: float = 0.5
+
+    # Evaluation runs: shards per run and users per checkpoint
+    EVALUATION_SHARDS: int = 4
+    EVALUATION_CHECKPOINT_USERS: int = 5000
+
+    # Persistent candle store behind /market/history
+    CANDLE_STORE_DIR: str = "data/candles"
+    CANDLE_REFRESH_SECONDS: int = 900
+
+    # Cached indicator series for /market/history?indicators=
+    INDICATOR_CACHE_MAX_SIZE: int = 1000
+    INDICATOR_CACHE_MAX_BARS: int = 60000
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -22,3 +22,17 @@ def create_access_token(subject: Union[str, Any], expires_delta: timedelta = Non
     to_encode = {"exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+# Scope of stream tickets: only /market/stream accepts them, and
+# ordinary endpoints reject them
+STREAM_TICKET_SCOPE = "market_stream"
+
+def create_stream_ticket(subject: Union[str, Any]) -> str:
+    """
+    A short-lived token that only opens /market/stream. EventSource cannot
+    send headers, so the stream takes this in the query string instead of
+    the access token, which would otherwise end up in URLs and logs.
+    """
+    expire = datetime.now(timezone.utc) + timedelta(seconds=settings.STREAM_TICKET_EXPIRE_SECONDS)
+    to_encode = {"exp": expire, "sub": str(subject), "scope": STREAM_TICKET_SCOPE}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -0,0 +1,147 @@
+import asyncio
+import random
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+from google.api_core import exceptions as gexc
+from app.core.config import settings
+
+# Errors worth retrying: contention on the same documents, throttling and
+# transient backend unavailability
+RETRYABLE_ERRORS: Tuple[type, ...] = (
+    gexc.Aborted,
+    gexc.ResourceExhausted,
+    gexc.ServiceUnavailable,
+    gexc.DeadlineExceeded,
+    gexc.InternalServerError
+)
+
+# Firestore rejects batches with more writes than this
+MAX_BATCH_SIZE = 500
+
+class BatchWriter:
+    """
+    Queues set/update/delete writes into WriteBatch chunks of batch_size and commits
+    up to max_in_flight chunks in parallel on the executor (the client is
+    synchronous). Writers wait while max_in_flight commits are outstanding,
+    so memory stays bounded on large runs.
+
+    A chunk failing with a retryable error is rebuilt and retried with
+    exponential backoff and jitter, up to max_attempts commits. flush() waits
+    for every chunk and reports the ones that still failed; a chunk commits
+    atomically, so a failed chunk wrote none of its documents.
+    """
+
+    def __init__(
+        self,
+        db,
+        batch_size: int = MAX_BATCH_SIZE,
+        max_in_flight: int = 8,
+        max_attempts: int = 5,
+        base_delay: float = 0.2,
+        max_delay: float = 5.0,
+        retryable: Tuple[type, ...] = RETRYABLE_ERRORS,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+    ):
+        self._db = db
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self._sleep = sleep
+        self._pending: List[Tuple[str, object, Optional[dict]]] = []
+        self._in_flight: Set[asyncio.Future] = set()
+        self._batches = 0
+
+        self.writes = 0
+        self.committed_batches = 0
+        self.retries = 0
+        self.failures: List[dict] = []
+
+    async def set(self, ref, data: dict):
+        await self._add("set", ref, data)
+
+    async def update(self, ref, data: dict):
+        await self._add("update", ref, data)
+
+    async def delete(self, ref):
+        await self._add("delete", ref)
+
+    async def _add(self, op: str, ref, data: Optional[dict] = None):
+        self._pending.append((op, ref, data))
+        if len(self._pending) >= self.batch_size:
+            await self._submit()
+
+    async def _submit(self):
+        if not self._pending:
+            return
+        while len(self._in_flight) >= self.max_in_flight:
+            done, _ = await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+            self._in_flight -= done
+        writes, self._pending = self._pending, []
+        self._batches += 1
+        self._in_flight.add(asyncio.ensure_future(self._commit(self._batches, writes)))
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _commit(self, batch_number: int, writes: List[Tuple[str, object, Optional[dict]]]):
+        loop = asyncio.get_event_loop()
+        attempt = 0
+        while True:
+            attempt += 1
+            # A WriteBatch cannot be committed twice, so each attempt builds its own
+            batch = self._db.batch()
+            for op, ref, data in writes:
+                if op == "delete":
+                    batch.delete(ref)
+                else:
+                    getattr(batch, op)(ref, data)
+            try:
+                await loop.run_in_executor(None, batch.commit)
+            except Exception as exc:
+                if isinstance(exc, self.retryable) and attempt < self.max_attempts:
+                    self.retries += 1
+                    await self._sleep(self._backoff(attempt))
+                    continue
+                self.failures.append({
+                    "batch": batch_number,
+                    "writes": len(writes),
+                    "attempts": attempt,
+                    "error": repr(exc),
+                    "first_document": getattr(writes[0][1], "path", None)
+                })
+                print(f"Batch {batch_number} ({len(writes)} writes) failed after {attempt} attempts: {exc!r}")
+                return
+            self.writes += len(writes)
+            self.committed_batches += 1
+            return
+
+    async def flush(self) -> dict:
+        """
+        Commits queued writes, waits for all outstanding batches and returns
+        the run report.
+        """
+        await self._submit()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight)
+            self._in_flight.clear()
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "writes": self.writes,
+            "batches": self.committed_batches,
+            "retries": self.retries,
+            "failed_batches": list(self.failures),
+            "failed_writes": sum(failure["writes"] for failure in self.failures)
+        }
+
+def create_batch_writer(db) -> BatchWriter:
+    return BatchWriter(
+        db,
+        batch_size=settings.FIRESTORE_WRITE_BATCH_SIZE,
+        max_in_flight=settings.FIRESTORE_WRITE_MAX_IN_FLIGHT,
+        max_attempts=settings.FIRESTORE_WRITE_MAX_ATTEMPTS
+    )
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, Iterable
 from google.cloud import firestore
 
 def get_db():
@@ -9,3 +10,19 @@ def get_db():
     if database:
         return firestore.Client(project=project_id, database=database)
     return firestore.Client(project=project_id)
+
+def get_documents(db, collection: str, doc_ids: Iterable[str], batch_size: int = 300) -> Dict[str, dict]:
+    """
+    Reads many documents by id with one get_all round trip per batch_size ids.
+    Returns {doc_id: data} for the documents that exist.
+    """
+    collection_ref = db.collection(collection)
+    doc_ids = list(dict.fromkeys(doc_ids))
+    found = {}
+    for start in range(0, len(doc_ids), batch_size):
+        refs = [collection_ref.document(doc_id) for doc_id in doc_ids[start:start + batch_size]]
+        # get_all does not return snapshots in request order
+        for snapshot in db.get_all(refs):
+            if snapshot.exists:
+                found[snapshot.id] = snapshot.to_dict()
+    return found
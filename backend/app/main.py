@@ -1,8 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.endpoints import users, auth, portfolios, market, trade, transactions, leaderboard
+from app.db.firestore import get_db
+from app.core.config import settings
+from app.services import market_data, price_stream, symbols
+from app.services.evaluation_jobs import evaluation_jobs
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client for the lifetime of the process
+    market_data.set_http_client(market_data.create_http_client())
+    symbols.load_symbol_universe()
+    if settings.PRICE_STREAM_ENABLED:
+        price_stream.start_price_stream(get_db())
+    try:
+        yield
+    finally:
+        await evaluation_jobs.stop()
+        await market_data.price_broadcaster.stop()
+        await price_stream.stop_price_stream()
+        await market_data.close_http_client()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,7 +45,6 @@ def read_root():
     return {"Hello": "Brave New World"}
 
 import os
-from app.db.firestore import get_db
 
 @app.get("/api/status")
 def get_status():
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class EvaluationJob(BaseModel):
+    id: str
+    status: str # queued, running, succeeded, failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    run_id: Optional[str] = None
+    resumed: bool = False
+    users_total: int = 0
+    users_processed: int = 0
+    symbols: int = 0
+    symbols_priced: int = 0
+    snapshots: int = 0
+    published: bool = False
+    errors: List[str] = []
+    eta_seconds: Optional[float] = None
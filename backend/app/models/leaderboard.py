@@ -1,14 +1,68 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 class LeaderboardEntry(BaseModel):
     user_id: str
     username: str
     ppg: float
     rank: int
+    score: Optional[float] = None # The ranked metric on risk leaderboards (e.g. Sharpe ratio)
 
 class Leaderboard(BaseModel):
     id: str # Represents the window, e.g., "1d", "7d"
     updated_at: datetime
+    entries: List[LeaderboardEntry] # Top LEADERBOARD_TOP_K; the rest are in leaderboard_pages
+    as_of: Optional[str] = None # YYYY-MM-DD the window ends on
+    total: int = 0
+    pages: int = 0
+    page_size: int = 0
+    version: int = 0 # Incremented on every publish; see LeaderboardChanges
+    metric: str = "ppg" # What entries are ranked by: "ppg", or the score's metric, e.g. "sharpe"
+
+class LeaderboardPage(BaseModel):
+    window: str
+    page: int
     entries: List[LeaderboardEntry]
+    user_ids: List[str] # Same order as entries; queried with array_contains to find a user's page
+
+class LeaderboardStanding(BaseModel):
+    window: str
+    user_id: str
+    username: str
+    ppg: float
+    rank: int
+    above: List[LeaderboardEntry] # In rank order, like below
+    below: List[LeaderboardEntry]
+
+class RankShift(BaseModel):
+    from_rank: int
+    delta: int
+
+class LeaderboardChanges(BaseModel):
+    """
+    What changed in a window between versions `since` and `version`:
+
+    - entries: users whose PPG or username changed, or who are newly ranked,
+      with their current rank
+    - removed: users no longer ranked
+    - shifts: every other user keeps their entry but moves from rank r to
+      r + delta, where delta is that of the last shift with from_rank <= r
+      (0 before the first)
+
+    so the payload grows with the number of users whose score changed, not
+    with the number ranked. Entries shifted into a client's range from
+    outside it are not included; a client holding ranks lo..hi refetches the
+    ranks it is left missing. With full_reload set, the changes are not
+    available (too many, or too old) and the client should refetch the
+    leaderboard instead.
+    """
+    window: str
+    since: int
+    version: int
+    updated_at: datetime
+    full_reload: bool = False
+    total: int = 0
+    entries: List[LeaderboardEntry] = []
+    removed: List[str] = []
+    shifts: List[RankShift] = []
@@ -1,7 +1,24 @@
 from pydantic import BaseModel
+from typing import Dict, Optional
 
 class StockQuote(BaseModel):
     symbol: str
     price: float
     change: float
     percent_change: float
+    stale: bool = False # last known good price served while the upstream is unavailable
+    as_of: Optional[float] = None # unix time the stale price was fetched
+
+class SymbolInfo(BaseModel):
+    symbol: str
+    name: str
+    exchange: str
+    type: str
+
+class StockQuoteBatch(BaseModel):
+    quotes: Dict[str, StockQuote]
+    errors: Dict[str, str] # symbol -> error detail for symbols that failed
+
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
@@ -1,8 +1,34 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
+# Legacy layout, one portfolio_snapshots/{user_id}_{date} document per user
+# per day. Snapshots now live in app.services.snapshot_series; existing
+# documents are moved there by scripts/migrate_snapshots.py.
 class PortfolioSnapshot(BaseModel):
     user_id: str
     date: str # YYYY-MM-DD
     total_value: float
     timestamp: datetime
+
+class SnapshotPoint(BaseModel):
+    date: str # YYYY-MM-DD
+    total_value: float
+
+class PortfolioPerformance(BaseModel):
+    user_id: str
+    username: Optional[str] = None
+    start: str # Requested range, YYYY-MM-DD
+    end: str
+    start_date: str # Snapshots the range was measured between
+    start_value: float
+    end_date: str
+    end_value: float
+    value_change: float
+    ppg: float
+
+class PerformanceRanking(BaseModel):
+    start: str
+    end: str
+    total: int
+    entries: List[PortfolioPerformance] # Best PPG first
@@ -0,0 +1,144 @@
+import json
+import os
+import re
+from typing import Dict, Optional
+import numpy as np
+
+# Column name -> dtype. "t" is the bar open time in unix seconds.
+COLUMNS = {
+    "t": np.int64,
+    "o": np.float64,
+    "h": np.float64,
+    "l": np.float64,
+    "c": np.float64,
+    "v": np.float64
+}
+
+Candles = Dict[str, np.ndarray]
+
+def empty_candles() -> Candles:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+def candles_from_columns(columns: dict) -> Candles:
+    """
+    Builds a Candles dict from provider columns, sorted by time with duplicates dropped.
+    """
+    candles = {name: np.asarray(columns.get(name, []), dtype=dtype) for name, dtype in COLUMNS.items()}
+    _, first_index = np.unique(candles["t"], return_index=True)
+    return {name: values[first_index] for name, values in candles.items()}
+
+def safe_name(name: str) -> str:
+    """
+    A path component for name: characters outside tickers become "_", and
+    names made only of dots (".", "..") are rejected with ValueError.
+    """
+    safe = re.sub(r"[^A-Za-z0-9.^_-]", "_", name)
+    if not safe.strip("."):
+        raise ValueError(f"Invalid symbol {name!r}")
+    return safe
+
+class CandleStore:
+    """
+    Persistent columnar store of OHLCV bars, one directory per (symbol, resolution)
+    holding one .npy file per column plus meta.json.
+
+    Columns are memory-mapped on read and range queries binary-search the sorted
+    time column. Writes go to temporary files and are swapped in with os.replace;
+    meta.json (the covered time range) is written last, so a torn write is
+    detected as mismatched column lengths and treated as an empty series.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _key_dir(self, symbol: str, resolution: str) -> str:
+        key_dir = os.path.join(self.root, safe_name(symbol), safe_name(str(resolution)))
+        root = os.path.realpath(self.root)
+        if os.path.commonpath([root, os.path.realpath(key_dir)]) != root:
+            raise ValueError(f"Candle store key {symbol}/{resolution} is outside the store")
+        return key_dir
+
+    def coverage(self, symbol: str, resolution: str) -> Optional[dict]:
+        """
+        Returns {"start": ..., "end": ...}, the time range already fetched from the provider.
+        """
+        path = os.path.join(self._key_dir(symbol, resolution), "meta.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load(self, symbol: str, resolution: str) -> Candles:
+        key_dir = self._key_dir(symbol, resolution)
+        if self.coverage(symbol, resolution) is None:
+            return empty_candles()
+        try:
+            candles = {
+                name: np.load(os.path.join(key_dir, f"{name}.npy"), mmap_mode="r")
+                for name in COLUMNS
+            }
+        except (FileNotFoundError, ValueError):
+            return empty_candles()
+
+        if len({len(values) for values in candles.values()}) != 1:
+            print(f"Candle store for {symbol}/{resolution} is inconsistent. Ignoring it.")
+            return empty_candles()
+        return candles
+
+    def query(
+        self,
+        symbol: str,
+        resolution: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Candles:
+        """
+        Bars with start <= t <= end (either bound optional), keeping the most recent `limit`.
+        """
+        candles = self.load(symbol, resolution)
+        t = candles["t"]
+        lo = 0 if start is None else int(np.searchsorted(t, start, side="left"))
+        hi = len(t) if end is None else int(np.searchsorted(t, end, side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return {name: np.asarray(values[lo:hi]) for name, values in candles.items()}
+
+    def merge(self, symbol: str, resolution: str, new: Candles, covered_start: int, covered_end: int):
+        """
+        Merges freshly fetched bars into the stored series and extends the covered range.
+        Bars whose time already exists are replaced by the new values.
+        """
+        existing = self.load(symbol, resolution)
+        coverage = self.coverage(symbol, resolution)
+
+        if len(new["t"]) == 0:
+            merged = {name: np.asarray(values) for name, values in existing.items()}
+        elif len(existing["t"]) == 0 or new["t"][0] > existing["t"][-1]:
+            # Common case: appending bars newer than anything stored
+            merged = {name: np.concatenate([existing[name], new[name]]) for name in COLUMNS}
+        else:
+            keep = ~np.isin(existing["t"], new["t"])
+            combined = {name: np.concatenate([existing[name][keep], new[name]]) for name in COLUMNS}
+            order = np.argsort(combined["t"], kind="stable")
+            merged = {name: values[order] for name, values in combined.items()}
+
+        if coverage is not None:
+            covered_start = min(covered_start, coverage["start"])
+            covered_end = max(covered_end, coverage["end"])
+        self._write(symbol, resolution, merged, {"start": int(covered_start), "end": int(covered_end)})
+
+    def _write(self, symbol: str, resolution: str, candles: Candles, meta: dict):
+        key_dir = self._key_dir(symbol, resolution)
+        os.makedirs(key_dir, exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            tmp_path = os.path.join(key_dir, f".{name}.npy.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(candles[name], dtype=dtype))
+            os.replace(tmp_path, os.path.join(key_dir, f"{name}.npy"))
+
+        tmp_meta = os.path.join(key_dir, ".meta.json.tmp")
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, os.path.join(key_dir, "meta.json"))
@@ -0,0 +1,90 @@
+import time
+from typing import Callable, Optional
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the upstream while the breaker is open.
+    """
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is unhealthy instead of letting every caller
+    wait out its own timeout.
+
+    closed: calls pass; failure_threshold consecutive failures open the breaker.
+    open: calls raise CircuitOpenError until reset_timeout has passed.
+    half_open: a single probe call is let through; its success closes the
+    breaker and its failure opens it again. A probe that never reports back
+    (e.g. its caller was cancelled) is replaced after another reset_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.failures = 0
+        self.successes = 0
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError if the call may not go upstream right now.
+        """
+        now = self._clock()
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_started_at = None
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_started_at is None or now - self._probe_started_at >= self.reset_timeout:
+                self._probe_started_at = now
+                return
+
+        self.short_circuited += 1
+        retry_in = max(0.0, self.reset_timeout - (now - self._opened_at))
+        raise CircuitOpenError(f"Upstream circuit is open (retry in {retry_in:.0f}s)")
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self._probe_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self._opened_at = self._clock()
+            self._probe_started_at = None
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "failures": self.failures,
+            "successes": self.successes
+        }
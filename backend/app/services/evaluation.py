@@ -1,20 +1,59 @@
 import asyncio
+import uuid
+import zlib
+from collections import Counter
 from google.cloud import firestore
 from datetime import datetime, date, timezone
-from app.services.market_data import get_real_time_quote
-from app.models.snapshot import PortfolioSnapshot
+from app.core.config import settings
+from app.db.batch_writer import create_batch_writer
+from app.db.firestore import get_documents
+from app.services.market_data import get_real_time_quotes
+from app.services.upstream_scheduler import Priority
+from app.services.snapshot_series import SnapshotSeries, load_series, series_ref
 from app.models.portfolio import PortfolioInDB # For type hinting portfolio data
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+async def fetch_price_table(symbols: Iterable[str]) -> Dict[str, float]:
+    """
+    Prices each distinct symbol once, in one batched quote request.
+    Symbols whose quote fails are left out of the table, so portfolios
+    holding them are not valued (see portfolio_value).
+    """
+    # Evaluation runs in the lowest upstream lane so it never starves trades
+    batch = await get_real_time_quotes(
+        sorted({symbol.strip() for symbol in symbols}), priority=Priority.BATCH
+    )
+    for symbol, error in batch.errors.items():
+        print(f"Error fetching quote for {symbol}: {error}")
+    return {symbol: quote.price for symbol, quote in batch.quotes.items()}
+
+def unpriced_symbols(holdings: List[dict], prices: Dict[str, float]) -> Set[str]:
+    return {holding["symbol"].strip() for holding in holdings} - prices.keys()
+
+def holdings_value(holdings: List[dict], prices: Dict[str, float]) -> Optional[float]:
+    """
+    Market value of the holdings, or None if any of their symbols is missing
+    from prices: a position is never valued at a made-up price.
+    """
+    if unpriced_symbols(holdings, prices):
+        return None
+    return sum(holding["quantity"] * prices[holding["symbol"].strip()] for holding in holdings)
+
+def portfolio_value(portfolio_data: dict, prices: Dict[str, float]) -> Optional[float]:
+    value = holdings_value(portfolio_data.get("holdings", []), prices)
+    return None if value is None else portfolio_data.get("cash_balance", 0.0) + value
 
 async def snapshot_portfolio(db, user_id: str):
     """
     Calculates the current value of a user's portfolio and saves it as a snapshot.
     """
-    today_date_str = date.today().isoformat()
-    snapshot_doc_id = f"{user_id}_{today_date_str}"
+    today = date.today()
+    today_date_str = today.isoformat()
+    series_doc = series_ref(db, user_id, today.year).get()
+    series = SnapshotSeries.from_doc(series_doc.to_dict()) if series_doc.exists else SnapshotSeries(user_id, today.year)
     
     # Check if snapshot already exists for today
-    if db.collection("portfolio_snapshots").document(snapshot_doc_id).get().exists:
+    if today in series:
         print(f"Snapshot for user {user_id} already exists for {today_date_str}. Skipping.")
         return
 
@@ -26,39 +65,15 @@ async def snapshot_portfolio(db, user_id: str):
         return
 
     portfolio_data = portfolio_doc.to_dict()
+    prices = await fetch_price_table(holding["symbol"] for holding in portfolio_data.get("holdings", []))
+    calculated_total_value = portfolio_value(portfolio_data, prices)
+    if calculated_total_value is None:
+        missing = sorted(unpriced_symbols(portfolio_data.get("holdings", []), prices))
+        print(f"No price for {', '.join(missing)}; skipping snapshot for user {user_id}.")
+        return
     
-    current_cash_balance = portfolio_data.get("cash_balance", 0.0)
-    holdings = portfolio_data.get("holdings", [])
-    
-    holdings_value = 0.0
-    quote_tasks = []
-    
-    # Fetch market prices for all holdings concurrently
-    for holding in holdings:
-        quote_tasks.append(get_real_time_quote(holding["symbol"]))
-    
-    quotes = await asyncio.gather(*quote_tasks, return_exceptions=True) # Gather results, handle exceptions
-    
-    for i, holding in enumerate(holdings):
-        quote = quotes[i]
-        market_price = 0.0
-        if isinstance(quote, Exception):
-            print(f"Error fetching quote for {holding['symbol']}: {quote}")
-        else:
-            market_price = quote.price
-        
-        holdings_value += holding["quantity"] * market_price
-
-    calculated_total_value = current_cash_balance + holdings_value
-    
-    new_snapshot = PortfolioSnapshot(
-        user_id=user_id,
-        date=today_date_str,
-        total_value=round(calculated_total_value, 2),
-        timestamp=datetime.now(timezone.utc)
-    )
-    
-    db.collection("portfolio_snapshots").document(snapshot_doc_id).set(new_snapshot.model_dump())
+    series.set(today, round(calculated_total_value, 2))
+    series_ref(db, user_id, today.year).set(series.to_doc())
     print(f"Snapshot created for user {user_id} for {today_date_str} with value {calculated_total_value}")
 
 def calculate_ppg(current_value: float, start_value: float) -> float:
@@ -69,111 +84,447 @@ def calculate_ppg(current_value: float, start_value: float) -> float:
         return 0.0
     return ((current_value - start_value) / start_value) * 100.0
 
-async def update_all_portfolios_total_value(db):
+# Evaluation runs are split into shards that can run in parallel, in this
+# process or as separate job tasks (see scripts/run_evaluation.py):
+#   evaluation_runs/{run_id}              price table, shard layout and status
+#   evaluation_runs/latest                pointer to the most recent run
+#   evaluation_manifests/{run}_{shard}_{part}  sorted user ids of a shard
+#   evaluation_checkpoints/{run}_{shard}  cursor into the shard's user ids
+LATEST_RUN = "latest"
+MANIFEST_PART_SIZE = 10000
+
+async def _off_loop(fn, *args):
+    """
+    Runs a blocking Firestore call in the default executor, so the API keeps
+    serving requests while an evaluation job runs in the same process.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, fn, *args)
+
+def shard_of(user_id: str, shard_count: int) -> int:
+    """
+    Stable shard assignment (unlike hash(), crc32 is the same in every process).
+    """
+    return zlib.crc32(user_id.encode("utf-8")) % shard_count
+
+def _manifest_ids(run: dict, shard: int) -> List[str]:
+    return [f"{run['run_id']}_{shard}_{part}" for part in range(run["manifest_parts"][shard])]
+
+def _checkpoint_ids(run: dict) -> List[str]:
+    return [f"{run['run_id']}_{shard}" for shard in range(run["shard_count"])]
+
+def get_run(db, run_id: str) -> Optional[dict]:
+    run_doc = db.collection("evaluation_runs").document(run_id).get()
+    return run_doc.to_dict() if run_doc.exists else None
+
+def _scan_portfolios(db, shard_count: int) -> Tuple[List[List[str]], Set[str], Counter]:
+    """
+    Every portfolio's id in its shard, the distinct symbols held and how many
+    portfolios hold each symbol, from one pass over the collection.
+    """
+    shards: List[List[str]] = [[] for _ in range(shard_count)]
+    symbols, held = set(), Counter()
+    for portfolio_doc in db.collection("portfolios").stream():
+        shards[shard_of(portfolio_doc.id, shard_count)].append(portfolio_doc.id)
+        holdings = portfolio_doc.to_dict().get("holdings", [])
+        symbols.update(holding["symbol"] for holding in holdings)
+        held.update({holding["symbol"] for holding in holdings if holding.get("quantity", 0) > 0})
+    return shards, symbols, held
+
+async def start_evaluation_run(db, shard_count: Optional[int] = None, run_id: Optional[str] = None) -> dict:
     """
-    Recalculates total_value for all portfolios based on current market prices
-    and triggers a snapshot for each.
+    Returns the run to work on. An explicit run_id is resumed as is; otherwise
+    the latest run is resumed if it is from today and not yet published, so a
+    run whose process died picks up from its checkpoints.
+
+    A new run prices every distinct symbol once for all shards and writes each
+    shard's user ids to manifest documents, so shards never list users again.
+    It also records how many portfolios hold each symbol (held_symbols).
     """
-    users_ref = db.collection("users")
-    all_users = users_ref.stream()
+    runs_ref = db.collection("evaluation_runs")
+    if run_id is None:
+        latest = await _off_loop(runs_ref.document(LATEST_RUN).get)
+        run = await _off_loop(get_run, db, latest.to_dict()["run_id"]) if latest.exists else None
+        if run and run["status"] != "published" and run["date"] == date.today().isoformat():
+            print(f"Resuming evaluation run {run['run_id']}.")
+            return {**run, "resumed": True}
+        run_id = uuid.uuid4().hex[:12]
+    else:
+        run = await _off_loop(get_run, db, run_id)
+        if run:
+            return {**run, "resumed": True}
+
+    shard_count = shard_count or settings.EVALUATION_SHARDS
+    shards, symbols, held = await _off_loop(_scan_portfolios, db, shard_count)
+    prices = await fetch_price_table(symbols)
+    priced_at = datetime.now(timezone.utc)
 
-    for user_doc in all_users:
-        user_id = user_doc.id
-        portfolio_ref = db.collection("portfolios").document(user_id)
-        portfolio_doc = portfolio_ref.get()
+    writer = create_batch_writer(db)
+    manifest_parts = []
+    for shard, user_ids in enumerate(shards):
+        user_ids.sort()
+        starts = range(0, len(user_ids), MANIFEST_PART_SIZE)
+        for part, start in enumerate(starts):
+            await writer.set(
+                db.collection("evaluation_manifests").document(f"{run_id}_{shard}_{part}"),
+                {"user_ids": user_ids[start:start + MANIFEST_PART_SIZE]}
+            )
+        manifest_parts.append(len(starts))
+    report = await writer.flush()
+    if report["failed_writes"]:
+        raise RuntimeError(f"Could not write the manifests of evaluation run {run_id}: {report['failed_batches']}")
 
-        if not portfolio_doc.exists:
-            print(f"Portfolio not found for user {user_id}. Skipping total value update.")
-            continue
+    run = {
+        "run_id": run_id,
+        "date": date.today().isoformat(),
+        "status": "running",
+        "shard_count": shard_count,
+        "manifest_parts": manifest_parts,
+        "portfolios": sum(len(user_ids) for user_ids in shards),
+        "symbols": len(symbols),
+        "prices": prices,
+        "priced_at": priced_at,
+        # Portfolios holding each symbol, for the price stream's subscriptions
+        "held_symbols": dict(held)
+    }
+    # The run only becomes visible once its manifests are in place
+    await _off_loop(runs_ref.document(run_id).set, run)
+    await _off_loop(runs_ref.document(LATEST_RUN).set, {"run_id": run_id})
+    print(f"Started evaluation run {run_id}: {run['portfolios']} portfolios in {shard_count} shards.")
+    return {**run, "resumed": False}
 
-        portfolio_data = portfolio_doc.to_dict()
-        current_cash_balance = portfolio_data.get("cash_balance", 0.0)
-        holdings = portfolio_data.get("holdings", [])
+async def evaluate_shard(db, run: dict, shard: int, progress=None) -> dict:
+    """
+    Values the shard's portfolios from the run's price table and snapshots
+    them, EVALUATION_CHECKPOINT_USERS users at a time. The checkpoint cursor
+    only advances once a chunk's writes are flushed, so a restart redoes at
+    most one chunk; its updates are idempotent and existing snapshots are
+    skipped. A chunk with failed writes stops the shard without advancing.
 
-        holdings_value = 0.0
-        quote_tasks = []
-        for holding in holdings:
-            quote_tasks.append(get_real_time_quote(holding["symbol"]))
+    Portfolios holding a symbol missing from the price table keep their
+    previous total_value and get no snapshot; the checkpoint counts them and
+    lists the symbols, and a later run for the same day fills them in.
 
-        quotes = await asyncio.gather(*quote_tasks, return_exceptions=True)
+    progress, if given, is told how many users each chunk processed (see
+    app.services.evaluation_jobs.JobProgress).
+    """
+    checkpoint_ref = db.collection("evaluation_checkpoints").document(f"{run['run_id']}_{shard}")
+    checkpoint_doc = await _off_loop(checkpoint_ref.get)
+    checkpoint = checkpoint_doc.to_dict() if checkpoint_doc.exists else {
+        "run_id": run["run_id"], "shard": shard, "cursor": 0, "done": False, "portfolios": 0, "snapshots": 0,
+        "unpriced": 0, "unpriced_symbols": []
+    }
+    if progress is not None:
+        progress.users_processed(checkpoint["cursor"], checkpoint["snapshots"], resumed=True)
+    if checkpoint["done"]:
+        return checkpoint
 
-        for i, holding in enumerate(holdings):
-            quote = quotes[i]
-            market_price = 0.0
-            if isinstance(quote, Exception):
-                print(f"Error fetching quote for {holding['symbol']}: {quote}")
+    manifests = await _off_loop(get_documents, db, "evaluation_manifests", _manifest_ids(run, shard))
+    user_ids = [user_id for doc_id in _manifest_ids(run, shard) for user_id in manifests[doc_id]["user_ids"]]
+    prices, snapshot_day = run["prices"], date.fromisoformat(run["date"])
+    writer = create_batch_writer(db)
+
+    while checkpoint["cursor"] < len(user_ids) or not checkpoint["done"]:
+        chunk = user_ids[checkpoint["cursor"]:checkpoint["cursor"] + settings.EVALUATION_CHECKPOINT_USERS]
+        portfolios = await _off_loop(get_documents, db, "portfolios", chunk, settings.FIRESTORE_READ_BATCH_SIZE)
+        series = await _off_loop(load_series, db, portfolios, [snapshot_day.year])
+
+        snapshots, unpriced, missing = 0, 0, set(checkpoint.get("unpriced_symbols", []))
+        for user_id, portfolio_data in portfolios.items():
+            calculated_total_value = portfolio_value(portfolio_data, prices)
+            if calculated_total_value is None:
+                unpriced += 1
+                missing.update(unpriced_symbols(portfolio_data.get("holdings", []), prices))
+                continue
+
+            # Update portfolio's total_value field
+            await writer.update(
+                db.collection("portfolios").document(user_id),
+                {"total_value": round(calculated_total_value, 2)}
+            )
+
+            # Take a snapshot from the same valuation
+            user_series = series[(user_id, snapshot_day.year)]
+            if snapshot_day in user_series:
+                print(f"Snapshot for user {user_id} already exists for {snapshot_day}. Skipping.")
             else:
-                market_price = quote.price
-            
-            holdings_value += holding["quantity"] * market_price
-        
-        calculated_total_value = current_cash_balance + holdings_value
-        
-        # Update portfolio's total_value field
-        portfolio_ref.update({"total_value": round(calculated_total_value, 2)})
-        print(f"Updated total_value for user {user_id} to {calculated_total_value}")
-
-        # Take a snapshot
-        await snapshot_portfolio(db, user_id)
+                user_series.set(snapshot_day, round(calculated_total_value, 2))
+                await writer.set(series_ref(db, user_id, snapshot_day.year), user_series.to_doc())
+                snapshots += 1
 
-from datetime import timedelta
-from app.models.leaderboard import Leaderboard, LeaderboardEntry
+        report = await writer.flush()
+        if report["failed_writes"]:
+            checkpoint["error"] = report["failed_batches"][0]["error"]
+            await _off_loop(checkpoint_ref.set, checkpoint)
+            print(f"Shard {shard} of run {run['run_id']} stopped at user {checkpoint['cursor']}: {checkpoint['error']}")
+            return checkpoint
 
-async def generate_leaderboards(db):
+        checkpoint["cursor"] += len(chunk)
+        checkpoint["portfolios"] += len(portfolios)
+        checkpoint["snapshots"] += snapshots
+        checkpoint["unpriced"] = checkpoint.get("unpriced", 0) + unpriced
+        checkpoint["unpriced_symbols"] = sorted(missing)
+        checkpoint["done"] = checkpoint["cursor"] >= len(user_ids)
+        checkpoint.pop("error", None)
+        await _off_loop(checkpoint_ref.set, checkpoint)
+        if progress is not None:
+            progress.users_processed(len(chunk), snapshots)
+
+    return checkpoint
+
+async def publish_if_complete(db, run_id: str) -> bool:
+    """
+    Builds the leaderboards once every shard of the run is done. Safe to call
+    from each shard as it finishes: rebuilding the leaderboards is idempotent.
     """
-    Generates and updates leaderboards for various time windows.
+    run = await _off_loop(get_run, db, run_id)
+    if run is None:
+        return False
+    checkpoints = await _off_loop(get_documents, db, "evaluation_checkpoints", _checkpoint_ids(run))
+    if not all(checkpoints.get(doc_id, {}).get("done") for doc_id in _checkpoint_ids(run)):
+        return False
+
+    await generate_leaderboards(db)
+    await _off_loop(db.collection("evaluation_runs").document(run_id).update, {
+        "status": "published",
+        "published_at": datetime.now(timezone.utc)
+    })
+    return True
+
+async def update_all_portfolios_total_value(db, shard_count: Optional[int] = None, progress=None) -> dict:
     """
-    windows = {
-        "1d": 1,
-        "7d": 7,
-        "30d": 30,
-        "90d": 90
+    Recalculates total_value for all portfolios and snapshots each of them.
+
+    Every distinct symbol across all portfolios is priced once, up front, so all
+    users are valued from the same point-in-time price table. The run's shards
+    are evaluated concurrently in this process; an interrupted run is resumed.
+    Returns run statistics.
+    """
+    run = await start_evaluation_run(db, shard_count)
+    if progress is not None:
+        progress.run_started(run)
+    checkpoints = await asyncio.gather(
+        *(evaluate_shard(db, run, shard, progress) for shard in range(run["shard_count"]))
+    )
+
+    failed = [checkpoint for checkpoint in checkpoints if not checkpoint["done"]]
+    unpriced = sum(checkpoint.get("unpriced", 0) for checkpoint in checkpoints)
+    print(f"Valued {run['portfolios'] - unpriced} portfolios from {len(run['prices'])}/{run['symbols']} priced symbols.")
+    if unpriced:
+        print(f"{unpriced} portfolios hold unpriced symbols and were not valued; re-run the evaluation to fill them in.")
+    return {
+        "run_id": run["run_id"],
+        "resumed": run["resumed"],
+        "shards": run["shard_count"],
+        "complete": not failed,
+        "portfolios": sum(checkpoint["portfolios"] for checkpoint in checkpoints),
+        "symbols": run["symbols"],
+        "priced_symbols": len(run["prices"]),
+        "snapshots": sum(checkpoint["snapshots"] for checkpoint in checkpoints),
+        "unpriced_portfolios": unpriced,
+        "unpriced_symbols": sorted({symbol for checkpoint in checkpoints for symbol in checkpoint.get("unpriced_symbols", [])}),
+        "priced_at": run["priced_at"].isoformat(),
+        "errors": {checkpoint["shard"]: checkpoint["error"] for checkpoint in failed if "error" in checkpoint}
     }
-    
-    users_ref = db.collection("users")
-    users = [doc for doc in users_ref.stream()]
-    
+
+from datetime import timedelta
+from google.cloud.firestore import FieldFilter
+from app.models.leaderboard import Leaderboard, LeaderboardChanges, LeaderboardEntry, LeaderboardPage
+from app.services.leaderboard_index import RankIndex
+from app.services.risk_analytics import RISK_LEADERBOARDS, score_risk_leaderboards
+from app.services.leaderboards import (
+    LEADERBOARDS, LEADERBOARD_CHANGES, LEADERBOARD_PAGES, change_id, diff_rankings, leaderboard_cache, page_id
+)
+from app.services.snapshot_series import SERIES_COLLECTION
+
+WINDOWS = {
+    "1d": 1,
+    "7d": 7,
+    "30d": 30,
+    "90d": 90
+}
+# PPG windows, then the risk leaderboards ranked by score_risk_leaderboards
+BOARDS = [*WINDOWS, *RISK_LEADERBOARDS]
+# Series written up to this long before a leaderboard's updated_at are
+# re-scored too, covering writes that were still in flight while it was built
+CHANGE_MARGIN = timedelta(minutes=5)
+
+def _window_ppgs(series, user_id: str, today: date, start_dates: Dict[str, date]) -> Dict[str, Optional[float]]:
+    current_value = series[(user_id, today.year)].get(today)
+    ppgs = {}
+    for window_name, start_date in start_dates.items():
+        start_value = series[(user_id, start_date.year)].get(start_date)
+        if current_value is not None and start_value is not None:
+            ppgs[window_name] = round(calculate_ppg(current_value, start_value), 2)
+        else:
+            ppgs[window_name] = None
+    return ppgs
+
+def _load_pages(db, head: Optional[dict]) -> Dict[int, dict]:
+    if not head or not head.get("pages"):
+        return {}
+    window = head["id"]
+    docs = get_documents(db, LEADERBOARD_PAGES, [page_id(window, page) for page in range(head["pages"])])
+    return {page: docs[page_id(window, page)] for page in range(head["pages"]) if page_id(window, page) in docs}
+
+def _changed_user_ids(db, since: datetime) -> List[str]:
+    changed_docs = db.collection(SERIES_COLLECTION).where(filter=FieldFilter("updated_at", ">=", since)).stream()
+    return sorted({doc.to_dict()["user_id"] for doc in changed_docs})
+
+def _all_users(db) -> Dict[str, dict]:
+    return {user_doc.id: user_doc.to_dict() for user_doc in db.collection("users").stream()}
+
+async def _publish_window(db, writer, window_name: str, index: RankIndex, usernames: Dict[str, str],
+                          stored_pages: Dict[int, dict], previous_version: int, as_of: date, updated_at: datetime,
+                          metric: str = "ppg", ppgs: Optional[Dict[str, float]] = None) -> int:
+    """
+    Writes the pages holding ranks that moved (skipping any that came out
+    identical), drops pages past the end and rewrites the head document with
+    the top LEADERBOARD_TOP_K under the next version, recording which entries
+    changed since the previous one. Returns the number of pages written.
+
+    The index ranks by PPG, or for other metrics by score, with each user's
+    PPG over the window in ppgs.
+    """
+    page_size = settings.LEADERBOARD_PAGE_SIZE
+    page_count = -(-len(index) // page_size)
+    version = previous_version + 1
+
+    def describe(user_id: str, score: float) -> dict:
+        username = usernames.get(user_id, "Unknown")
+        if ppgs is None:
+            return {"username": username, "ppg": score, "score": None}
+        return {"username": username, "ppg": ppgs[user_id], "score": score}
+
+    def entries(start: int, stop: int) -> List[LeaderboardEntry]:
+        return [
+            LeaderboardEntry(user_id=user_id, rank=start + i + 1, **describe(user_id, score))
+            for i, (user_id, score) in enumerate(index.slice(start, stop))
+        ]
+
+    written = 0
+    for page in sorted(p for p in index.dirty_pages(page_size) if p < page_count):
+        page_entries = entries(page * page_size, (page + 1) * page_size)
+        data = LeaderboardPage(
+            window=window_name, page=page, entries=page_entries, user_ids=[entry.user_id for entry in page_entries]
+        ).model_dump()
+        if stored_pages.get(page) != data:
+            await writer.set(db.collection(LEADERBOARD_PAGES).document(page_id(window_name, page)), data)
+            written += 1
+    for page in stored_pages:
+        if page >= page_count:
+            await writer.delete(db.collection(LEADERBOARD_PAGES).document(page_id(window_name, page)))
+    index.clear_dirty()
+
+    previous = {entry["user_id"]: entry for page in stored_pages.values() for entry in page["entries"]}
+    changed, removed, shifts = diff_rankings(previous, index.slice(0, len(index)), describe)
+    # Before the first version there is nothing to diff against
+    full_reload = previous_version == 0 or \
+        len(changed) + len(removed) + len(shifts) > settings.LEADERBOARD_CHANGES_MAX_ENTRIES
+    changes = LeaderboardChanges(
+        window=window_name,
+        since=previous_version,
+        version=version,
+        updated_at=updated_at,
+        full_reload=full_reload,
+        total=len(index),
+        entries=[] if full_reload else changed,
+        removed=[] if full_reload else removed,
+        shifts=[] if full_reload else shifts
+    )
+    await writer.set(db.collection(LEADERBOARD_CHANGES).document(change_id(window_name, version)), changes.model_dump())
+    expired = version - settings.LEADERBOARD_CHANGES_KEEP
+    if expired > 0:
+        await writer.delete(db.collection(LEADERBOARD_CHANGES).document(change_id(window_name, expired)))
+
+    leaderboard = Leaderboard(
+        id=window_name,
+        updated_at=updated_at,
+        entries=entries(0, settings.LEADERBOARD_TOP_K),
+        as_of=as_of.isoformat(),
+        total=len(index),
+        pages=page_count,
+        page_size=page_size,
+        version=version,
+        metric=metric
+    )
+    await writer.set(db.collection(LEADERBOARDS).document(window_name), leaderboard.model_dump())
+    return written
+
+async def generate_leaderboards(db, incremental: bool = True):
+    """
+    Generates and updates leaderboards for various time windows, ranked by
+    PPG, and the RISK_LEADERBOARDS ranked by risk-adjusted return.
+
+    Each window's full ranking is kept in leaderboard_pages
+    ({window}_{page}, LEADERBOARD_PAGE_SIZE ranks each); the leaderboards
+    document holds the top LEADERBOARD_TOP_K.
+
+    If every window was already built for today, only users whose series
+    changed since then are re-scored: the stored ranking is loaded into a
+    RankIndex, those users are moved, and only the pages whose ranks shifted
+    are rewritten. Otherwise (a new day moves every window) all users are
+    scored from their series, read in get_all batches, and pages that came
+    out unchanged are still skipped.
+    """
     today = date.today()
-    today_str = today.isoformat()
-    
-    for window_name, days in windows.items():
-        start_date_str = (today - timedelta(days=days)).isoformat()
-        entries = []
-        
-        for user_doc in users:
-            user_id = user_doc.id
-            user_data = user_doc.to_dict()
-            username = user_data.get("username", "Unknown")
-            
-            today_snap_ref = db.collection("portfolio_snapshots").document(f"{user_id}_{today_str}")
-            start_snap_ref = db.collection("portfolio_snapshots").document(f"{user_id}_{start_date_str}")
-            
-            today_snap = today_snap_ref.get()
-            start_snap = start_snap_ref.get()
-            
-            if today_snap.exists and start_snap.exists:
-                current_value = today_snap.to_dict().get("total_value", 0.0)
-                start_value = start_snap.to_dict().get("total_value", 0.0)
-                
-                ppg = calculate_ppg(current_value, start_value)
-                
-                entries.append(LeaderboardEntry(
-                    user_id=user_id,
-                    username=username,
-                    ppg=round(ppg, 2),
-                    rank=0 
-                ))
-        
-        entries.sort(key=lambda x: x.ppg, reverse=True)
-        
-        for i, entry in enumerate(entries):
-            entry.rank = i + 1
-            
-        leaderboard = Leaderboard(
-            id=window_name,
-            updated_at=datetime.now(timezone.utc),
-            entries=entries
+    updated_at = datetime.now(timezone.utc)
+    start_dates = {window_name: today - timedelta(days=days) for window_name, days in WINDOWS.items()}
+    longest = max(*WINDOWS.values(), *(days for _, days in RISK_LEADERBOARDS.values()))
+    years = set(range((today - timedelta(days=longest)).year, today.year + 1))
+
+    heads = await _off_loop(get_documents, db, LEADERBOARDS, BOARDS)
+    stored_pages = {board: await _off_loop(_load_pages, db, heads.get(board)) for board in BOARDS}
+    incremental = incremental and all(
+        heads.get(board, {}).get("as_of") == today.isoformat() for board in BOARDS
+    )
+    board_ppgs: Dict[str, Dict[str, float]] = {board: {} for board in RISK_LEADERBOARDS}
+
+    if incremental:
+        indexes, usernames = {}, {}
+        for board in BOARDS:
+            pages = stored_pages[board]
+            ranked = [entry for page in sorted(pages) for entry in pages[page]["entries"]]
+            if board in RISK_LEADERBOARDS:
+                indexes[board] = RankIndex((entry["user_id"], entry["score"]) for entry in ranked)
+                board_ppgs[board].update((entry["user_id"], entry["ppg"]) for entry in ranked)
+            else:
+                indexes[board] = RankIndex((entry["user_id"], entry["ppg"]) for entry in ranked)
+            usernames.update((entry["user_id"], entry["username"]) for entry in ranked)
+        since = min(heads[board]["updated_at"] for board in BOARDS) - CHANGE_MARGIN
+        user_ids = await _off_loop(_changed_user_ids, db, since)
+        users = await _off_loop(get_documents, db, "users", user_ids, settings.FIRESTORE_READ_BATCH_SIZE)
+        usernames.update((user_id, data.get("username", "Unknown")) for user_id, data in users.items())
+    else:
+        users = await _off_loop(_all_users, db)
+        user_ids = list(users)
+        indexes = {board: RankIndex() for board in BOARDS}
+        usernames = {user_id: data.get("username", "Unknown") for user_id, data in users.items()}
+
+    series = await _off_loop(load_series, db, user_ids, years)
+    for user_id in user_ids:
+        for window_name, ppg in _window_ppgs(series, user_id, today, start_dates).items():
+            indexes[window_name].update(user_id, ppg)
+    for board, scores in score_risk_leaderboards(series, user_ids, today).items():
+        for user_id, scored in scores.items():
+            indexes[board].update(user_id, scored[0] if scored else None)
+            if scored:
+                board_ppgs[board][user_id] = scored[1]
+
+    writer = create_batch_writer(db)
+    for board in BOARDS:
+        if not incremental:
+            indexes[board].mark_all_dirty()
+        risk = RISK_LEADERBOARDS.get(board)
+        written = await _publish_window(
+            db, writer, board, indexes[board], usernames, stored_pages[board],
+            heads.get(board, {}).get("version", 0), today, updated_at,
+            metric=risk[0] if risk else "ppg", ppgs=board_ppgs[board] if risk else None
         )
-        
-        db.collection("leaderboards").document(window_name).set(leaderboard.model_dump())
-        print(f"Updated {window_name} leaderboard with {len(entries)} entries.")
+        mode = f"{len(user_ids)} re-scored users" if incremental else "full rebuild"
+        print(f"Updated {board} leaderboard with {len(indexes[board])} entries ({mode}, {written} pages written).")
+
+    stats = await writer.flush()
+    # Other workers pick the new version up when their entries' TTL runs out
+    leaderboard_cache.clear()
+    return stats
@@ -0,0 +1,129 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+from app.models.job import EvaluationJob
+from app.services import evaluation
+
+class JobProgress:
+    """
+    Receives progress from an evaluation run and keeps its job up to date.
+    """
+
+    def __init__(self, job: EvaluationJob, clock: Callable[[], float]):
+        self.job = job
+        self._clock = clock
+        self._started = clock()
+        # Users already done by an earlier attempt of a resumed run
+        self._resumed_users = 0
+
+    def run_started(self, run: dict):
+        self.job.run_id = run["run_id"]
+        self.job.resumed = run["resumed"]
+        self.job.users_total = run["portfolios"]
+        self.job.symbols = run["symbols"]
+        self.job.symbols_priced = len(run["prices"])
+
+    def users_processed(self, count: int, snapshots: int = 0, resumed: bool = False):
+        self.job.users_processed += count
+        self.job.snapshots += snapshots
+        if resumed:
+            self._resumed_users += count
+
+    def eta_seconds(self) -> Optional[float]:
+        """
+        Remaining users at the rate users were processed by this job.
+        """
+        done = self.job.users_processed - self._resumed_users
+        if done <= 0:
+            return None
+        remaining = max(0, self.job.users_total - self.job.users_processed)
+        return round(remaining * (self._clock() - self._started) / done, 1)
+
+class EvaluationJobs:
+    """
+    Runs evaluations as background tasks in this process and keeps the most
+    recent max_jobs of them for polling.
+
+    At most one evaluation runs at a time: submitting while one is queued or
+    running returns that job instead of starting another.
+    """
+
+    def __init__(self, max_jobs: int = 50, clock: Callable[[], float] = time.monotonic):
+        self.max_jobs = max_jobs
+        self._clock = clock
+        self._jobs: "OrderedDict[str, EvaluationJob]" = OrderedDict()
+        self._progress: Dict[str, JobProgress] = {}
+        self._active: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, db) -> Tuple[EvaluationJob, bool]:
+        """
+        Returns the job evaluating now and whether it was started by this call.
+        """
+        if self._active is not None:
+            return self.get(self._active), False
+
+        job = EvaluationJob(id=uuid.uuid4().hex, status="queued", created_at=datetime.now(timezone.utc))
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            old_id, _ = self._jobs.popitem(last=False)
+            self._progress.pop(old_id, None)
+        self._active = job.id
+        self._task = asyncio.ensure_future(self._run(job, db))
+        return self.get(job.id), True
+
+    async def _run(self, job: EvaluationJob, db):
+        try:
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            progress = self._progress[job.id] = JobProgress(job, self._clock)
+            stats = await evaluation.update_all_portfolios_total_value(db, progress=progress)
+            job.errors.extend(f"shard {shard}: {error}" for shard, error in stats["errors"].items())
+            if stats.get("unpriced_portfolios"):
+                job.errors.append(
+                    f"{stats['unpriced_portfolios']} portfolios not valued, no price for "
+                    f"{', '.join(stats['unpriced_symbols'])}; re-run to fill them in"
+                )
+            if stats["complete"]:
+                job.published = await evaluation.publish_if_complete(db, stats["run_id"])
+            job.status = "succeeded" if stats["complete"] else "failed"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.errors.append("Cancelled")
+            raise
+        except Exception as exc:
+            job.status = "failed"
+            job.errors.append(repr(exc))
+            print(f"Evaluation job {job.id} failed: {exc!r}")
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            self._active = None
+            self._task = None
+
+    def get(self, job_id: str) -> Optional[EvaluationJob]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        progress = self._progress.get(job_id)
+        eta = progress.eta_seconds() if progress and job.status == "running" else None
+        return job.model_copy(update={"eta_seconds": eta}, deep=True)
+
+    async def stop(self):
+        task, job_id = self._task, self._active
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        # A task cancelled before it started never ran _run's cleanup
+        if self._active == job_id:
+            job = self._jobs[job_id]
+            job.status = "failed"
+            job.errors.append("Cancelled")
+            job.finished_at = datetime.now(timezone.utc)
+            self._active = None
+            self._task = None
+
+evaluation_jobs = EvaluationJobs()
@@ -0,0 +1,356 @@
+import asyncio
+import time
+import weakref
+import zlib
+from typing import List, Optional
+import numpy as np
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.services import market_data
+from app.services.candle_store import Candles, CandleStore, candles_from_columns, empty_candles, safe_name
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.indicators import IndicatorSpec, indicator_cache
+from app.services.resample import lttb_indices, resample_candles, take
+from app.services.symbols import ensure_known_symbol
+from app.services.upstream_scheduler import Priority
+
+# Seconds per bar for each supported resolution (Finnhub naming)
+RESOLUTION_SECONDS = {
+    "1": 60,
+    "5": 300,
+    "15": 900,
+    "30": 1800,
+    "60": 3600,
+    "D": 86400,
+    "W": 604800,
+    "M": 2592000
+}
+
+# Calendar time per bar is longer than the bar itself because markets close
+# nights, weekends and holidays; used to size the lookback for `limit` bars.
+_LOOKBACK_FACTOR = {"D": 1.6, "W": 1.1, "M": 1.1}
+_INTRADAY_LOOKBACK_FACTOR = 6.0
+
+def resolution_seconds(resolution: str) -> int:
+    """
+    Seconds per bar. Besides the provider's native resolutions, any whole
+    number of minutes (e.g. "2", "240") is accepted and resampled.
+    """
+    if resolution in RESOLUTION_SECONDS:
+        return RESOLUTION_SECONDS[resolution]
+    if resolution.isdigit() and 0 < int(resolution) <= 1440:
+        return int(resolution) * 60
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Unsupported resolution {resolution}"
+    )
+
+def base_resolution_for(resolution: str) -> str:
+    """
+    The coarsest native resolution that evenly divides the requested one.
+    """
+    if resolution in RESOLUTION_SECONDS:
+        return resolution
+    seconds = resolution_seconds(resolution)
+    intraday = [r for r in RESOLUTION_SECONDS if r.isdigit()]
+    return max(
+        (r for r in intraday if seconds % RESOLUTION_SECONDS[r] == 0),
+        key=lambda r: RESOLUTION_SECONDS[r]
+    )
+
+class FinnhubCandleProvider:
+    """
+    Fetches OHLCV bars from Finnhub's /stock/candle endpoint through the shared
+    pooled client and upstream rate limiter.
+    """
+
+    async def fetch_candles(self, symbol: str, resolution: str, start: int, end: int) -> Candles:
+        params = {
+            "symbol": symbol,
+            "resolution": resolution,
+            "from": start,
+            "to": end,
+            "token": settings.FINNHUB_API_KEY
+        }
+        try:
+            response = await market_data.upstream_get(
+                f"{settings.FINNHUB_BASE_URL}/stock/candle", params, Priority.INTERACTIVE
+            )
+        except (market_data.UpstreamError, CircuitOpenError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Could not load history for {symbol}: {e}"
+            )
+
+        data = response.json()
+        if data.get("s") != "ok":
+            return empty_candles()
+        return candles_from_columns(data)
+
+class MockCandleProvider:
+    """
+    Deterministic synthetic bars for local development (FINNHUB_API_KEY=mock-key).
+    Prices are a pure function of (symbol, time), so overlapping fetches agree.
+    """
+
+    async def fetch_candles(self, symbol: str, resolution: str, start: int, end: int) -> Candles:
+        step = RESOLUTION_SECONDS[resolution]
+        first = -(-start // step) * step
+        t = np.arange(first, end + 1, step, dtype=np.int64)
+        if resolution == "D":
+            # 1970-01-01 was a Thursday; keep Monday-Friday only
+            t = t[((t // 86400) + 3) % 7 < 5]
+
+        seed = zlib.crc32(symbol.encode()) % 1000
+        base = 50.0 + seed / 5.0
+
+        def noise(x):
+            value = np.sin(x * 12.9898 + seed * 78.233) * 43758.5453
+            return value - np.floor(value)
+
+        days = t / 86400.0
+        close = base * (1 + 0.15 * np.sin(days / 45.0) + 0.05 * np.sin(days / 7.0)) + (noise(days) - 0.5) * 2
+        open_ = close - (noise(days + 0.5) - 0.5) * 2
+        high = np.maximum(open_, close) + noise(days + 0.25) * 0.5
+        low = np.minimum(open_, close) - noise(days + 0.75) * 0.5
+        volume = np.floor(1000 + noise(days + 0.1) * 4000)
+        return {
+            "t": t,
+            "o": np.round(open_, 2),
+            "h": np.round(high, 2),
+            "l": np.round(low, 2),
+            "c": np.round(close, 2),
+            "v": volume
+        }
+
+candle_store = CandleStore(settings.CANDLE_STORE_DIR)
+history_provider = None
+_fill_locks: "weakref.WeakValueDictionary[tuple, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def get_history_provider():
+    if history_provider is not None:
+        return history_provider
+    if settings.FINNHUB_API_KEY == "mock-key":
+        return MockCandleProvider()
+    return FinnhubCandleProvider()
+
+async def load_candles(
+    symbol: str,
+    resolution: str,
+    limit: int,
+    store: Optional[CandleStore] = None,
+    provider=None,
+    now: Optional[int] = None
+) -> Candles:
+    """
+    Returns the most recent `limit` bars, reading through the persistent store.
+
+    Only ranges the store has not covered yet go upstream: an older start is
+    backfilled, and the tail is refreshed (re-fetching the still-forming last bar)
+    once CANDLE_REFRESH_SECONDS or one bar period has passed. Concurrent loads of
+    the same series share one fill.
+    """
+    if resolution not in RESOLUTION_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported resolution {resolution}"
+        )
+    store = store or candle_store
+    provider = provider or get_history_provider()
+    step = RESOLUTION_SECONDS[resolution]
+    now = int(now if now is not None else time.time())
+    factor = _LOOKBACK_FACTOR.get(resolution, _INTRADAY_LOOKBACK_FACTOR)
+    start = now - int(limit * step * factor)
+
+    ensure_known_symbol(symbol)
+    try:
+        safe_name(symbol)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    # Held by the loads using it, so it is dropped once the fill is done and nobody waits
+    lock = _fill_locks.setdefault((store.root, symbol, resolution), asyncio.Lock())
+    async with lock:
+        coverage = store.coverage(symbol, resolution)
+        if coverage is None:
+            fetched = await provider.fetch_candles(symbol, resolution, start, now)
+            store.merge(symbol, resolution, fetched, start, now)
+        else:
+            if start < coverage["start"]:
+                fetched = await provider.fetch_candles(symbol, resolution, start, coverage["start"] - 1)
+                store.merge(symbol, resolution, fetched, start, coverage["end"])
+            if now - coverage["end"] >= min(step, settings.CANDLE_REFRESH_SECONDS):
+                stored_t = store.query(symbol, resolution, limit=1)["t"]
+                tail_start = int(stored_t[-1]) if len(stored_t) else coverage["end"] + 1
+                fetched = await provider.fetch_candles(symbol, resolution, tail_start, now)
+                store.merge(symbol, resolution, fetched, coverage["start"], now)
+
+    return store.query(symbol, resolution, limit=limit)
+
+def candles_to_records(candles: Candles) -> list:
+    return [
+        {"time": t, "open": o, "high": h, "low": l, "close": c, "volume": int(v)}
+        for t, o, h, l, c, v in zip(
+            candles["t"].tolist(), candles["o"].tolist(), candles["h"].tolist(),
+            candles["l"].tolist(), candles["c"].tolist(), candles["v"].tolist()
+        )
+    ]
+
+async def load_resampled_candles(
+    symbol: str,
+    resolution: str,
+    limit: int,
+    base: Optional[str] = None,
+    points: Optional[int] = None
+) -> Candles:
+    """
+    Bars at any resolution, resampled from a finer stored base when needed,
+    then optionally downsampled to a `points` budget with LTTB on the close.
+
+    base defaults to the coarsest native resolution that divides the target.
+    """
+    seconds = resolution_seconds(resolution)
+    base = base or base_resolution_for(resolution)
+    base_seconds = resolution_seconds(base)
+    if base not in RESOLUTION_SECONDS or base_seconds > seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot build {resolution} bars from {base}"
+        )
+
+    if base == resolution:
+        candles = await load_candles(symbol, resolution, limit)
+    else:
+        # Load enough base bars for `limit` target bars; +1 covers a partial first bucket
+        ratio = max(1, seconds // base_seconds)
+        base_candles = await load_candles(symbol, base, (limit + 1) * ratio)
+        resampled = resample_candles(base_candles, resolution, seconds)
+        candles = {name: values[-limit:] for name, values in resampled.items()}
+
+    if points is not None and points < len(candles["t"]):
+        candles = take(candles, lttb_indices(candles["t"], candles["c"], points))
+    return candles
+
+async def get_market_history(
+    symbol: str,
+    resolution: str,
+    limit: int,
+    base: Optional[str] = None,
+    points: Optional[int] = None,
+    indicators: Optional[List[IndicatorSpec]] = None
+) -> dict:
+    """
+    Bars as chart records, optionally with indicator series aligned to them.
+
+    Indicators are computed on the full-resolution bars, including enough
+    earlier bars to cover their warm-up, before any LTTB downsampling.
+    """
+    if not indicators:
+        candles = await load_resampled_candles(symbol, resolution, limit, base=base, points=points)
+        return {"candles": candles_to_records(candles)}
+
+    warmup = max(spec.warmup for spec in indicators)
+    candles = await load_resampled_candles(symbol, resolution, limit + warmup, base=base)
+    series = {spec.key: indicator_cache.compute(symbol, resolution, spec, candles) for spec in indicators}
+
+    keep = np.arange(max(0, len(candles["t"]) - limit), len(candles["t"]))
+    if points is not None and points < len(keep):
+        keep = keep[lttb_indices(candles["t"][keep], candles["c"][keep], points)]
+
+    return {
+        "candles": candles_to_records(take(candles, keep)),
+        "indicators": {
+            key: {name: _nullable(values[keep]) for name, values in columns.items()}
+            for key, columns in series.items()
+        }
+    }
+
+# Public field names for the column-oriented payload -> store columns
+HISTORY_FIELDS = {
+    "open": "o",
+    "high": "h",
+    "low": "l",
+    "close": "c",
+    "volume": "v"
+}
+
+def parse_fields(fields: str) -> List[str]:
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in HISTORY_FIELDS]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid fields. Choose from {', '.join(HISTORY_FIELDS)}"
+        )
+    return list(dict.fromkeys(requested))
+
+def _nullable(values: np.ndarray) -> list:
+    """
+    Converts a float column to a JSON-safe list, with gaps (NaN) as null.
+    """
+    return [None if value != value else value for value in values.tolist()]
+
+async def get_aligned_history(
+    symbols: List[str],
+    resolution: str,
+    limit: int,
+    fields: List[str],
+    points: Optional[int] = None
+) -> dict:
+    """
+    Loads several series concurrently and aligns them on one shared time axis.
+
+    The axis is the union of bar times, keeping the most recent `limit`. Only the
+    requested fields are returned, column-oriented, with null where a symbol has
+    no bar at that time. Symbols that fail to load are reported under errors.
+    With a `points` budget the axis is downsampled with LTTB on the first
+    symbol's close, so every series keeps the same timestamps.
+    """
+    resolution_seconds(resolution)
+    results = await asyncio.gather(
+        *(load_resampled_candles(symbol, resolution, limit) for symbol in symbols), return_exceptions=True
+    )
+
+    loaded = {}
+    errors = {}
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, HTTPException):
+            errors[symbol] = str(result.detail)
+        elif isinstance(result, Exception):
+            errors[symbol] = str(result) or type(result).__name__
+        else:
+            loaded[symbol] = result
+
+    if loaded:
+        axis = np.unique(np.concatenate([candles["t"] for candles in loaded.values()]))[-limit:]
+    else:
+        axis = np.empty(0, dtype=np.int64)
+
+    aligned = {}
+    for symbol, candles in loaded.items():
+        in_axis = np.isin(candles["t"], axis)
+        positions = np.searchsorted(axis, candles["t"][in_axis])
+        columns = {}
+        for name in set(HISTORY_FIELDS[field] for field in fields) | {"c"}:
+            column = np.full(len(axis), np.nan)
+            column[positions] = candles[name][in_axis]
+            columns[name] = column
+        aligned[symbol] = columns
+
+    if points is not None and points < len(axis):
+        main_close = aligned[next(s for s in symbols if s in aligned)]["c"]
+        keep = lttb_indices(axis, main_close, points)
+        axis = axis[keep]
+        aligned = {symbol: {name: column[keep] for name, column in columns.items()} for symbol, columns in aligned.items()}
+
+    series = {
+        symbol: {field: _nullable(columns[HISTORY_FIELDS[field]]) for field in fields}
+        for symbol, columns in aligned.items()
+    }
+
+    return {
+        "resolution": resolution,
+        "t": axis.tolist(),
+        "series": series,
+        "errors": errors
+    }
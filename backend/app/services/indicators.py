@@ -0,0 +1,343 @@
+import math
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.services.candle_store import Candles
+
+Columns = Dict[str, np.ndarray]
+
+MAX_INDICATORS_PER_REQUEST = 10
+MAX_PERIOD = 1000
+
+def ema_filter(x: np.ndarray, alpha: float, initial: Optional[float] = None) -> np.ndarray:
+    """
+    Exponential smoothing y[i] = alpha * x[i] + (1 - alpha) * y[i - 1], vectorized.
+
+    Uses the closed form y[k] = d^(k+1) * (y0 + alpha * sum(x[j] / d^(j+1))) with
+    d = 1 - alpha, in blocks short enough that d^-k stays within float range.
+    The series is seeded with `initial`, or with x[0] when there is no prior value.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty(len(x))
+    if len(x) == 0:
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[:] = x
+        return out
+
+    prev = x[0] if initial is None else initial
+    block = max(1, int(200 / -math.log10(decay)))
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        out[start:start + len(chunk)] = powers * (prev + alpha * np.cumsum(chunk / powers))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    sums = np.concatenate(([0.0], np.cumsum(x)))
+    return sums[window:] - sums[:-window]
+
+def _rolling(history: np.ndarray, values: np.ndarray, window: int, reducer) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Applies reducer(x, window) to every full trailing window ending at a new value.
+    history holds up to window - 1 earlier values; values without a full window are NaN.
+    Returns (results, history for the next call).
+    """
+    x = np.concatenate((history, values))
+    out = np.full(len(values), np.nan)
+    if len(x) >= window:
+        reduced = reducer(x, window)
+        out[len(out) - len(reduced):] = reduced
+    return out, x[max(0, len(x) - window + 1):]
+
+def _mask_warmup(values: np.ndarray, count: int, warmup: int) -> np.ndarray:
+    """
+    NaN for bars whose position in the series (count = bars seen before these) is below warmup.
+    """
+    values = values.copy()
+    values[:max(0, warmup - count)] = np.nan
+    return values
+
+# Each compute function takes only the new bars plus the state returned by the
+# previous call (an empty dict to start), and returns (columns, next state).
+
+def _sma(candles: Candles, params: tuple, state: dict):
+    (period,) = params
+    sma, window = _rolling(state.get("window", np.empty(0)), candles["c"], period, lambda x, w: _rolling_sum(x, w) / w)
+    return {"sma": sma}, {"window": window}
+
+def _ema(candles: Candles, params: tuple, state: dict):
+    (period,) = params
+    close = candles["c"]
+    count = state.get("count", 0)
+    ema = ema_filter(close, 2.0 / (period + 1), state.get("value"))
+    next_state = {"count": count + len(close), "value": ema[-1] if len(close) else state.get("value")}
+    return {"ema": _mask_warmup(ema, count, period - 1)}, next_state
+
+def _rsi(candles: Candles, params: tuple, state: dict):
+    """
+    Wilder's RSI: gains and losses smoothed with alpha = 1 / period.
+    """
+    (period,) = params
+    close = candles["c"]
+    count = state.get("count", 0)
+    prev_close = state.get("prev_close")
+
+    if prev_close is None:
+        deltas = np.diff(close)
+    else:
+        deltas = np.diff(np.concatenate(([prev_close], close)))
+    avg_gain = ema_filter(np.maximum(deltas, 0), 1.0 / period, state.get("gain"))
+    avg_loss = ema_filter(np.maximum(-deltas, 0), 1.0 / period, state.get("loss"))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+
+    # The very first bar has no previous close and therefore no value
+    rsi = np.concatenate((np.full(len(close) - len(rsi), np.nan), rsi))
+    next_state = {
+        "count": count + len(close),
+        "prev_close": close[-1] if len(close) else prev_close,
+        "gain": avg_gain[-1] if len(avg_gain) else state.get("gain"),
+        "loss": avg_loss[-1] if len(avg_loss) else state.get("loss")
+    }
+    return {"rsi": _mask_warmup(rsi, count, period)}, next_state
+
+def _macd(candles: Candles, params: tuple, state: dict):
+    fast_period, slow_period, signal_period = params
+    close = candles["c"]
+    count = state.get("count", 0)
+
+    fast = ema_filter(close, 2.0 / (fast_period + 1), state.get("fast"))
+    slow = ema_filter(close, 2.0 / (slow_period + 1), state.get("slow"))
+    macd = fast - slow
+    signal = ema_filter(macd, 2.0 / (signal_period + 1), state.get("signal"))
+
+    next_state = {"count": count + len(close)}
+    for name, series in (("fast", fast), ("slow", slow), ("signal", signal)):
+        next_state[name] = series[-1] if len(series) else state.get(name)
+
+    macd_warmup = slow_period - 1
+    signal_warmup = macd_warmup + signal_period - 1
+    return {
+        "macd": _mask_warmup(macd, count, macd_warmup),
+        "signal": _mask_warmup(signal, count, signal_warmup),
+        "histogram": _mask_warmup(macd - signal, count, signal_warmup)
+    }, next_state
+
+def _bbands(candles: Candles, params: tuple, state: dict):
+    period, width = params
+    history = state.get("window", np.empty(0))
+    middle, window = _rolling(history, candles["c"], period, lambda x, w: _rolling_sum(x, w) / w)
+    std, _ = _rolling(history, candles["c"], period, lambda x, w: sliding_window_view(x, w).std(axis=1))
+    return {
+        "middle": middle,
+        "upper": middle + width * std,
+        "lower": middle - width * std
+    }, {"window": window}
+
+def _vwap(candles: Candles, params: tuple, state: dict):
+    """
+    Session VWAP resetting at each UTC day (period 0), or a rolling VWAP over
+    `period` bars, which is the useful form on daily and longer bars.
+    """
+    (period,) = params
+    price_volume = (candles["h"] + candles["l"] + candles["c"]) / 3 * candles["v"]
+    volume = np.asarray(candles["v"], dtype=np.float64)
+
+    if period > 0:
+        pv_sum, pv_window = _rolling(state.get("pv_window", np.empty(0)), price_volume, period, _rolling_sum)
+        v_sum, v_window = _rolling(state.get("v_window", np.empty(0)), volume, period, _rolling_sum)
+        next_state = {"pv_window": pv_window, "v_window": v_window}
+    else:
+        day = np.asarray(candles["t"]) // 86400
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(day)) + 1)) if len(day) else np.empty(0, dtype=np.int64)
+        segment = np.cumsum(np.isin(np.arange(len(day)), starts)) - 1
+
+        pv_sum = np.cumsum(price_volume)
+        v_sum = np.cumsum(volume)
+        pv_sum = pv_sum - (pv_sum - price_volume)[starts][segment]
+        v_sum = v_sum - (v_sum - volume)[starts][segment]
+        # The first session continues the one the previous call ended in
+        if len(day) and state.get("day") == day[0]:
+            first = segment == 0
+            pv_sum[first] += state["pv"]
+            v_sum[first] += state["v"]
+
+        next_state = state
+        if len(day):
+            next_state = {"day": day[-1], "pv": pv_sum[-1], "v": v_sum[-1]}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = np.where(v_sum > 0, pv_sum / v_sum, np.nan)
+    return {"vwap": vwap}, next_state
+
+class _Indicator(NamedTuple):
+    compute: Callable
+    # (type, default) per positional parameter
+    params: Tuple[Tuple[type, float], ...]
+    outputs: Tuple[str, ...]
+    # Leading bars without a value, given the parameters
+    warmup: Callable[[tuple], int]
+
+INDICATORS = {
+    "sma": _Indicator(_sma, ((int, 20),), ("sma",), lambda p: p[0] - 1),
+    "ema": _Indicator(_ema, ((int, 20),), ("ema",), lambda p: p[0] - 1),
+    "rsi": _Indicator(_rsi, ((int, 14),), ("rsi",), lambda p: p[0]),
+    "macd": _Indicator(_macd, ((int, 12), (int, 26), (int, 9)), ("macd", "signal", "histogram"), lambda p: p[1] + p[2] - 2),
+    "bbands": _Indicator(_bbands, ((int, 20), (float, 2.0)), ("middle", "upper", "lower"), lambda p: p[0] - 1),
+    "vwap": _Indicator(_vwap, ((int, 0),), ("vwap",), lambda p: max(0, p[0] - 1))
+}
+
+class IndicatorSpec(NamedTuple):
+    key: str  # as requested, e.g. "macd:12:26:9"
+    name: str
+    params: tuple
+
+    @property
+    def warmup(self) -> int:
+        return INDICATORS[self.name].warmup(self.params)
+
+def _invalid(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+def parse_indicators(indicators: str) -> List[IndicatorSpec]:
+    """
+    Parses e.g. "sma:20,ema:50,rsi,macd:12:26:9,bbands:20:2,vwap". Omitted
+    parameters take their defaults.
+    """
+    specs = []
+    for token in dict.fromkeys(token.strip() for token in indicators.split(",") if token.strip()):
+        name, *raw = token.lower().split(":")
+        definition = INDICATORS.get(name)
+        if definition is None:
+            raise _invalid(f"Unknown indicator {name}. Choose from {', '.join(INDICATORS)}")
+        if len(raw) > len(definition.params):
+            raise _invalid(f"Too many parameters for {name}")
+
+        params = []
+        for i, (kind, default) in enumerate(definition.params):
+            try:
+                value = kind(raw[i]) if i < len(raw) else default
+            except ValueError:
+                raise _invalid(f"Invalid parameter {raw[i]} for {name}")
+            if value < 0 or (value == 0 and name != "vwap") or (kind is int and value > MAX_PERIOD):
+                raise _invalid(f"Invalid parameter {raw[i]} for {name}")
+            params.append(value)
+        specs.append(IndicatorSpec(token, name, tuple(params)))
+
+    if not specs:
+        raise _invalid("No indicators provided")
+    if len(specs) > MAX_INDICATORS_PER_REQUEST:
+        raise _invalid(f"Too many indicators (max {MAX_INDICATORS_PER_REQUEST})")
+    return specs
+
+def _slice(candles: Candles, start: int, end: int) -> Candles:
+    return {name: np.asarray(values[start:end]) for name, values in candles.items()}
+
+class _Entry:
+    def __init__(self, t: np.ndarray, columns: Columns, state: dict):
+        self.t = t
+        self.columns = columns
+        # Indicator state as of the bar before the last one
+        self.state = state
+
+class IndicatorCache:
+    """
+    Computed indicator series per (symbol, resolution, indicator, params).
+
+    The last bar of a series may still be forming, so each entry keeps the
+    indicator state as of the bar before it. When the same series is requested
+    again, only the last cached bar and any newer ones are computed from that
+    state; everything earlier is reused. A request reaching further back than
+    the entry, or with a gap against it, is computed in full.
+    """
+
+    def __init__(self, max_size: int = 1000, max_bars: int = 50000):
+        self.max_size = max_size
+        self.max_bars = max_bars
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+
+        self.full_computes = 0
+        self.incremental_updates = 0
+        self.bars_computed = 0
+        self.evictions = 0
+
+    def _compute(self, spec: IndicatorSpec, candles: Candles, state: dict) -> Tuple[Columns, dict]:
+        """
+        Computes the given bars and returns (columns, state before the last bar).
+        """
+        compute = INDICATORS[spec.name].compute
+        count = len(candles["t"])
+        head, state = compute(_slice(candles, 0, count - 1), spec.params, state)
+        tail, _ = compute(_slice(candles, count - 1, count), spec.params, state)
+        self.bars_computed += count
+        return {name: np.concatenate((head[name], tail[name])) for name in head}, state
+
+    def _extend(self, entry: Optional[_Entry], spec: IndicatorSpec, candles: Candles) -> Optional[_Entry]:
+        t = candles["t"]
+        if entry is None or len(entry.t) == 0 or t[0] < entry.t[0]:
+            return None
+        last = int(np.searchsorted(t, entry.t[-1]))
+        first = int(np.searchsorted(entry.t, t[0]))
+        # The requested bars must line up with the cached ones up to the cached last bar
+        if last >= len(t) or t[last] != entry.t[-1] or len(entry.t) - 1 - first != last:
+            return None
+
+        columns, state = self._compute(spec, _slice(candles, last, len(t)), entry.state)
+        return _Entry(
+            np.concatenate((entry.t[:-1], t[last:])),
+            {name: np.concatenate((entry.columns[name][:-1], columns[name])) for name in columns},
+            state
+        )
+
+    def compute(self, symbol: str, resolution: str, spec: IndicatorSpec, candles: Candles) -> Columns:
+        """
+        Indicator columns aligned with candles, reusing and extending the cached series.
+        """
+        t = np.asarray(candles["t"])
+        if len(t) == 0:
+            return {name: np.empty(0) for name in INDICATORS[spec.name].outputs}
+
+        key = (symbol, resolution, spec.name, spec.params)
+        entry = self._extend(self._entries.get(key), spec, candles)
+        if entry is not None:
+            self.incremental_updates += 1
+        else:
+            self.full_computes += 1
+            columns, state = self._compute(spec, candles, {})
+            entry = _Entry(t, columns, state)
+
+        keep = max(self.max_bars, len(t))
+        if len(entry.t) > keep:
+            entry.t = entry.t[-keep:]
+            entry.columns = {name: values[-keep:] for name, values in entry.columns.items()}
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        positions = np.searchsorted(entry.t, t)
+        return {name: values[positions] for name, values in entry.columns.items()}
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "full_computes": self.full_computes,
+            "incremental_updates": self.incremental_updates,
+            "bars_computed": self.bars_computed,
+            "evictions": self.evictions
+        }
+
+indicator_cache = IndicatorCache(settings.INDICATOR_CACHE_MAX_SIZE, settings.INDICATOR_CACHE_MAX_BARS)
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from app.models.leaderboard import Leaderboard
+from app.services.quote_cache import FetchAbandoned
+
+Key = Tuple[str, int, int]
+
+class CachedLeaderboard:
+    """
+    One serialized leaderboard range. `version` is the window's updated_at,
+    which changes only when an evaluation publishes.
+    """
+    __slots__ = ("version", "etag", "body", "checked_at")
+
+    def __init__(self, version: str, etag: str, body: bytes, checked_at: float):
+        self.version = version
+        self.etag = etag
+        self.body = body
+        self.checked_at = checked_at
+
+def leaderboard_etag(key: Key, version: str) -> str:
+    window, offset, limit = key
+    # Strong: the same version and range always serialize to the same bytes
+    return f'"{window}-{version}-{offset}-{limit}"'
+
+class LeaderboardCache:
+    """
+    In-process cache of serialized leaderboard responses keyed by (window,
+    offset, limit), with LRU eviction.
+
+    An entry is served without touching Firestore for `ttl` seconds, then
+    revalidated: the leaderboard is read again, and if its version has not
+    changed the cached bytes (and ETag) are kept. Concurrent fills of the
+    same key are coalesced into one read, so a burst of requests right after
+    a publish costs one load; if its caller is cancelled, a waiter takes over.
+    """
+
+    def __init__(self, ttl: float, max_size: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[Key, CachedLeaderboard]" = OrderedDict()
+        self._inflight: Dict[Key, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Key) -> Optional[CachedLeaderboard]:
+        """
+        The cached entry if it was loaded or revalidated within the TTL.
+        """
+        entry = self._entries.get(key)
+        if entry is None or self._clock() - entry.checked_at > self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def clear(self):
+        """
+        Drops every entry, e.g. after this process published new leaderboards.
+        """
+        self._entries.clear()
+
+    def _store(self, key: Key, leaderboard: Leaderboard) -> CachedLeaderboard:
+        version = leaderboard.updated_at.isoformat()
+        previous = self._entries.get(key)
+        if previous is not None and previous.version == version:
+            self.revalidated += 1
+            previous.checked_at = self._clock()
+            entry = previous
+        else:
+            body = leaderboard.model_dump_json().encode()
+            entry = CachedLeaderboard(version, leaderboard_etag(key, version), body, self._clock())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def get_or_load(
+        self,
+        key: Key,
+        load: Callable[[], Awaitable[Optional[Leaderboard]]]
+    ) -> Optional[CachedLeaderboard]:
+        """
+        The cached entry, or the result of load() (None if the leaderboard
+        does not exist, which is not cached).
+        """
+        while True:
+            entry = self.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                # Shield so one waiter being cancelled does not cancel the shared load
+                return await asyncio.shield(inflight)
+            except FetchAbandoned:
+                # The leader was cancelled; the first waiter back takes over
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            leaderboard = await load()
+            entry = self._store(key, leaderboard) if leaderboard is not None else None
+        except asyncio.CancelledError:
+            # Only the leader's request went away: its waiters retry the load
+            future.set_exception(FetchAbandoned(key))
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark as retrieved so a load with no waiters does not log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(entry)
+            return entry
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "revalidated": self.revalidated,
+            "inflight": len(self._inflight),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,87 @@
+import bisect
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+class RankIndex:
+    """
+    Order-statistic index of users by score, highest first (ties by user_id).
+
+    Keys live in one sorted array, so rank lookups and the position of an
+    update are binary searches; moving a user is a pop and an insort (a
+    memmove, fast even at 100k users). Every update records the span of ranks
+    it shifted, so only the pages covering those ranks need rewriting.
+    """
+
+    def __init__(self, scores: Iterable[Tuple[str, float]] = ()):
+        self._scores: Dict[str, float] = dict(scores)
+        self._keys: List[Tuple[float, str]] = sorted((-score, user_id) for user_id, score in self._scores.items())
+        self._dirty: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._scores
+
+    def score(self, user_id: str) -> Optional[float]:
+        return self._scores.get(user_id)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """
+        1-based rank, or None if the user is not ranked.
+        """
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._keys, (-score, user_id)) + 1
+
+    def _remove(self, user_id: str) -> Optional[int]:
+        score = self._scores.pop(user_id, None)
+        if score is None:
+            return None
+        i = bisect.bisect_left(self._keys, (-score, user_id))
+        del self._keys[i]
+        return i
+
+    def update(self, user_id: str, score: Optional[float]):
+        """
+        Sets a user's score; None removes the user from the ranking.
+        """
+        if score is not None and self._scores.get(user_id) == score:
+            return
+        old = self._remove(user_id)
+        if score is None:
+            if old is not None:
+                # Everyone below moves up one rank
+                self._dirty.append((old, len(self._keys)))
+            return
+        key = (-score, user_id)
+        new = bisect.bisect_left(self._keys, key)
+        self._keys.insert(new, key)
+        self._scores[user_id] = score
+        if old is None:
+            # Everyone below moves down one rank
+            self._dirty.append((new, len(self._keys) - 1))
+        else:
+            self._dirty.append((min(old, new), max(old, new)))
+
+    def slice(self, start: int, stop: int) -> List[Tuple[str, float]]:
+        """
+        (user_id, score) pairs ranked start + 1 to stop.
+        """
+        return [(user_id, -negative) for negative, user_id in self._keys[start:stop]]
+
+    def dirty_pages(self, page_size: int) -> Set[int]:
+        """
+        Pages (0-based, page_size ranks each) holding ranks shifted by updates
+        since the last clear_dirty().
+        """
+        pages = set()
+        for lo, hi in self._dirty:
+            pages.update(range(lo // page_size, hi // page_size + 1))
+        return pages
+
+    def mark_all_dirty(self):
+        self._dirty = [(0, max(0, len(self._keys) - 1))]
+
+    def clear_dirty(self):
+        self._dirty = []
@@ -0,0 +1,214 @@
+import asyncio
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from google.cloud.firestore import FieldFilter
+from app.core.config import settings
+from app.db.firestore import get_documents
+from app.models.leaderboard import Leaderboard, LeaderboardChanges, LeaderboardEntry, LeaderboardStanding, RankShift
+from app.services.leaderboard_cache import CachedLeaderboard, LeaderboardCache
+
+# leaderboards/{window}: the top LEADERBOARD_TOP_K and page counts;
+# leaderboard_pages/{window}_{page}: the full ranking, page_size ranks each;
+# leaderboard_changes/{window}_{version}: what that version's publish changed
+LEADERBOARDS = "leaderboards"
+LEADERBOARD_PAGES = "leaderboard_pages"
+LEADERBOARD_CHANGES = "leaderboard_changes"
+
+leaderboard_cache = LeaderboardCache(ttl=settings.LEADERBOARD_CACHE_TTL, max_size=settings.LEADERBOARD_CACHE_MAX_SIZE)
+
+def page_id(window: str, page: int) -> str:
+    return f"{window}_{page}"
+
+def change_id(window: str, version: int) -> str:
+    return f"{window}_{version}"
+
+def get_leaderboard(db, window: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Leaderboard]:
+    """
+    The window's leaderboard with entries ranked offset + 1 to offset + limit
+    (the stored top entries if limit is None). Ranges within the top entries
+    are served from the window document alone; others add one get_all for the
+    pages they cover.
+    """
+    doc = db.collection(LEADERBOARDS).document(window).get()
+    if not doc.exists:
+        return None
+    leaderboard = Leaderboard(**doc.to_dict())
+    if limit is None:
+        return leaderboard
+    stop = offset + limit
+    if stop <= len(leaderboard.entries) or not leaderboard.page_size:
+        leaderboard.entries = leaderboard.entries[offset:stop]
+        return leaderboard
+
+    stop = min(stop, leaderboard.total)
+    pages = range(offset // leaderboard.page_size, -(-stop // leaderboard.page_size))
+    docs = get_documents(db, LEADERBOARD_PAGES, [page_id(window, page) for page in pages])
+    entries = [
+        LeaderboardEntry(**entry)
+        for page in pages if page_id(window, page) in docs
+        for entry in docs[page_id(window, page)]["entries"]
+    ]
+    leaderboard.entries = [entry for entry in entries if offset < entry.rank <= stop]
+    return leaderboard
+
+async def get_cached_leaderboard(db, window: str, offset: int, limit: int) -> Optional[CachedLeaderboard]:
+    """
+    The serialized range from leaderboard_cache, reading Firestore (off the
+    event loop) only on a miss or once the entry's TTL has passed.
+    """
+    async def load():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, get_leaderboard, db, window, offset, limit)
+
+    return await leaderboard_cache.get_or_load((window, offset, limit), load)
+
+def get_standing(db, window: str, user_id: str, neighbours: int = 2) -> Optional[LeaderboardStanding]:
+    """
+    A user's rank and PPG with up to `neighbours` entries either side, or None
+    if the user is not ranked. The page holding the user is found with one
+    array-contains query on its user_ids (served by the leaderboard_pages
+    composite index in firestore.indexes.json); a neighbouring page is only
+    read when the user sits near a page edge.
+    """
+    pages = db.collection(LEADERBOARD_PAGES) \
+        .where(filter=FieldFilter("window", "==", window)) \
+        .where(filter=FieldFilter("user_ids", "array_contains", user_id)) \
+        .limit(1).stream()
+    page = next((doc.to_dict() for doc in pages), None)
+    if page is None:
+        return None
+    entries: List[LeaderboardEntry] = [LeaderboardEntry(**entry) for entry in page["entries"]]
+    i = next(i for i, entry in enumerate(entries) if entry.user_id == user_id)
+
+    extra = []
+    if i < neighbours and page["page"] > 0:
+        extra.append(page["page"] - 1)
+    if len(entries) - 1 - i < neighbours:
+        extra.append(page["page"] + 1)
+    if extra:
+        docs = get_documents(db, LEADERBOARD_PAGES, [page_id(window, p) for p in extra])
+        for doc in docs.values():
+            entries.extend(LeaderboardEntry(**entry) for entry in doc["entries"])
+        entries.sort(key=lambda entry: entry.rank)
+        i = next(i for i, entry in enumerate(entries) if entry.user_id == user_id)
+
+    entry = entries[i]
+    return LeaderboardStanding(
+        window=window,
+        user_id=user_id,
+        username=entry.username,
+        ppg=entry.ppg,
+        rank=entry.rank,
+        above=entries[max(0, i - neighbours):i],
+        below=entries[i + 1:i + 1 + neighbours]
+    )
+
+def diff_rankings(
+    previous: Dict[str, dict],
+    ranking: Iterable[Tuple[str, float]],
+    describe: Callable[[str, float], dict]
+) -> Tuple[List[LeaderboardEntry], List[str], List[RankShift]]:
+    """
+    The LeaderboardChanges (entries, removed, shifts) that turn the previous
+    entries (by user_id) into `ranking`, (user_id, score) pairs best first.
+    describe(user_id, score) gives the other LeaderboardEntry fields
+    (username, ppg, score); a user whose fields changed is a changed entry.
+
+    Users whose score did not change keep their relative order, so the
+    distance each of them moved only changes where a changed user was
+    inserted or removed between them: one shift per such boundary.
+    """
+    entries, unchanged, ranked = [], [], set()
+    for i, (user_id, score) in enumerate(ranking):
+        ranked.add(user_id)
+        fields = describe(user_id, score)
+        old = previous.get(user_id)
+        if old is None or any(old.get(name) != value for name, value in fields.items()):
+            entries.append(LeaderboardEntry(user_id=user_id, rank=i + 1, **fields))
+        else:
+            unchanged.append((old["rank"], i + 1))
+    removed = sorted(user_id for user_id in previous if user_id not in ranked)
+
+    shifts, last = [], 0
+    for old_rank, new_rank in sorted(unchanged):
+        if new_rank - old_rank != last:
+            last = new_rank - old_rank
+            shifts.append(RankShift(from_rank=old_rank, delta=last))
+    return entries, removed, shifts
+
+def shift_at(shifts: List[RankShift], rank: int) -> int:
+    i = bisect.bisect_right([shift.from_rank for shift in shifts], rank)
+    return shifts[i - 1].delta if i else 0
+
+def compose_shifts(first: List[RankShift], second: List[RankShift]) -> List[RankShift]:
+    """
+    Shifts moving rank r to r' + second(r') where r' = r + first(r), i.e.
+    `first` followed by `second`.
+    """
+    starts = [shift.from_rank for shift in second]
+    segments = [(1, 0)] + [(shift.from_rank, shift.delta) for shift in first]
+    composed = []
+    for i, (start, delta) in enumerate(segments):
+        end = segments[i + 1][0] if i + 1 < len(segments) else None
+        if end is not None and end <= start:
+            continue
+        composed.append((start, delta + shift_at(second, start + delta)))
+        # Breakpoints of `second` that land inside this segment once shifted
+        lo = bisect.bisect_right(starts, start + delta)
+        hi = bisect.bisect_left(starts, end + delta) if end is not None else len(starts)
+        composed.extend((starts[j] - delta, delta + second[j].delta) for j in range(lo, hi))
+
+    shifts, last = [], 0
+    for from_rank, delta in composed:
+        if delta != last:
+            shifts.append(RankShift(from_rank=from_rank, delta=delta))
+            last = delta
+    return shifts
+
+def get_changes(db, window: str, since: int) -> Optional[LeaderboardChanges]:
+    """
+    Everything that changed in the window after version `since`, merged from
+    the change sets of each later version (read in one get_all), or None if
+    the window has never been published. Clients that are ahead, too far
+    behind, or whose versions include a full rebuild get full_reload.
+    """
+    doc = db.collection(LEADERBOARDS).document(window).get()
+    if not doc.exists:
+        return None
+    head = Leaderboard(**doc.to_dict())
+    result = LeaderboardChanges(window=window, since=since, version=head.version, updated_at=head.updated_at, total=head.total)
+    if since == head.version:
+        return result
+    if since > head.version or head.version - since > settings.LEADERBOARD_CHANGES_KEEP:
+        result.full_reload = True
+        return result
+
+    versions = range(since + 1, head.version + 1)
+    docs = get_documents(db, LEADERBOARD_CHANGES, [change_id(window, version) for version in versions])
+    entries: Dict[str, LeaderboardEntry] = {}
+    removed = set()
+    shifts: List[RankShift] = []
+    for version in versions:
+        data = docs.get(change_id(window, version))
+        if data is None or data["full_reload"]:
+            result.full_reload = True
+            return result
+        changes = LeaderboardChanges(**data)
+        # Entries from earlier versions that this one left alone move with everyone else
+        for entry in entries.values():
+            entry.rank += shift_at(changes.shifts, entry.rank)
+        for user_id in changes.removed:
+            entries.pop(user_id, None)
+            removed.add(user_id)
+        for entry in changes.entries:
+            entries[entry.user_id] = entry
+            removed.discard(entry.user_id)
+        shifts = compose_shifts(shifts, changes.shifts)
+
+    if len(entries) + len(removed) + len(shifts) > settings.LEADERBOARD_CHANGES_MAX_ENTRIES:
+        result.full_reload = True
+        return result
+    result.entries = sorted(entries.values(), key=lambda entry: entry.rank)
+    result.removed = sorted(removed)
+    result.shifts = shifts
+    return result
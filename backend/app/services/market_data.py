@@ -1,15 +1,340 @@
+import asyncio
+import time
 import httpx
+from typing import Iterable, List, Optional
 from app.core.config import settings
-from app.models.market import StockQuote
+from app.models.market import StockQuote, StockQuoteBatch
+from app.services import indicators, price_stream
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.price_broadcast import PriceBroadcaster
+from app.services.quote_cache import QuoteCache
+from app.services.quote_hedging import HedgedQuoteFetcher
+from app.services.upstream_scheduler import Priority, UpstreamScheduler
 from fastapi import HTTPException, status
 
-async def get_real_time_quote(symbol: str) -> StockQuote:
-    url = "https://finnhub.io/api/v1/quote"
-    params = {
-        "symbol": symbol,
-        "token": settings.FINNHUB_API_KEY
+# Process-wide client shared by every upstream call. It is created in the app
+# lifespan (app.main) so quotes reuse pooled keep-alive connections instead of
+# paying a new TCP/TLS handshake each time.
+_http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Builds an AsyncClient configured from settings (pool limits, timeouts, HTTP/2).
+    """
+    limits = httpx.Limits(
+        max_connections=settings.MARKET_DATA_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.MARKET_DATA_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.MARKET_DATA_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(
+        settings.MARKET_DATA_TIMEOUT,
+        connect=settings.MARKET_DATA_CONNECT_TIMEOUT
+    )
+
+    http2 = settings.MARKET_DATA_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401 - optional dependency of httpx[http2]
+        except ImportError:
+            print("MARKET_DATA_HTTP2 is set but 'h2' is not installed. Falling back to HTTP/1.1.")
+            http2 = False
+
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+def set_http_client(client: Optional[httpx.AsyncClient]):
+    """
+    Injects the shared client (called from the app lifespan, or by tests/scripts).
+    """
+    global _http_client
+    _http_client = client
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared client, creating one lazily when running outside the app
+    lifespan (e.g. scripts that call the services directly).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+quote_cache = QuoteCache(ttl=settings.QUOTE_CACHE_TTL, max_size=settings.QUOTE_CACHE_MAX_SIZE)
+
+upstream_scheduler = UpstreamScheduler(
+    rate_per_minute=settings.FINNHUB_CALLS_PER_MINUTE,
+    burst=settings.FINNHUB_BURST,
+    batch_reserve=settings.UPSTREAM_BATCH_RESERVE
+)
+
+upstream_breaker = CircuitBreaker(
+    failure_threshold=settings.UPSTREAM_FAILURE_THRESHOLD,
+    reset_timeout=settings.UPSTREAM_RESET_TIMEOUT
+)
+
+class UpstreamError(Exception):
+    """
+    The upstream could not be reached or answered with an error status.
+    """
+
+async def upstream_get(
+    url: str,
+    params: dict,
+    priority: Priority = Priority.INTERACTIVE,
+    client: Optional[httpx.AsyncClient] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    scheduler: Optional[UpstreamScheduler] = None
+) -> httpx.Response:
+    """
+    GET against a market-data upstream through its circuit breaker and rate
+    limiter (Finnhub's by default). Returns the response on 200 and raises
+    UpstreamError otherwise.
+
+    Transport errors, timeouts, 5xx and 429 count as upstream failures; other
+    statuses (e.g. a bad request) do not trip the breaker.
+    """
+    breaker = breaker or upstream_breaker
+    scheduler = scheduler or upstream_scheduler
+    breaker.before_call()
+    client = client or get_http_client()
+    await scheduler.acquire(priority)
+    try:
+        response = await client.get(url, params=params)
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        raise UpstreamError(f"{type(e).__name__} calling upstream") from e
+
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    if response.status_code != 200:
+        print(f"Finnhub Error: {response.status_code} - {response.text}") # Debug logging
+        raise UpstreamError(f"Upstream returned {response.status_code}")
+    return response
+
+async def get_real_time_quote(
+    symbol: str,
+    client: Optional[httpx.AsyncClient] = None,
+    max_age: Optional[float] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    max_stale_age: Optional[float] = None
+) -> StockQuote:
+    """
+    Returns a quote for symbol, served from the in-process cache when it is fresh.
+
+    max_age tightens the freshness bound below the cache TTL (trades use this);
+    concurrent misses for the same symbol share a single upstream request.
+    priority selects the upstream rate-limit lane used on a cache miss.
+
+    When streaming ingestion is running, a fresh streamed price is served first.
+
+    If the upstream is failing or its circuit is open, the last good quote is
+    returned marked stale, provided it is no older than max_stale_age
+    (defaults to QUOTE_STALE_MAX_AGE); otherwise this raises 503.
+    """
+    if price_stream.ingestor is not None:
+        price_stream.ingestor.watch([symbol])
+        stream_max_age = settings.PRICE_STREAM_MAX_AGE
+        if max_age is not None:
+            stream_max_age = min(stream_max_age, max_age)
+        quote = price_stream.price_table.get_quote(symbol, stream_max_age)
+        if quote is not None:
+            return quote
+
+    try:
+        return await quote_cache.get_or_fetch(
+            symbol, lambda: _fetch_quote(symbol, client, priority), max_age=max_age, rank=priority
+        )
+    except (UpstreamError, CircuitOpenError) as e:
+        if max_stale_age is None:
+            max_stale_age = settings.QUOTE_STALE_MAX_AGE
+        stale = quote_cache.get_stale(symbol, max_stale_age)
+        if stale is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"No recent price for {symbol}: {e}"
+            )
+        quote, age = stale
+        return quote.model_copy(update={"stale": True, "as_of": round(time.time() - age, 3)})
+
+def dedupe_symbols(symbols: Iterable[str]) -> List[str]:
+    """
+    Strips blanks and duplicates while keeping the caller's order.
+    """
+    seen = set()
+    unique = []
+    for symbol in symbols:
+        symbol = symbol.strip()
+        if symbol and symbol not in seen:
+            seen.add(symbol)
+            unique.append(symbol)
+    return unique
+
+async def get_real_time_quotes(
+    symbols: Iterable[str],
+    concurrency: Optional[int] = None,
+    max_age: Optional[float] = None,
+    priority: Priority = Priority.INTERACTIVE
+) -> StockQuoteBatch:
+    """
+    Fetches quotes for many symbols at once with bounded concurrency.
+
+    Symbols are de-duplicated. A failing symbol does not fail the batch; its
+    error detail is reported in StockQuoteBatch.errors instead.
+    """
+    unique_symbols = dedupe_symbols(symbols)
+    semaphore = asyncio.Semaphore(concurrency or settings.QUOTE_BATCH_CONCURRENCY)
+
+    async def fetch_one(symbol: str) -> StockQuote:
+        async with semaphore:
+            return await get_real_time_quote(symbol, max_age=max_age, priority=priority)
+
+    results = await asyncio.gather(
+        *(fetch_one(symbol) for symbol in unique_symbols), return_exceptions=True
+    )
+
+    batch = StockQuoteBatch(quotes={}, errors={})
+    for symbol, result in zip(unique_symbols, results):
+        if isinstance(result, HTTPException):
+            batch.errors[symbol] = str(result.detail)
+        elif isinstance(result, Exception):
+            batch.errors[symbol] = str(result) or type(result).__name__
+        else:
+            batch.quotes[symbol] = result
+    return batch
+
+# Shared upstream feed for server-push subscribers (GET /market/stream)
+async def _fetch_streamed_quotes(symbols: List[str]) -> StockQuoteBatch:
+    # Background streaming yields to interactive quote requests and trades
+    return await get_real_time_quotes(symbols, priority=Priority.BATCH)
+
+price_broadcaster = PriceBroadcaster(
+    fetch_quotes=_fetch_streamed_quotes,
+    interval=settings.PRICE_PUSH_INTERVAL,
+    max_connections=settings.PRICE_PUSH_MAX_CONNECTIONS,
+    max_symbols_per_connection=settings.PRICE_PUSH_MAX_SYMBOLS_PER_CONNECTION,
+    max_symbols=settings.PRICE_PUSH_MAX_SYMBOLS
+)
+
+def get_market_data_metrics() -> dict:
+    return {
+        "quote_cache": quote_cache.stats(),
+        "upstream_scheduler": upstream_scheduler.stats(),
+        "upstream_breaker": upstream_breaker.stats(),
+        "quote_providers": quote_fetcher.stats(),
+        "price_stream": price_stream.ingestor.stats() if price_stream.ingestor else {"connected": False},
+        "price_broadcast": price_broadcaster.stats(),
+        "indicator_cache": indicators.indicator_cache.stats()
     }
-    
+
+class FinnhubQuoteProvider:
+    """
+    Primary quote source: Finnhub /quote, through the shared breaker and rate limiter.
+    """
+    name = "finnhub"
+
+    async def fetch(self, symbol: str, client: Optional[httpx.AsyncClient], priority: Priority) -> StockQuote:
+        params = {
+            "symbol": symbol,
+            "token": settings.FINNHUB_API_KEY
+        }
+        response = await upstream_get(f"{settings.FINNHUB_BASE_URL}/quote", params, priority, client)
+        data = response.json()
+
+        # Finnhub returns c=0 if symbol is invalid (sometimes), or checks response
+        if data.get("c") == 0 and data.get("pc") == 0:
+            # Simple check for invalid symbol as Finnhub often returns 200 OK with 0s
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Symbol {symbol} not found"
+            )
+
+        # Lets streamed prices report change against the previous close
+        price_stream.price_table.set_previous_close(symbol, data.get("pc", 0.0))
+
+        return StockQuote(
+            symbol=symbol,
+            price=data.get("c", 0.0),
+            change=data.get("d", 0.0),
+            percent_change=data.get("dp", 0.0)
+        )
+
+class TwelveDataQuoteProvider:
+    """
+    Secondary quote source: Twelve Data /quote, with its own breaker and call budget.
+    """
+    name = "twelvedata"
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.UPSTREAM_FAILURE_THRESHOLD,
+            reset_timeout=settings.UPSTREAM_RESET_TIMEOUT
+        )
+        self.scheduler = UpstreamScheduler(
+            rate_per_minute=settings.TWELVEDATA_CALLS_PER_MINUTE,
+            burst=settings.TWELVEDATA_BURST
+        )
+
+    async def fetch(self, symbol: str, client: Optional[httpx.AsyncClient], priority: Priority) -> StockQuote:
+        params = {
+            "symbol": symbol,
+            "apikey": settings.TWELVEDATA_API_KEY
+        }
+        response = await upstream_get(
+            f"{settings.TWELVEDATA_BASE_URL}/quote", params, priority, client,
+            breaker=self.breaker, scheduler=self.scheduler
+        )
+        data = response.json()
+
+        # Errors come back as 200 with {"status": "error", "code": ...}
+        if data.get("status") == "error":
+            if data.get("code") in (400, 404):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Symbol {symbol} not found"
+                )
+            raise UpstreamError(f"Twelve Data error {data.get('code')}: {data.get('message')}")
+
+        try:
+            return StockQuote(
+                symbol=symbol,
+                price=float(data["close"]),
+                change=float(data.get("change") or 0.0),
+                percent_change=float(data.get("percent_change") or 0.0)
+            )
+        except (KeyError, TypeError, ValueError):
+            raise UpstreamError("Twelve Data returned an unexpected quote payload")
+
+def create_quote_fetcher() -> HedgedQuoteFetcher:
+    """
+    Finnhub first; Twelve Data as the hedge/failover provider when it has a key.
+    """
+    providers = [FinnhubQuoteProvider()]
+    if settings.TWELVEDATA_API_KEY:
+        providers.append(TwelveDataQuoteProvider())
+    return HedgedQuoteFetcher(
+        providers,
+        hedge_percentile=settings.QUOTE_HEDGE_PERCENTILE,
+        min_delay=settings.QUOTE_HEDGE_MIN_DELAY,
+        max_delay=settings.QUOTE_HEDGE_MAX_DELAY,
+        min_samples=settings.QUOTE_HEDGE_MIN_SAMPLES,
+        retryable=(UpstreamError, CircuitOpenError)
+    )
+
+quote_fetcher = create_quote_fetcher()
+
+async def _fetch_quote(
+    symbol: str,
+    client: Optional[httpx.AsyncClient] = None,
+    priority: Priority = Priority.INTERACTIVE
+) -> StockQuote:
     # Check for mock key (local development)
     if settings.FINNHUB_API_KEY == "mock-key":
         import random
@@ -22,68 +347,8 @@ async def get_real_time_quote(symbol: str) -> StockQuote:
             percent_change=round((change / base_price) * 100, 2)
         )
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
-        
-    if response.status_code != 200:
-        print(f"Finnhub Error: {response.status_code} - {response.text}") # Debug logging
-        # Fallback to mock data if service is unavailable to prevent breaking the app
-        return StockQuote(
-            symbol=symbol,
-            price=100.0,
-            change=0.0,
-            percent_change=0.0
-        )
-        
-    data = response.json()
-    
-    # Finnhub returns c=0 if symbol is invalid (sometimes), or checks response
-    if data.get("c") == 0 and data.get("pc") == 0:
-         # Simple check for invalid symbol as Finnhub often returns 200 OK with 0s
-         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Symbol {symbol} not found"
-        )
-
-    return StockQuote(
-        symbol=symbol,
-        price=data.get("c", 0.0),
-        change=data.get("d", 0.0),
-        percent_change=data.get("dp", 0.0)
+    # Batch evaluation is not latency sensitive and is not worth a second call
+    return await quote_fetcher.fetch(
+        lambda provider: provider.fetch(symbol, client, priority),
+        hedge=priority <= Priority.INTERACTIVE
     )
-
-async def get_market_history(symbol: str, resolution: str, limit: int) -> dict:
-    # Mock history data for charts
-    import random
-    from datetime import datetime, timedelta
-    
-    candles = []
-    now = datetime.now()
-    price = 100.0 + random.uniform(-20, 20)
-    
-    for i in range(limit):
-        # Generate candles going backwards
-        time_offset = limit - i
-        if resolution == 'D':
-            time = int((now - timedelta(days=time_offset)).timestamp())
-        else:
-             # Default to minutes
-            time = int((now - timedelta(minutes=time_offset * int(resolution))).timestamp())
-            
-        open_p = price
-        close_p = price + random.uniform(-1, 1)
-        high_p = max(open_p, close_p) + random.uniform(0, 0.5)
-        low_p = min(open_p, close_p) - random.uniform(0, 0.5)
-        
-        candles.append({
-            "time": time,
-            "open": round(open_p, 2),
-            "high": round(high_p, 2),
-            "low": round(low_p, 2),
-            "close": round(close_p, 2),
-            "volume": int(random.uniform(1000, 5000))
-        })
-        
-        price = close_p
-        
-    return {"candles": candles}
@@ -0,0 +1,61 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models.snapshot import PortfolioPerformance
+from app.services.evaluation import calculate_ppg
+from app.services.snapshot_series import SnapshotSeries, load_series
+
+def _start_point(years: List[SnapshotSeries], start: date, end: date) -> Optional[Tuple[date, float]]:
+    # Newest year first: the first hit is the nearest point on or before start
+    for s in years:
+        point = s.at_or_before(start)
+        if point is not None:
+            return point
+    # Users who started after `start` are measured from their first point
+    for s in reversed(years):
+        point = s.at_or_after(start)
+        if point is not None:
+            return point if point[0] <= end else None
+    return None
+
+def _end_point(years: List[SnapshotSeries], end: date) -> Optional[Tuple[date, float]]:
+    for s in years:
+        point = s.at_or_before(end)
+        if point is not None:
+            return point
+    return None
+
+def portfolio_performance(db, user_ids: Iterable[str], start: date, end: date) -> Dict[str, Optional[PortfolioPerformance]]:
+    """
+    Each user's PPG and value change from start to end, or None if they have
+    no snapshot by end.
+
+    Each end of the range uses the nearest snapshot on or before that day,
+    found by binary search in the user's yearly series (one read per user
+    per year, plus the year before start), so any window costs the same as
+    the fixed leaderboard windows. Users whose first snapshot is after start
+    are measured from it.
+    """
+    user_ids = list(user_ids)
+    years = range(start.year - 1, end.year + 1)
+    series = load_series(db, user_ids, years)
+    results: Dict[str, Optional[PortfolioPerformance]] = {}
+    for user_id in user_ids:
+        by_year = [series[(user_id, year)] for year in reversed(years)]
+        start_point = _start_point(by_year, start, end)
+        end_point = _end_point(by_year, end)
+        if start_point is None or end_point is None:
+            results[user_id] = None
+            continue
+        (start_day, start_value), (end_day, end_value) = start_point, end_point
+        results[user_id] = PortfolioPerformance(
+            user_id=user_id,
+            start=start.isoformat(),
+            end=end.isoformat(),
+            start_date=start_day.isoformat(),
+            start_value=start_value,
+            end_date=end_day.isoformat(),
+            end_value=end_value,
+            value_change=round(end_value - start_value, 2),
+            ppg=round(calculate_ppg(end_value, start_value), 2)
+        )
+    return results
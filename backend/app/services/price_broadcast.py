@@ -0,0 +1,162 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from app.models.market import StockQuote, StockQuoteBatch
+
+class StreamCapacityError(Exception):
+    """
+    Raised when a new subscriber would exceed the connection cap.
+    """
+
+class Subscription:
+    """
+    One client connection's view of the price feed.
+
+    Backpressure is handled by conflation: updates for a symbol the client has
+    not consumed yet replace the pending one, so a slow client always gets the
+    latest price and its buffer never holds more than one quote per symbol.
+    """
+
+    def __init__(self, symbols: Iterable[str]):
+        self.symbols: Set[str] = set(symbols)
+        self._pending: Dict[str, StockQuote] = {}
+        self._ready = asyncio.Event()
+        self.delivered = 0
+        self.conflated = 0
+
+    def push(self, quote: StockQuote):
+        if quote.symbol in self._pending:
+            self.conflated += 1
+        self._pending[quote.symbol] = quote
+        self._ready.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> List[StockQuote]:
+        """
+        Waits for pending updates and drains them. Returns [] on timeout.
+        """
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        quotes = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        self.delivered += len(quotes)
+        return quotes
+
+class PriceBroadcaster:
+    """
+    Fans out price updates from one shared upstream poll to every subscriber.
+
+    While anyone is subscribed, a single task fetches the union of subscribed
+    symbols every interval and pushes changed prices to the subscribers of each
+    symbol, so upstream load is independent of the number of open connections.
+
+    Each connection may ask for at most max_symbols_per_connection symbols, and
+    the union polled is capped at max_symbols: a subscriber that would add new
+    symbols past it is turned away like one past max_connections.
+    """
+
+    def __init__(
+        self,
+        fetch_quotes: Callable[[List[str]], Awaitable[StockQuoteBatch]],
+        interval: float = 1.0,
+        max_connections: int = 1000,
+        max_symbols_per_connection: int = 50,
+        max_symbols: int = 500
+    ):
+        self._fetch_quotes = fetch_quotes
+        self.interval = interval
+        self.max_connections = max_connections
+        self.max_symbols_per_connection = max_symbols_per_connection
+        self.max_symbols = max_symbols
+        self._subscriptions: Set[Subscription] = set()
+        self._by_symbol: Dict[str, Set[Subscription]] = {}
+        self._last_prices: Dict[str, StockQuote] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.polls = 0
+        self.updates_published = 0
+        self.rejected = 0
+
+    @property
+    def connections(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, symbols: Iterable[str]) -> Subscription:
+        """
+        Raises ValueError for more than max_symbols_per_connection symbols and
+        StreamCapacityError when the connection or symbol cap is reached.
+        """
+        symbols = set(symbols)
+        if len(symbols) > self.max_symbols_per_connection:
+            raise ValueError(f"Too many symbols for one stream (max {self.max_symbols_per_connection})")
+        if len(self._subscriptions) >= self.max_connections:
+            self.rejected += 1
+            raise StreamCapacityError(f"Price stream is at capacity ({self.max_connections} connections)")
+        if len(self._by_symbol) + len(symbols - self._by_symbol.keys()) > self.max_symbols:
+            self.rejected += 1
+            raise StreamCapacityError(f"Price stream is at capacity ({self.max_symbols} symbols)")
+
+        subscription = Subscription(symbols)
+        self._subscriptions.add(subscription)
+        for symbol in subscription.symbols:
+            self._by_symbol.setdefault(symbol, set()).add(subscription)
+            # New subscribers get the last known price straight away
+            if symbol in self._last_prices:
+                subscription.push(self._last_prices[symbol])
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._poll_loop())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+        for symbol in subscription.symbols:
+            subscribers = self._by_symbol.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._by_symbol[symbol]
+                self._last_prices.pop(symbol, None)
+
+    def publish(self, quote: StockQuote):
+        previous = self._last_prices.get(quote.symbol)
+        if previous is not None and previous.price == quote.price:
+            return
+        self._last_prices[quote.symbol] = quote
+        for subscription in self._by_symbol.get(quote.symbol, ()):
+            subscription.push(quote)
+            self.updates_published += 1
+
+    async def _poll_loop(self):
+        while self._subscriptions:
+            symbols = sorted(self._by_symbol)
+            try:
+                batch = await self._fetch_quotes(symbols)
+                self.polls += 1
+                for quote in batch.quotes.values():
+                    self.publish(quote)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Price stream poll failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._subscriptions),
+            "max_connections": self.max_connections,
+            "symbols": len(self._by_symbol),
+            "max_symbols": self.max_symbols,
+            "polls": self.polls,
+            "updates_published": self.updates_published,
+            "rejected": self.rejected
+        }
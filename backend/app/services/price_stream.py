@@ -0,0 +1,292 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from app.core.config import settings
+from app.models.market import StockQuote
+
+logger = logging.getLogger(__name__)
+
+class PriceTable:
+    """
+    Last traded price per symbol, fed by the streaming ingestor.
+
+    Previous closes come from REST quotes so streamed prices can still be
+    reported with change / percent_change.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._previous_close: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def update(self, symbol: str, price: float):
+        self._prices[symbol] = (price, self._clock())
+
+    def set_previous_close(self, symbol: str, previous_close: float):
+        if previous_close:
+            self._previous_close[symbol] = previous_close
+
+    def age(self, symbol: str) -> Optional[float]:
+        entry = self._prices.get(symbol)
+        return None if entry is None else self._clock() - entry[1]
+
+    def get_quote(self, symbol: str, max_age: float) -> Optional[StockQuote]:
+        entry = self._prices.get(symbol)
+        if entry is None or self._clock() - entry[1] > max_age:
+            return None
+
+        price = entry[0]
+        previous_close = self._previous_close.get(symbol)
+        change = price - previous_close if previous_close else 0.0
+        percent_change = (change / previous_close) * 100 if previous_close else 0.0
+        return StockQuote(
+            symbol=symbol,
+            price=round(price, 4),
+            change=round(change, 4),
+            percent_change=round(percent_change, 4)
+        )
+
+    def clear(self):
+        self._prices.clear()
+        self._previous_close.clear()
+
+def load_held_symbols(db) -> Counter:
+    """
+    How many portfolios hold each symbol, as counted by the latest evaluation
+    run while it listed portfolios: two document reads rather than a scan of
+    every portfolio. Trades since then are added by holding_changed.
+    """
+    runs_ref = db.collection("evaluation_runs")
+    latest = runs_ref.document("latest").get()
+    if not latest.exists:
+        return Counter()
+    run_doc = runs_ref.document(latest.to_dict()["run_id"]).get()
+    return Counter(run_doc.to_dict().get("held_symbols", {})) if run_doc.exists else Counter()
+
+def _log_task_failure(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Price stream task failed", exc_info=task.exception())
+
+class PriceStreamIngestor:
+    """
+    Background task that keeps a Finnhub trade WebSocket subscribed to the symbols
+    users actually hold (refreshed from the latest evaluation run and adjusted
+    by trades since) or recently asked for, and writes every trade print into a
+    PriceTable.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        price_table: PriceTable,
+        load_symbols: Optional[Callable[[], Counter]] = None,
+        max_symbols: int = 50,
+        refresh_interval: float = 60.0,
+        watch_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.url = url
+        self.price_table = price_table
+        self.max_symbols = max_symbols
+        self.refresh_interval = refresh_interval
+        self.watch_ttl = watch_ttl
+        self._load_symbols = load_symbols
+        self._clock = clock
+
+        self._held: Counter = Counter()
+        self._traded: Counter = Counter()
+        self._watched: Dict[str, float] = {}
+        self._subscribed: Set[str] = set()
+        self._ws = None
+        self._tasks = []
+        self._stopped = False
+
+        self.messages_received = 0
+        self.trades_received = 0
+        self.reconnects = 0
+
+    def desired_symbols(self) -> Set[str]:
+        """
+        Watched symbols plus the most widely held ones, capped at max_symbols.
+        """
+        now = self._clock()
+        for symbol, seen_at in list(self._watched.items()):
+            if now - seen_at > self.watch_ttl:
+                del self._watched[symbol]
+
+        held = self._held.copy()
+        held.update(self._traded)
+        desired = sorted(self._watched, key=self._watched.get, reverse=True)
+        for symbol, count in held.most_common():
+            if count > 0 and symbol not in self._watched:
+                desired.append(symbol)
+        return set(desired[:self.max_symbols])
+
+    def watch(self, symbols: Iterable[str]):
+        """
+        Marks symbols as in demand; new ones are subscribed on the next sync.
+        """
+        now = self._clock()
+        added = False
+        for symbol in symbols:
+            added = added or symbol not in self._watched
+            self._watched[symbol] = now
+        if added:
+            self._schedule_sync()
+
+    def _schedule_sync(self):
+        if self._ws is not None:
+            task = asyncio.ensure_future(self.sync_subscriptions())
+            task.add_done_callback(_log_task_failure)
+            self._tasks.append(task)
+            self._tasks = [task for task in self._tasks if not task.done()]
+
+    def set_held_symbols(self, held: Counter):
+        held = Counter(held)
+        if held != self._held:
+            # A new evaluation run: its counts already include earlier trades
+            self._traded.clear()
+        self._held = held
+
+    def holding_changed(self, symbol: str, delta: int):
+        """
+        Records a position opened (+1) or closed (-1) since the counts were loaded.
+        """
+        self._traded[symbol] += delta
+        if delta > 0 and symbol not in self._subscribed:
+            self._schedule_sync()
+
+    async def sync_subscriptions(self):
+        ws = self._ws
+        if ws is None:
+            return
+        desired = self.desired_symbols()
+        # Update the set before each send so overlapping syncs do not repeat messages
+        for symbol in sorted(desired - self._subscribed):
+            self._subscribed.add(symbol)
+            await ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+        for symbol in sorted(self._subscribed - desired):
+            self._subscribed.discard(symbol)
+            await ws.send(json.dumps({"type": "unsubscribe", "symbol": symbol}))
+
+    def handle_message(self, raw):
+        self.messages_received += 1
+        message = json.loads(raw)
+        if message.get("type") != "trade":
+            return
+        for trade in message.get("data", []):
+            self.trades_received += 1
+            self.price_table.update(trade["s"], float(trade["p"]))
+
+    async def _connect_loop(self):
+        import websockets
+
+        backoff = 1.0
+        while not self._stopped:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    self._ws = ws
+                    self._subscribed = set()
+                    backoff = 1.0
+                    await self.sync_subscriptions()
+                    async for raw in ws:
+                        self.handle_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Price stream disconnected: {e}")
+            finally:
+                self._ws = None
+
+            if self._stopped:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _refresh_loop(self):
+        loop = asyncio.get_running_loop()
+        backoff = 1.0
+        while not self._stopped:
+            try:
+                if self._load_symbols is not None:
+                    # Firestore client is synchronous; keep it off the event loop
+                    self.set_held_symbols(await loop.run_in_executor(None, self._load_symbols))
+                await self.sync_subscriptions()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # A dropped socket or a Firestore error must not end the loop:
+                # retry sooner, backing off up to the refresh interval
+                logger.exception("Failed to refresh price stream subscriptions")
+                await asyncio.sleep(min(backoff, self.refresh_interval))
+                backoff *= 2
+                continue
+            backoff = 1.0
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        self._stopped = False
+        self._tasks = [
+            asyncio.ensure_future(self._connect_loop()),
+            asyncio.ensure_future(self._refresh_loop())
+        ]
+        for task in self._tasks:
+            task.add_done_callback(_log_task_failure)
+
+    async def stop(self):
+        self._stopped = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._ws is not None,
+            "subscribed": len(self._subscribed),
+            "watched": len(self._watched),
+            "held": len(self._held),
+            "prices": len(self.price_table),
+            "messages_received": self.messages_received,
+            "trades_received": self.trades_received,
+            "reconnects": self.reconnects
+        }
+
+price_table = PriceTable()
+ingestor: Optional[PriceStreamIngestor] = None
+
+def start_price_stream(db) -> PriceStreamIngestor:
+    """
+    Starts the optional streaming ingestion (PRICE_STREAM_ENABLED) for the app lifespan.
+    """
+    global ingestor
+    ingestor = PriceStreamIngestor(
+        url=f"{settings.FINNHUB_WS_URL}?token={settings.FINNHUB_API_KEY}",
+        price_table=price_table,
+        load_symbols=lambda: load_held_symbols(db),
+        max_symbols=settings.PRICE_STREAM_MAX_SYMBOLS,
+        refresh_interval=settings.PRICE_STREAM_REFRESH_SECONDS,
+        watch_ttl=settings.PRICE_STREAM_WATCH_TTL
+    )
+    ingestor.start()
+    return ingestor
+
+def holding_changed(symbol: str, delta: int):
+    """
+    Tells the running ingestor, if any, that a trade opened or closed a position.
+    """
+    if ingestor is not None:
+        ingestor.holding_changed(symbol, delta)
+
+async def stop_price_stream():
+    global ingestor
+    if ingestor is not None:
+        await ingestor.stop()
+        ingestor = None
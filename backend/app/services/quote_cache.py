@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from app.models.market import StockQuote
+
+class FetchAbandoned(Exception):
+    """
+    Set on a shared fetch whose leader was cancelled, so waiters retry it
+    instead of being cancelled along with it.
+    """
+
+class QuoteCache:
+    """
+    In-process quote cache keyed by symbol with a TTL, LRU eviction and a max size.
+
+    Concurrent misses for the same symbol are coalesced (single-flight): the first
+    caller fetches from upstream and everyone else awaits the same result. A caller
+    only joins an in-flight fetch of equal or higher urgency (lower rank), so a
+    trade never queues behind a batch-priority fetch. If the caller doing the
+    fetch is cancelled (its client went away), one of the waiters takes over.
+
+    The last good quote per symbol is also kept past its TTL (bounded by the
+    same max size) so callers can fall back to it when the upstream is down.
+    """
+
+    def __init__(self, ttl: float, max_size: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, StockQuote]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[asyncio.Future, int]] = {}
+        self._last_good: "OrderedDict[str, Tuple[float, StockQuote]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale_hits = 0
+        self.stale_misses = 0
+        self.max_stale_age = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, symbol: str, max_age: Optional[float] = None) -> Optional[StockQuote]:
+        """
+        Returns the cached quote if it is younger than max_age (defaults to the TTL).
+        """
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+
+        fetched_at, quote = entry
+        age = self._clock() - fetched_at
+        if age > self.ttl:
+            del self._entries[symbol]
+            return None
+        if max_age is not None and age > max_age:
+            return None
+
+        self._entries.move_to_end(symbol)
+        return quote
+
+    def get_stale(self, symbol: str, max_staleness: float) -> Optional[Tuple[StockQuote, float]]:
+        """
+        Returns (quote, age in seconds) for the last good quote, however old the
+        cache entry is, as long as it is no older than max_staleness.
+        """
+        entry = self._last_good.get(symbol)
+        age = self._clock() - entry[0] if entry is not None else None
+        if age is None or age > max_staleness:
+            self.stale_misses += 1
+            return None
+
+        self.stale_hits += 1
+        self.max_stale_age = max(self.max_stale_age, age)
+        return entry[1], age
+
+    def put(self, symbol: str, quote: StockQuote):
+        now = self._clock()
+        for entries in (self._entries, self._last_good):
+            entries[symbol] = (now, quote)
+            entries.move_to_end(symbol)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        while len(self._last_good) > self.max_size:
+            self._last_good.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._last_good.clear()
+
+    async def get_or_fetch(
+        self,
+        symbol: str,
+        fetch: Callable[[], Awaitable[StockQuote]],
+        max_age: Optional[float] = None,
+        rank: int = 0
+    ) -> StockQuote:
+        while True:
+            quote = self.get(symbol, max_age)
+            if quote is not None:
+                self.hits += 1
+                return quote
+
+            inflight = self._inflight.get(symbol)
+            if inflight is None or inflight[1] > rank:
+                break
+            self.coalesced += 1
+            try:
+                # Shield so one waiter being cancelled does not cancel the shared fetch
+                return await asyncio.shield(inflight[0])
+            except FetchAbandoned:
+                # The leader was cancelled; the first waiter back takes over
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, rank)
+        self._inflight[symbol] = entry
+        try:
+            quote = await fetch()
+        except asyncio.CancelledError:
+            # Only the leader's request went away: its waiters retry the fetch
+            future.set_exception(FetchAbandoned(symbol))
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark as retrieved so a fetch with no waiters does not log a warning
+            future.exception()
+            raise
+        else:
+            self.put(symbol, quote)
+            future.set_result(quote)
+            return quote
+        finally:
+            if self._inflight.get(symbol) is entry:
+                del self._inflight[symbol]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "stale_hits": self.stale_hits,
+            "stale_misses": self.stale_misses,
+            "max_stale_age": round(self.max_stale_age, 3),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,166 @@
+import asyncio
+import bisect
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (1ms to 60s, ten buckets per decade).
+
+    Counts are halved once they reach max_count, so percentiles follow recent
+    behaviour rather than the whole process lifetime.
+    """
+
+    def __init__(self, max_count: int = 10000):
+        self.max_count = max_count
+        # Upper bound of each bucket in seconds
+        self.bounds = [10 ** (exponent / 10) for exponent in range(-30, 19)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        if self.count >= self.max_count:
+            self.counts = [c // 2 for c in self.counts]
+            self.count = sum(self.counts)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the p-th percentile, or None when empty.
+        """
+        if self.count == 0:
+            return None
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bound, count in zip(self.bounds + [math.inf], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def stats(self) -> dict:
+        def ms(p):
+            value = self.percentile(p)
+            return None if value is None or value == math.inf else round(value * 1000, 2)
+
+        return {"count": self.count, "p50_ms": ms(50), "p90_ms": ms(90), "p99_ms": ms(99)}
+
+class HedgedQuoteFetcher:
+    """
+    Calls the primary provider and, if it has not answered within its recent
+    hedge_percentile latency, also calls the next provider and takes whichever
+    answers first. The loser is cancelled and its elapsed time recorded as a
+    lower bound on its latency.
+
+    A retryable error from one provider moves on to the next straight away
+    (failover). Other errors, such as an unknown symbol, are returned as is
+    when they come from the primary or the last provider still running; from
+    a hedge they only count once every provider has failed, since the
+    secondary may not list symbols the primary does.
+
+    Until a provider has min_samples latencies, max_delay is used as its hedge
+    delay; afterwards the percentile is clamped to [min_delay, max_delay].
+    """
+
+    def __init__(
+        self,
+        providers: Sequence,
+        hedge_percentile: float = 95.0,
+        min_delay: float = 0.05,
+        max_delay: float = 1.0,
+        min_samples: int = 20,
+        retryable: Tuple[type, ...] = (),
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.providers = list(providers)
+        self.hedge_percentile = hedge_percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.retryable = retryable
+        self._clock = clock
+        self.histograms: Dict[str, LatencyHistogram] = {p.name: LatencyHistogram() for p in self.providers}
+        self._counters: Dict[str, Dict[str, int]] = {
+            p.name: {"calls": 0, "wins": 0, "errors": 0, "hedged": 0} for p in self.providers
+        }
+
+    def hedge_delay(self, provider) -> float:
+        histogram = self.histograms[provider.name]
+        if histogram.count < self.min_samples:
+            return self.max_delay
+        return min(self.max_delay, max(self.min_delay, histogram.percentile(self.hedge_percentile)))
+
+    async def _timed(self, provider, call: Callable[[object], Awaitable[T]]) -> T:
+        counters = self._counters[provider.name]
+        counters["calls"] += 1
+        start = self._clock()
+        try:
+            result = await call(provider)
+        except asyncio.CancelledError:
+            self.histograms[provider.name].record(self._clock() - start)
+            raise
+        except Exception:
+            counters["errors"] += 1
+            raise
+        self.histograms[provider.name].record(self._clock() - start)
+        return result
+
+    async def fetch(self, call: Callable[[object], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Runs call(provider) against the providers in order, hedging when allowed.
+        """
+        pending: Dict[asyncio.Future, object] = {}
+        errors: List[BaseException] = []
+        remaining = list(self.providers)
+
+        def launch():
+            provider = remaining.pop(0)
+            pending[asyncio.ensure_future(self._timed(provider, call))] = provider
+            return provider
+
+        primary = current = launch()
+        try:
+            while pending:
+                timeout = self.hedge_delay(current) if hedge and remaining else None
+                done, _ = await asyncio.wait(set(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than usual: hedge with the next provider
+                    self._counters[current.name]["hedged"] += 1
+                    current = launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        self._counters[provider.name]["wins"] += 1
+                        return task.result()
+                    last = not pending and not remaining
+                    if not isinstance(error, self.retryable) and (provider is primary or last):
+                        raise error
+                    # A hedge that does not know the symbol must not beat a
+                    # primary that does: keep waiting on the others
+                    errors.append(error)
+
+                if not pending and remaining:
+                    current = launch()
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            provider.name: {
+                **self._counters[provider.name],
+                **self.histograms[provider.name].stats(),
+                "hedge_delay_ms": round(self.hedge_delay(provider) * 1000, 2)
+            }
+            for provider in self.providers
+        }
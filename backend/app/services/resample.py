@@ -0,0 +1,78 @@
+import numpy as np
+from app.services.candle_store import Candles, COLUMNS
+
+DAY = 86400
+
+def bucket_starts(t: np.ndarray, resolution: str, seconds: int) -> np.ndarray:
+    """
+    Start time of the target bar each timestamp falls into.
+    Weeks start on Monday (1970-01-01 was a Thursday); months are calendar months.
+    """
+    if resolution == "W":
+        return (((t // DAY) + 3) // 7 * 7 - 3) * DAY
+    if resolution == "M":
+        months = t.astype("datetime64[s]").astype("datetime64[M]")
+        return months.astype("datetime64[s]").astype(np.int64)
+    return t // seconds * seconds
+
+def resample_candles(candles: Candles, resolution: str, seconds: int) -> Candles:
+    """
+    Aggregates sorted OHLCV bars into a coarser resolution in one vectorized pass:
+    first open, max high, min low, last close and summed volume per bucket.
+    """
+    t = np.asarray(candles["t"])
+    if len(t) == 0:
+        return {name: np.asarray(candles[name]) for name in COLUMNS}
+
+    starts = bucket_starts(t, resolution, seconds)
+    first = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+    last = np.concatenate((first[1:], [len(t)])) - 1
+    return {
+        "t": starts[first],
+        "o": np.asarray(candles["o"])[first],
+        "h": np.maximum.reduceat(np.asarray(candles["h"]), first),
+        "l": np.minimum.reduceat(np.asarray(candles["l"]), first),
+        "c": np.asarray(candles["c"])[last],
+        "v": np.add.reduceat(np.asarray(candles["v"]), first)
+    }
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks `threshold` indices that preserve the
+    visual shape of (x, y). First and last points are always kept.
+
+    Bucket averages are computed up front with reduceat; the remaining loop is
+    one vectorized argmax per output point.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if np.isnan(y).any():
+        y = np.where(np.isnan(y), np.nanmean(y), y)
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    bounds = np.append(edges, n)
+    sizes = np.diff(bounds)
+    avg_x = np.add.reduceat(x, bounds[:-1]) / sizes
+    avg_y = np.add.reduceat(y, bounds[:-1]) / sizes
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        xs = x[start:end]
+        ys = y[start:end]
+        # Twice the triangle area formed with the last pick and the next bucket's average
+        area = np.abs((x[a] - avg_x[i + 1]) * (ys - y[a]) - (x[a] - xs) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def take(candles: Candles, indices: np.ndarray) -> Candles:
+    return {name: np.asarray(values)[indices] for name, values in candles.items()}
@@ -0,0 +1,118 @@
+import warnings
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.services.snapshot_series import SnapshotSeries
+
+# Alternative leaderboards: id -> (metric, window in days)
+RISK_LEADERBOARDS = {
+    "sharpe_30d": ("sharpe", 30),
+    "sharpe_90d": ("sharpe", 90),
+    "sortino_90d": ("sortino", 90)
+}
+# Columns are calendar days: evaluation snapshots every day, weekends included
+PERIODS_PER_YEAR = 365
+
+def value_matrix(series: Dict[Tuple[str, int], SnapshotSeries], user_ids: List[str], start: date, end: date) -> np.ndarray:
+    """
+    Users x days matrix of portfolio values from start to end inclusive, NaN
+    where a user has no snapshot. series must hold every (user, year) the
+    range touches, as returned by load_series.
+    """
+    days = (end - start).days + 1
+    matrix = np.full((len(user_ids), days), np.nan)
+    rows, columns, values = [], [], []
+    for year in range(start.year, end.year + 1):
+        # Offset of January 1st of this year from start
+        base = (date(year, 1, 1) - start).days
+        for row, user_id in enumerate(user_ids):
+            s = series[(user_id, year)]
+            if not len(s):
+                continue
+            offsets = s.days.astype(np.int64) + base
+            lo, hi = np.searchsorted(offsets, [0, days])
+            rows.append(np.full(hi - lo, row))
+            columns.append(offsets[lo:hi])
+            values.append(s.values[lo:hi])
+    if rows:
+        matrix[np.concatenate(rows), np.concatenate(columns)] = np.concatenate(values)
+    return matrix
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """
+    Carries each row's last value over the days it is missing; days before a
+    row's first value stay NaN.
+    """
+    valid = ~np.isnan(matrix)
+    last = np.where(valid, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], last]
+    # Column 0 stands in for "no value yet" and may itself be missing
+    return np.where(np.maximum.accumulate(valid, axis=1), filled, np.nan)
+
+def risk_metrics(values: np.ndarray, risk_free_rate: float = 0.0, min_returns: int = 2) -> Dict[str, np.ndarray]:
+    """
+    Per-row metrics of a users x days value matrix, in one vectorized pass
+    each: total return, annualized volatility, Sharpe and Sortino ratios (over
+    daily returns, against an annual risk_free_rate) and max drawdown (<= 0).
+
+    Missing days are forward-filled. Ratios are NaN for rows with fewer than
+    min_returns daily returns or no variation.
+    """
+    filled = forward_fill(values)
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        # All-NaN rows (users with no snapshots in the window) yield NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        previous = filled[:, :-1]
+        returns = np.where(previous > 0, filled[:, 1:] / previous - 1.0, np.nan)
+        observations = np.sum(~np.isnan(returns), axis=1)
+        excess = returns - risk_free_rate / PERIODS_PER_YEAR
+
+        mean = np.nanmean(excess, axis=1)
+        std = np.nanstd(returns, axis=1, ddof=1)
+        downside = np.sqrt(np.nanmean(np.minimum(excess, 0.0) ** 2, axis=1))
+        scale = np.sqrt(PERIODS_PER_YEAR)
+        enough = observations >= min_returns
+        sharpe = np.where(enough & (std > 0), mean / std * scale, np.nan)
+        sortino = np.where(enough & (downside > 0), mean / downside * scale, np.nan)
+
+        first = filled[np.arange(len(filled)), np.argmax(~np.isnan(filled), axis=1)]
+        total_return = filled[:, -1] / first - 1.0
+        drawdown = np.nanmin(filled / np.fmax.accumulate(filled, axis=1) - 1.0, axis=1)
+
+    return {
+        "observations": observations,
+        "total_return": total_return,
+        "volatility": std * scale,
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "max_drawdown": drawdown
+    }
+
+def score_risk_leaderboards(
+    series: Dict[Tuple[str, int], SnapshotSeries],
+    user_ids: List[str],
+    today: date
+) -> Dict[str, Dict[str, Optional[Tuple[float, float]]]]:
+    """
+    For each RISK_LEADERBOARDS entry, every user's (score, PPG over the
+    window), or None if the user has too few days in it to be ranked. One
+    matrix covers the longest window; shorter ones are its trailing columns.
+    """
+    longest = max(days for _, days in RISK_LEADERBOARDS.values())
+    matrix = value_matrix(series, user_ids, today - timedelta(days=longest), today)
+    scores, by_window = {}, {}
+    for board, (metric, days) in RISK_LEADERBOARDS.items():
+        if days not in by_window:
+            min_returns = max(2, int(days * settings.RISK_MIN_COVERAGE))
+            by_window[days] = risk_metrics(matrix[:, -(days + 1):], settings.RISK_FREE_RATE, min_returns)
+        metrics = by_window[days]
+        ranked = ~np.isnan(metrics[metric]) & ~np.isnan(metrics["total_return"])
+        metric_values = np.round(metrics[metric], 3).tolist()
+        ppgs = np.round(metrics["total_return"] * 100, 2).tolist()
+        scores[board] = {
+            user_id: (metric_values[i], ppgs[i]) if ranked[i] else None
+            for i, user_id in enumerate(user_ids)
+        }
+    return scores
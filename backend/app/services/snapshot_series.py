@@ -0,0 +1,151 @@
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.db.firestore import get_documents
+
+# portfolio_series/{user_id}_{year}: one document per user per calendar year
+SERIES_COLLECTION = "portfolio_series"
+DAY_DTYPE = np.dtype("<u2")
+VALUE_DTYPE = np.dtype("<f8")
+
+def series_doc_id(user_id: str, year: int) -> str:
+    return f"{user_id}_{year}"
+
+def series_ref(db, user_id: str, year: int):
+    return db.collection(SERIES_COLLECTION).document(series_doc_id(user_id, year))
+
+class SnapshotSeries:
+    """
+    One user's daily portfolio values for one calendar year.
+
+    Stored as two packed little-endian arrays, days (offset from January 1st,
+    uint16) and values (float64), sorted by day. A full year is about 3 KB, so
+    a window of any length within the year is one document read.
+    """
+
+    def __init__(self, user_id: str, year: int, days: Optional[np.ndarray] = None, values: Optional[np.ndarray] = None):
+        self.user_id = user_id
+        self.year = year
+        self.days = days if days is not None else np.empty(0, dtype=DAY_DTYPE)
+        self.values = values if values is not None else np.empty(0, dtype=VALUE_DTYPE)
+
+    @classmethod
+    def from_doc(cls, data: dict) -> "SnapshotSeries":
+        return cls(
+            data["user_id"],
+            data["year"],
+            np.frombuffer(data["days"], dtype=DAY_DTYPE).copy(),
+            np.frombuffer(data["values"], dtype=VALUE_DTYPE).copy()
+        )
+
+    def to_doc(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "year": self.year,
+            "days": self.days.astype(DAY_DTYPE).tobytes(),
+            "values": self.values.astype(VALUE_DTYPE).tobytes(),
+            "count": len(self.days),
+            "updated_at": datetime.now(timezone.utc)
+        }
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def _offset(self, day: date) -> int:
+        if day.year != self.year:
+            raise ValueError(f"{day} is outside the {self.year} series")
+        return (day - date(self.year, 1, 1)).days
+
+    def _find(self, day: date) -> Tuple[int, bool]:
+        offset = self._offset(day)
+        i = int(np.searchsorted(self.days, offset))
+        return i, i < len(self.days) and self.days[i] == offset
+
+    def __contains__(self, day: date) -> bool:
+        return self._find(day)[1]
+
+    def get(self, day: date) -> Optional[float]:
+        i, found = self._find(day)
+        return float(self.values[i]) if found else None
+
+    def set(self, day: date, value: float):
+        i, found = self._find(day)
+        if found:
+            self.values[i] = value
+        else:
+            self.days = np.insert(self.days, i, self._offset(day))
+            self.values = np.insert(self.values, i, value)
+
+    def _point(self, i: int) -> Tuple[date, float]:
+        return date.fromordinal(date(self.year, 1, 1).toordinal() + int(self.days[i])), float(self.values[i])
+
+    def at_or_before(self, day: date) -> Optional[Tuple[date, float]]:
+        """
+        The last (date, value) on or before day (which may be in a later
+        year), by binary search.
+        """
+        if day.year < self.year:
+            return None
+        offset = (min(day, date(self.year, 12, 31)) - date(self.year, 1, 1)).days
+        i = int(np.searchsorted(self.days, offset, side="right")) - 1
+        return self._point(i) if i >= 0 else None
+
+    def at_or_after(self, day: date) -> Optional[Tuple[date, float]]:
+        """
+        The first (date, value) on or after day (which may be in an earlier year).
+        """
+        if day.year > self.year:
+            return None
+        offset = (max(day, date(self.year, 1, 1)) - date(self.year, 1, 1)).days
+        i = int(np.searchsorted(self.days, offset))
+        return self._point(i) if i < len(self.days) else None
+
+    def between(self, start: date, end: date) -> List[Tuple[date, float]]:
+        """
+        (date, value) pairs from start to end inclusive, clipped to this year.
+        """
+        first = date(self.year, 1, 1)
+        lo = np.searchsorted(self.days, (max(start, first) - first).days)
+        hi = np.searchsorted(self.days, (min(end, date(self.year, 12, 31)) - first).days, side="right")
+        return [
+            (date.fromordinal(first.toordinal() + int(day)), float(value))
+            for day, value in zip(self.days[lo:hi], self.values[lo:hi])
+        ]
+
+def load_series(db, user_ids: Iterable[str], years: Iterable[int]) -> Dict[Tuple[str, int], SnapshotSeries]:
+    """
+    Every (user, year) series, read in get_all batches; missing ones are empty.
+    """
+    keys = [(user_id, year) for user_id in user_ids for year in sorted(set(years))]
+    docs = get_documents(
+        db, SERIES_COLLECTION, (series_doc_id(user_id, year) for user_id, year in keys),
+        settings.FIRESTORE_READ_BATCH_SIZE
+    )
+    return {
+        (user_id, year): (
+            SnapshotSeries.from_doc(docs[series_doc_id(user_id, year)])
+            if series_doc_id(user_id, year) in docs else SnapshotSeries(user_id, year)
+        )
+        for user_id, year in keys
+    }
+
+def values_on(db, user_ids: Iterable[str], day: date) -> Dict[str, float]:
+    """
+    Each user's value on day, for users with a snapshot that day. One read per user.
+    """
+    series = load_series(db, user_ids, [day.year])
+    values = {user_id: s.get(day) for (user_id, _), s in series.items()}
+    return {user_id: value for user_id, value in values.items() if value is not None}
+
+def values_between(db, user_ids: Iterable[str], start: date, end: date) -> Dict[str, List[Tuple[date, float]]]:
+    """
+    Each user's (date, value) pairs from start to end inclusive. One read per
+    user per calendar year the range touches.
+    """
+    user_ids = list(user_ids)
+    series = load_series(db, user_ids, range(start.year, end.year + 1))
+    points: Dict[str, List[Tuple[date, float]]] = {user_id: [] for user_id in user_ids}
+    for (user_id, _), s in sorted(series.items(), key=lambda item: item[0][1]):
+        points[user_id].extend(s.between(start, end))
+    return points
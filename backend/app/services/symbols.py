@@ -0,0 +1,147 @@
+import bisect
+import csv
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.models.market import SymbolInfo
+
+logger = logging.getLogger(__name__)
+
+# Listing columns, in the order written by scripts/fetch_symbol_universe.py
+LISTING_FIELDS = ("symbol", "name", "exchange", "type")
+
+def _deletes(term: str) -> Set[str]:
+    """
+    Every string one character shorter than term (its single deletions).
+    """
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+class SymbolUniverse:
+    """
+    In-memory index over the tradable symbol listing.
+
+    Tickers and name words are kept in sorted arrays so prefix lookups are two
+    binary searches. Typos within one edit of a ticker are found through a
+    map of single-character deletions (a match shares the query or one of its
+    deletions), so no query scans the whole listing.
+    """
+
+    def __init__(self, rows: Iterable[Sequence[str]]):
+        by_symbol = {}
+        for symbol, name, exchange, kind in rows:
+            symbol = symbol.strip().upper()
+            if symbol:
+                by_symbol[symbol] = (name.strip(), exchange.strip(), kind.strip())
+
+        self._symbols: List[str] = sorted(by_symbol)
+        self._names: List[str] = [by_symbol[s][0] for s in self._symbols]
+        self._exchanges: List[str] = [by_symbol[s][1] for s in self._symbols]
+        self._types: List[str] = [by_symbol[s][2] for s in self._symbols]
+        self._positions: Dict[str, int] = {symbol: i for i, symbol in enumerate(self._symbols)}
+
+        words = sorted(
+            (word, i) for i, name in enumerate(self._names) for word in set(name.lower().split())
+        )
+        self._name_words: List[str] = [word for word, _ in words]
+        self._name_word_ids: List[int] = [i for _, i in words]
+
+        self._fuzzy: Dict[str, List[int]] = {}
+        for i, symbol in enumerate(self._symbols):
+            for key in _deletes(symbol) | {symbol}:
+                self._fuzzy.setdefault(key, []).append(i)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "SymbolUniverse":
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            return cls(tuple(row.get(field) or "" for field in LISTING_FIELDS) for row in reader)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.strip().upper() in self._positions
+
+    def _info(self, i: int) -> SymbolInfo:
+        return SymbolInfo(
+            symbol=self._symbols[i],
+            name=self._names[i],
+            exchange=self._exchanges[i],
+            type=self._types[i]
+        )
+
+    def get(self, symbol: str) -> Optional[SymbolInfo]:
+        i = self._positions.get(symbol.strip().upper())
+        return self._info(i) if i is not None else None
+
+    def search(self, query: str, limit: int = 10) -> List[SymbolInfo]:
+        """
+        Ranked matches: exact ticker, ticker prefix, name-word prefix, then
+        tickers within one typo.
+        """
+        ticker = query.strip().upper()
+        if not ticker or limit <= 0:
+            return []
+        matches: Dict[int, None] = {}
+
+        def add(ids: Iterable[int]) -> bool:
+            for i in ids:
+                matches.setdefault(i, None)
+                if len(matches) >= limit:
+                    return True
+            return False
+
+        lo = bisect.bisect_left(self._symbols, ticker)
+        hi = bisect.bisect_left(self._symbols, ticker + "\uffff")
+        if add(range(lo, hi)):
+            return [self._info(i) for i in matches]
+
+        word = query.strip().lower().split()[0]
+        lo = bisect.bisect_left(self._name_words, word)
+        hi = bisect.bisect_left(self._name_words, word + "\uffff")
+        if add(self._name_word_ids[lo:hi]):
+            return [self._info(i) for i in matches]
+
+        if len(ticker) >= 2:
+            fuzzy = set()
+            for key in _deletes(ticker) | {ticker}:
+                fuzzy.update(self._fuzzy.get(key, ()))
+            add(sorted(fuzzy))
+        return [self._info(i) for i in matches]
+
+symbol_universe: Optional[SymbolUniverse] = None
+
+def load_symbol_universe(path: Optional[str] = None) -> Optional[SymbolUniverse]:
+    """
+    Loads the listing file into symbol_universe. Without a listing, search
+    returns nothing and symbols are not validated locally.
+    """
+    global symbol_universe
+    path = path or settings.SYMBOL_UNIVERSE_FILE
+    if not os.path.exists(path):
+        logger.warning("Symbol listing %s not found. Symbol search and validation are disabled.", path)
+        symbol_universe = None
+        return None
+    symbol_universe = SymbolUniverse.from_csv(path)
+    logger.info("Loaded %d symbols from %s", len(symbol_universe), path)
+    return symbol_universe
+
+def search_symbols(query: str, limit: int = 10) -> List[SymbolInfo]:
+    if symbol_universe is None:
+        return []
+    return symbol_universe.search(query, limit)
+
+def is_known_symbol(symbol: str) -> bool:
+    return symbol_universe is None or symbol in symbol_universe
+
+def ensure_known_symbol(symbol: str):
+    """
+    Rejects symbols missing from the listing before any upstream call.
+    """
+    if not is_known_symbol(symbol):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Symbol {symbol} not found"
+        )
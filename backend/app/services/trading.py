@@ -1,5 +1,9 @@
 from app.models.trade import TradeRequest, TradeResponse
+from app.services import price_stream
 from app.services.market_data import get_real_time_quote
+from app.services.symbols import ensure_known_symbol
+from app.services.upstream_scheduler import Priority
+from app.core.config import settings
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
 import uuid
@@ -93,7 +97,16 @@ def update_in_transaction(transaction, portfolio_ref, trade_request, price):
     return amount, updated_portfolio
 
 async def execute_trade(user_id: str, trade_request: TradeRequest, db) -> dict:
-    quote = await get_real_time_quote(trade_request.symbol)
+    ensure_known_symbol(trade_request.symbol)
+
+    # Trades fill at a price no older than the trade freshness bound, and are
+    # rejected (503) rather than filled at an old price while the upstream is down
+    quote = await get_real_time_quote(
+        trade_request.symbol,
+        max_age=settings.QUOTE_CACHE_TRADE_MAX_AGE,
+        priority=Priority.TRADE,
+        max_stale_age=settings.QUOTE_TRADE_MAX_STALE_AGE
+    )
     
     transaction = db.transaction()
     portfolio_ref = db.collection("portfolios").document(user_id)
@@ -117,5 +130,12 @@ async def execute_trade(user_id: str, trade_request: TradeRequest, db) -> dict:
     
     # Add to subcollection or root collection
     db.collection("transactions").document(transaction_data["id"]).set(transaction_data)
+
+    # Keep the price stream's held-symbol counts current between evaluation runs
+    held = next((h["quantity"] for h in updated_portfolio["holdings"] if h["symbol"] == trade_request.symbol), 0)
+    if trade_request.type == "BUY" and held == trade_request.quantity:
+        price_stream.holding_changed(trade_request.symbol, 1)
+    elif trade_request.type == "SELL" and held == 0:
+        price_stream.holding_changed(trade_request.symbol, -1)
     
     return transaction_data
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+class Priority(IntEnum):
+    """
+    Upstream call lanes, most urgent first.
+    """
+    TRADE = 0
+    INTERACTIVE = 1
+    BATCH = 2
+
+class UpstreamScheduler:
+    """
+    Token-bucket rate limiter for upstream market-data calls with priority lanes.
+
+    Tokens refill at rate_per_minute up to burst. Waiters are served strictly by
+    lane (trades, then interactive reads, then batch evaluation), and the batch
+    lane may not dip into the last batch_reserve tokens, so a long evaluation run
+    slows down instead of starving trades.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        batch_reserve: int = 0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.batch_reserve = min(batch_reserve, max(burst - 1, 0))
+        self.tokens = float(burst)
+        self._clock = clock
+        self._updated_at = clock()
+        self._lanes: Dict[Priority, Deque[Tuple[asyncio.Future, float]]] = {p: deque() for p in Priority}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._granted = {p: 0 for p in Priority}
+        self._total_wait = {p: 0.0 for p in Priority}
+        self._max_wait = {p: 0.0 for p in Priority}
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _threshold(self, priority: Priority) -> float:
+        return 1.0 + (self.batch_reserve if priority == Priority.BATCH else 0)
+
+    def _grant(self, priority: Priority, enqueued_at: float):
+        self.tokens -= 1.0
+        wait = self._clock() - enqueued_at
+        self._granted[priority] += 1
+        self._total_wait[priority] += wait
+        self._max_wait[priority] = max(self._max_wait[priority], wait)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE):
+        """
+        Waits until the caller may make one upstream call.
+        """
+        enqueued_at = self._clock()
+        self._refill()
+        more_urgent_waiting = any(self._lanes[p] for p in Priority if p <= priority)
+        if not more_urgent_waiting and self.tokens >= self._threshold(priority):
+            self._grant(priority, enqueued_at)
+            return
+
+        entry = (asyncio.get_running_loop().create_future(), enqueued_at)
+        self._lanes[priority].append(entry)
+        self._dispatch()
+        try:
+            await entry[0]
+        except asyncio.CancelledError:
+            try:
+                self._lanes[priority].remove(entry)
+            except ValueError:
+                pass
+            raise
+
+    def _dispatch(self):
+        self._refill()
+        for priority in Priority:
+            lane = self._lanes[priority]
+            while lane and self.tokens >= self._threshold(priority):
+                future, enqueued_at = lane.popleft()
+                if future.done():
+                    continue
+                self._grant(priority, enqueued_at)
+                future.set_result(None)
+            if lane:
+                # Strict priority: lower lanes wait while this one is queued
+                self._schedule((self._threshold(priority) - self.tokens) / self.rate)
+                return
+
+    def _schedule(self, delay: float):
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            self._timer.cancel()
+        self._timer = loop.call_later(max(delay, 0.0), self._on_timer)
+        self._timer_loop = loop
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def stats(self) -> dict:
+        self._refill()
+        lanes = {}
+        for priority in Priority:
+            granted = self._granted[priority]
+            lanes[priority.name.lower()] = {
+                "queue_depth": len(self._lanes[priority]),
+                "granted": granted,
+                "avg_wait_ms": round(self._total_wait[priority] / granted * 1000, 2) if granted else 0.0,
+                "max_wait_ms": round(self._max_wait[priority] * 1000, 2)
+            }
+        return {
+            "rate_per_minute": round(self.rate * 60.0, 2),
+            "burst": int(self.capacity),
+            "batch_reserve": self.batch_reserve,
+            "tokens": round(self.tokens, 2),
+            "lanes": lanes
+        }
@@ -0,0 +1,15 @@
+import pytest
+
+
+class FakeClock:
+    """Monotonic clock stand-in the tests advance by hand through `now`."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,152 @@
+"""
+In-memory stand-in for the parts of the Firestore client the evaluation code
+uses, counting document reads and writes and the round trips they took so
+tests can assert on them and the benchmarks in scripts/ can report them.
+"""
+import copy
+import operator
+import threading
+import time
+from collections import Counter
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self._collection = collection
+        self.id = doc_id
+
+    def _snapshot(self):
+        self._db.count("read")
+        return FakeSnapshot(self.id, self._db.data[self._collection].get(self.id))
+
+    def _set(self, data):
+        self._db.count("write")
+        self._db.data[self._collection][self.id] = copy.deepcopy(data)
+
+    def _update(self, data):
+        self._db.count("write")
+        self._db.data[self._collection][self.id].update(copy.deepcopy(data))
+
+    def _delete(self, data=None):
+        self._db.count("write")
+        self._db.data[self._collection].pop(self.id, None)
+
+    def get(self):
+        self._db.round_trip()
+        return self._snapshot()
+
+    def set(self, data):
+        self._db.round_trip()
+        self._set(data)
+
+    def update(self, data):
+        self._db.round_trip()
+        self._update(data)
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data):
+        self._writes.append((ref._set, data))
+
+    def update(self, ref, data):
+        self._writes.append((ref._update, data))
+
+    def delete(self, ref):
+        self._writes.append((ref._delete, None))
+
+    def commit(self):
+        self._db.round_trip()
+        with self._db.lock:
+            for write, data in self._writes:
+                write(data)
+
+
+OPERATORS = {
+    "<": operator.lt, "<=": operator.le, "==": operator.eq, ">=": operator.ge, ">": operator.gt,
+    "array_contains": operator.contains
+}
+
+
+class FakeCollection:
+    def __init__(self, db, name, filters=(), limit=None):
+        self._db = db
+        self._name = name
+        self._filters = filters
+        self._limit = limit
+
+    def document(self, doc_id):
+        return FakeDocument(self._db, self._name, doc_id)
+
+    def where(self, filter):
+        return FakeCollection(self._db, self._name, self._filters + (filter,), self._limit)
+
+    def limit(self, count):
+        return FakeCollection(self._db, self._name, self._filters, count)
+
+    def _matches(self, data):
+        return all(
+            f.field_path in data and OPERATORS[f.op_string](data[f.field_path], f.value)
+            for f in self._filters
+        )
+
+    def stream(self):
+        self._db.round_trip()
+        matched = 0
+        for doc_id, data in list(self._db.data[self._name].items()):
+            if self._limit is not None and matched >= self._limit:
+                return
+            if self._matches(data):
+                matched += 1
+                self._db.count("read")
+                yield FakeSnapshot(doc_id, data)
+
+
+class FakeFirestore:
+    """
+    Every round trip sleeps `latency` seconds, like a network call would.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.data = {}
+        self.ops = Counter()
+        self.latency = latency
+        # Reads and batch commits run in executor threads
+        self.lock = threading.RLock()
+
+    def count(self, op: str):
+        with self.lock:
+            self.ops[op] += 1
+
+    def round_trip(self):
+        self.count("round_trip")
+        if self.latency:
+            time.sleep(self.latency)
+
+    def collection(self, name):
+        self.data.setdefault(name, {})
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, refs):
+        self.round_trip()
+        return [ref._snapshot() for ref in refs]
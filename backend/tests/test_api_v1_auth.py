@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
 import sys
@@ -13,6 +14,15 @@ with patch("google.cloud.firestore.Client"):
 
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def overrides():
+    """
+    Clears whatever a test overrode so other test modules see the real
+    dependencies.
+    """
+    yield app.dependency_overrides
+    app.dependency_overrides.clear()
+
 def test_login_success():
     mock_db = MagicMock()
     mock_collection = mock_db.collection.return_value
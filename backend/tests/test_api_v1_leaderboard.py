@@ -0,0 +1,229 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from datetime import date, datetime, timezone
+import sys
+import os
+
+# Add backend directory to sys.path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock firestore before importing main
+with patch("google.cloud.firestore.Client"):
+    from app.main import app
+    from app.db.firestore import get_db
+    from app.api.deps import get_current_user, get_current_user_id
+    from app.services.leaderboards import leaderboard_cache
+    from app.models.job import EvaluationJob
+    from app.models.leaderboard import Leaderboard, LeaderboardChanges, LeaderboardEntry, LeaderboardStanding
+    from app.models.snapshot import PortfolioPerformance
+
+client = TestClient(app)
+
+def get_mock_db():
+    return MagicMock()
+
+def mock_get_current_user():
+    return {"id": "test_user_id", "email": "test@example.com", "username": "testuser"}
+
+@pytest.fixture(autouse=True)
+def overrides():
+    """
+    Authenticated caller and a mock database for every test; cleared
+    afterwards so other test modules see the real dependencies.
+    """
+    app.dependency_overrides[get_db] = get_mock_db
+    app.dependency_overrides[get_current_user] = mock_get_current_user
+    app.dependency_overrides[get_current_user_id] = lambda: "test_user_id"
+    yield app.dependency_overrides
+    app.dependency_overrides.clear()
+
+def make_job(**fields):
+    return EvaluationJob(**{"id": "job1", "status": "running", "created_at": datetime.now(timezone.utc), **fields})
+
+def test_trigger_evaluation_returns_job_without_waiting():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+
+    with patch("app.api.v1.endpoints.leaderboard.evaluation_jobs") as mock_jobs:
+        mock_jobs.submit.return_value = (make_job(status="queued"), True)
+        response = client.post("/api/v1/leaderboard/admin/evaluate")
+
+    assert response.status_code == 202
+    assert response.json()["id"] == "job1"
+    assert response.json()["status"] == "queued"
+    mock_jobs.submit.assert_called_once_with(mock_db)
+
+def test_get_evaluation_job_reports_progress():
+    job = make_job(run_id="run1", users_total=100, users_processed=40, symbols=12, symbols_priced=10, eta_seconds=30.0)
+
+    with patch("app.api.v1.endpoints.leaderboard.evaluation_jobs") as mock_jobs:
+        mock_jobs.get.return_value = job
+        response = client.get("/api/v1/leaderboard/admin/jobs/job1")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["users_processed"] == 40
+    assert data["symbols_priced"] == 10
+    assert data["eta_seconds"] == 30.0
+    assert data["errors"] == []
+    mock_jobs.get.assert_called_once_with("job1")
+
+def test_get_evaluation_job_not_found():
+    with patch("app.api.v1.endpoints.leaderboard.evaluation_jobs") as mock_jobs:
+        mock_jobs.get.return_value = None
+        response = client.get("/api/v1/leaderboard/admin/jobs/missing")
+
+    assert response.status_code == 404
+
+def make_entry(rank):
+    return LeaderboardEntry(user_id=f"user{rank}", username=f"name{rank}", ppg=100.0 - rank, rank=rank)
+
+def make_leaderboard(ranks, updated_at=None):
+    return Leaderboard(
+        id="7d", updated_at=updated_at or datetime(2026, 1, 2, 22, 0, tzinfo=timezone.utc),
+        entries=[make_entry(rank) for rank in ranks], total=1000, pages=2, page_size=500
+    )
+
+def test_get_leaderboard_page():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    leaderboard_cache.clear()
+
+    with patch("app.services.leaderboards.get_leaderboard", return_value=make_leaderboard(range(101, 151))) as mock_get:
+        response = client.get("/api/v1/leaderboard/7d?offset=100&limit=50")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1000
+    assert [entry["rank"] for entry in data["entries"]] == list(range(101, 151))
+    assert response.headers["etag"].startswith('"7d-')
+    assert response.headers["cache-control"].startswith("private, max-age=")
+    mock_get.assert_called_once_with(mock_db, "7d", 100, 50)
+
+def test_get_leaderboard_is_cached_and_revalidated_by_etag():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    leaderboard_cache.clear()
+
+    with patch("app.services.leaderboards.get_leaderboard", return_value=make_leaderboard(range(1, 4))) as mock_get:
+        first = client.get("/api/v1/leaderboard/7d?limit=3")
+        etag = first.headers["etag"]
+        again = client.get("/api/v1/leaderboard/7d?limit=3")
+        not_modified = client.get("/api/v1/leaderboard/7d?limit=3", headers={"If-None-Match": f'"other", W/{etag}'})
+        other_range = client.get("/api/v1/leaderboard/7d?limit=2", headers={"If-None-Match": etag})
+
+    # Only the first request of each range reads Firestore
+    assert mock_get.call_count == 2
+    assert again.content == first.content
+    assert again.headers["etag"] == etag
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert other_range.status_code == 200
+    assert other_range.headers["etag"] != etag
+
+    # A publish in this process drops the cache; the new version gets a new ETag
+    leaderboard_cache.clear()
+    newer = make_leaderboard(range(1, 4), updated_at=datetime(2026, 1, 3, 22, 0, tzinfo=timezone.utc))
+    with patch("app.services.leaderboards.get_leaderboard", return_value=newer):
+        response = client.get("/api/v1/leaderboard/7d?limit=3", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_get_leaderboard_not_found():
+    leaderboard_cache.clear()
+    with patch("app.services.leaderboards.get_leaderboard", return_value=None):
+        response = client.get("/api/v1/leaderboard/7d")
+
+    assert response.status_code == 404
+
+def test_get_leaderboard_rejects_bad_ranges():
+    assert client.get("/api/v1/leaderboard/2d").status_code == 400
+    assert client.get("/api/v1/leaderboard/7d?limit=0").status_code == 422
+    assert client.get("/api/v1/leaderboard/7d?limit=10000").status_code == 422
+    assert client.get("/api/v1/leaderboard/7d?offset=-1").status_code == 422
+
+def test_get_my_standing():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    standing = LeaderboardStanding(
+        window="7d", user_id="test_user_id", username="testuser", ppg=12.5, rank=42,
+        above=[make_entry(41)], below=[make_entry(43)]
+    )
+
+    with patch("app.api.v1.endpoints.leaderboard.leaderboards.get_standing", return_value=standing) as mock_get:
+        response = client.get("/api/v1/leaderboard/7d/me?neighbours=1")
+
+    assert response.status_code == 200
+    assert response.json()["rank"] == 42
+    assert response.json()["above"][0]["rank"] == 41
+    mock_get.assert_called_once_with(mock_db, "7d", "test_user_id", 1)
+
+def test_get_my_standing_not_ranked():
+    with patch("app.api.v1.endpoints.leaderboard.leaderboards.get_standing", return_value=None):
+        response = client.get("/api/v1/leaderboard/7d/me")
+
+    assert response.status_code == 404
+
+def test_get_leaderboard_changes():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    changes = LeaderboardChanges(
+        window="7d", since=3, version=5, updated_at=datetime.now(timezone.utc), total=1000,
+        entries=[make_entry(7)], removed=["gone"]
+    )
+
+    with patch("app.api.v1.endpoints.leaderboard.leaderboards.get_changes", return_value=changes) as mock_get:
+        response = client.get("/api/v1/leaderboard/7d/changes?since=3")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 5
+    assert data["full_reload"] is False
+    assert [entry["rank"] for entry in data["entries"]] == [7]
+    assert data["removed"] == ["gone"]
+    mock_get.assert_called_once_with(mock_db, "7d", 3)
+
+def test_get_leaderboard_changes_requires_a_version():
+    assert client.get("/api/v1/leaderboard/7d/changes").status_code == 422
+    assert client.get("/api/v1/leaderboard/7d/changes?since=-1").status_code == 422
+    with patch("app.api.v1.endpoints.leaderboard.leaderboards.get_changes", return_value=None):
+        assert client.get("/api/v1/leaderboard/7d/changes?since=1").status_code == 404
+
+def test_risk_leaderboards_are_served_like_ppg_windows():
+    leaderboard_cache.clear()
+    sharpe = make_leaderboard(range(1, 3)).model_copy(update={"id": "sharpe_90d", "metric": "sharpe"})
+
+    with patch("app.services.leaderboards.get_leaderboard", return_value=sharpe):
+        response = client.get("/api/v1/leaderboard/sharpe_90d?limit=2")
+
+    assert response.status_code == 200
+    assert response.json()["metric"] == "sharpe"
+
+def test_performance_ranking_over_a_custom_range():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    users = []
+    for user_id in ["a", "b", "c", "d"]:
+        user_doc = MagicMock(id=user_id)
+        user_doc.to_dict.return_value = {"username": f"name-{user_id}"}
+        users.append(user_doc)
+    mock_db.collection.return_value.stream.return_value = users
+    performances = {
+        user_id: PortfolioPerformance(
+            user_id=user_id, start="2025-01-01", end="2025-02-01", start_date="2025-01-01", start_value=100.0,
+            end_date="2025-02-01", end_value=100.0 + ppg, value_change=ppg, ppg=ppg
+        )
+        for user_id, ppg in [("a", 5.0), ("b", 15.0), ("c", 10.0)]
+    }
+    performances["d"] = None
+
+    with patch("app.api.v1.endpoints.leaderboard.portfolio_performance", return_value=performances) as mock_performance:
+        response = client.get("/api/v1/leaderboard/admin/performance?start=2025-01-01&end=2025-02-01&offset=1&limit=2")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 3
+    assert [(e["user_id"], e["username"]) for e in data["entries"]] == [("c", "name-c"), ("a", "name-a")]
+    assert mock_performance.call_args[0][2:] == (date(2025, 1, 1), date(2025, 2, 1))
@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, AsyncMock
 import sys
@@ -6,7 +7,7 @@ import os
 # Add backend directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.models.market import StockQuote
+from app.models.market import StockQuote, StockQuoteBatch
 
 # Mock firestore before importing main
 with patch("google.cloud.firestore.Client"):
@@ -18,7 +19,15 @@ client = TestClient(app)
 def mock_get_current_user():
     return {"id": "test_user_id", "email": "test@example.com"}
 
-app.dependency_overrides[get_current_user] = mock_get_current_user
+@pytest.fixture(autouse=True)
+def overrides():
+    """
+    Authenticated caller for every test; cleared afterwards so other test
+    modules see the real dependencies.
+    """
+    app.dependency_overrides[get_current_user] = mock_get_current_user
+    yield app.dependency_overrides
+    app.dependency_overrides.clear()
 
 def test_get_quote_endpoint_success():
     mock_quote = StockQuote(
@@ -51,3 +60,118 @@ def test_get_quote_endpoint_not_found():
         
         assert response.status_code == 404
         assert response.json()["detail"] == "Symbol INVALID not found"
+
+def test_get_quotes_endpoint_dedupes_symbols():
+    mock_batch = StockQuoteBatch(
+        quotes={"AAPL": StockQuote(symbol="AAPL", price=150.0, change=1.5, percent_change=1.0)},
+        errors={"INVALID": "Symbol INVALID not found"}
+    )
+
+    with patch("app.api.v1.endpoints.market.get_real_time_quotes", new_callable=AsyncMock) as mock_service:
+        mock_service.return_value = mock_batch
+
+        response = client.get("/api/v1/market/quotes", params={"symbols": "AAPL, INVALID,AAPL,"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["quotes"]["AAPL"]["price"] == 150.0
+        assert data["errors"]["INVALID"] == "Symbol INVALID not found"
+        mock_service.assert_called_once_with(["AAPL", "INVALID"])
+
+def test_get_quotes_endpoint_rejects_empty_symbols():
+    response = client.get("/api/v1/market/quotes", params={"symbols": " , "})
+    assert response.status_code == 400
+
+def test_stream_endpoint_rejects_when_at_capacity():
+    from app.api.deps import get_current_user_from_stream_ticket
+    from app.services import market_data
+    from app.services.price_broadcast import StreamCapacityError
+
+    app.dependency_overrides[get_current_user_from_stream_ticket] = mock_get_current_user
+    with patch.object(market_data.price_broadcaster, "subscribe", side_effect=StreamCapacityError("full")):
+        response = client.get("/api/v1/market/stream", params={"symbols": "AAPL", "ticket": "t"})
+
+    assert response.status_code == 503
+
+def test_stream_accepts_only_short_lived_tickets():
+    from unittest.mock import MagicMock
+    from app.api.deps import get_db
+    from app.core import security
+    from app.services import market_data
+    from app.services.price_broadcast import StreamCapacityError
+
+    access_token = security.create_access_token("test_user_id")
+    mock_db = MagicMock()
+    mock_db.collection.return_value.document.return_value.get.return_value.to_dict.return_value = {"id": "test_user_id"}
+    app.dependency_overrides[get_db] = lambda: mock_db
+    response = client.post("/api/v1/market/stream/ticket", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 200
+    ticket = response.json()["ticket"]
+    assert response.json()["expires_in"] == 60
+
+    with patch.object(market_data.price_broadcaster, "subscribe", side_effect=StreamCapacityError("full")):
+        # The ticket opens the stream (which then reports capacity)...
+        assert client.get("/api/v1/market/stream", params={"symbols": "AAPL", "ticket": ticket}).status_code == 503
+        # ...but the access token does not
+        assert client.get("/api/v1/market/stream", params={"symbols": "AAPL", "ticket": access_token}).status_code == 401
+
+    # And the ticket is no good as an access token
+    response = client.post("/api/v1/market/stream/ticket", headers={"Authorization": f"Bearer {ticket}"})
+    assert response.status_code == 401
+
+def test_get_multi_history_endpoint():
+    payload = {"resolution": "D", "t": [1, 2], "series": {"AAPL": {"close": [1.0, 2.0]}}, "errors": {}}
+
+    with patch("app.api.v1.endpoints.market.get_aligned_history", new_callable=AsyncMock) as mock_service:
+        mock_service.return_value = payload
+
+        response = client.get("/api/v1/market/history", params={"symbols": "AAPL,ES", "limit": 2})
+
+        assert response.status_code == 200
+        assert response.json() == payload
+        mock_service.assert_called_once_with(["AAPL", "ES"], "D", 2, ["close"], points=None)
+
+def test_get_multi_history_rejects_unknown_field():
+    response = client.get("/api/v1/market/history", params={"symbols": "AAPL", "fields": "close,foo"})
+    assert response.status_code == 400
+
+def test_get_history_passes_parsed_indicators():
+    with patch("app.api.v1.endpoints.market.get_market_history", new_callable=AsyncMock) as mock_service:
+        mock_service.return_value = {"candles": [], "indicators": {}}
+
+        response = client.get("/api/v1/market/history/AAPL", params={"indicators": "sma:20,rsi"})
+
+        assert response.status_code == 200
+        specs = mock_service.call_args.kwargs["indicators"]
+        assert [(spec.name, spec.params) for spec in specs] == [("sma", (20,)), ("rsi", (14,))]
+
+def test_get_history_rejects_unknown_indicator():
+    response = client.get("/api/v1/market/history/AAPL", params={"indicators": "sma,foo"})
+    assert response.status_code == 400
+
+def test_search_symbols_endpoint():
+    from app.services import symbols
+    universe = symbols.SymbolUniverse([("AAPL", "Apple Inc", "XNAS", "Common Stock")])
+
+    with patch.object(symbols, "symbol_universe", universe):
+        response = client.get("/api/v1/market/symbols", params={"q": "app"})
+
+    assert response.status_code == 200
+    assert response.json() == [{"symbol": "AAPL", "name": "Apple Inc", "exchange": "XNAS", "type": "Common Stock"}]
+
+def test_unknown_symbols_are_rejected_before_fetching():
+    from app.services import symbols
+    universe = symbols.SymbolUniverse([("AAPL", "Apple Inc", "XNAS", "Common Stock")])
+    batch = StockQuoteBatch(quotes={"AAPL": StockQuote(symbol="AAPL", price=1.0, change=0.0, percent_change=0.0)}, errors={})
+
+    with patch.object(symbols, "symbol_universe", universe), \
+         patch("app.api.v1.endpoints.market.get_real_time_quote", new_callable=AsyncMock) as mock_quote, \
+         patch("app.api.v1.endpoints.market.get_real_time_quotes", new_callable=AsyncMock) as mock_quotes:
+        mock_quotes.return_value = batch
+        single = client.get("/api/v1/market/quote/NOPE")
+        multi = client.get("/api/v1/market/quotes", params={"symbols": "AAPL,NOPE"})
+
+    assert single.status_code == 404
+    mock_quote.assert_not_called()
+    mock_quotes.assert_called_once_with(["AAPL"])
+    assert multi.json()["errors"] == {"NOPE": "Symbol NOPE not found"}
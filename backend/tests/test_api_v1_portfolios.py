@@ -1,5 +1,7 @@
+import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
+from datetime import date
 import sys
 import os
 
@@ -11,6 +13,7 @@ with patch("google.cloud.firestore.Client"):
     from app.main import app
     from app.db.firestore import get_db
     from app.api.deps import get_current_user
+    from app.models.snapshot import PortfolioPerformance
 
 client = TestClient(app)
 
@@ -21,8 +24,16 @@ def get_mock_db():
 def mock_get_current_user():
     return {"id": "test_user_id", "email": "test@example.com", "username": "testuser"}
 
-# Override dependencies globally for this test file
-app.dependency_overrides[get_current_user] = mock_get_current_user
+@pytest.fixture(autouse=True)
+def overrides():
+    """
+    Authenticated caller and a mock database for every test; cleared
+    afterwards so other test modules see the real dependencies.
+    """
+    app.dependency_overrides[get_current_user] = mock_get_current_user
+    app.dependency_overrides[get_db] = get_mock_db
+    yield app.dependency_overrides
+    app.dependency_overrides.clear()
 
 def test_create_portfolio_success():
     mock_db = MagicMock()
@@ -86,7 +97,7 @@ def test_get_portfolio_success():
     assert data["cash_balance"] == 100000.0
     assert data["user_id"] == "test_user_id"
 
-def test_get_portfolio_not_found():
+def test_get_portfolio_not_found_creates_it():
     mock_db = MagicMock()
     app.dependency_overrides[get_db] = lambda: mock_db
     
@@ -98,5 +109,57 @@ def test_get_portfolio_not_found():
 
     response = client.get("/api/v1/portfolios/me")
     
+    # New users get a starting portfolio on first read
+    assert response.status_code == 200
+    assert response.json()["cash_balance"] == 100000.0
+    assert mock_portfolio_ref.set.called
+
+def test_get_portfolio_snapshots_in_range():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    points = {"test_user_id": [(date(2025, 1, 2), 100.0), (date(2025, 1, 3), 101.5)]}
+
+    with patch("app.api.v1.endpoints.portfolios.values_between", return_value=points) as mock_values:
+        response = client.get("/api/v1/portfolios/me/snapshots?start=2025-01-01&end=2025-01-31")
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"date": "2025-01-02", "total_value": 100.0},
+        {"date": "2025-01-03", "total_value": 101.5}
+    ]
+    mock_values.assert_called_once_with(mock_db, ["test_user_id"], date(2025, 1, 1), date(2025, 1, 31))
+
+def test_get_portfolio_snapshots_rejects_inverted_range():
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    response = client.get("/api/v1/portfolios/me/snapshots?start=2025-02-01&end=2025-01-01")
+    assert response.status_code == 400
+
+def make_performance(user_id="test_user_id", ppg=20.0):
+    return PortfolioPerformance(
+        user_id=user_id, start="2025-01-01", end="2025-03-31", start_date="2024-12-31", start_value=100.0,
+        end_date="2025-03-31", end_value=100.0 + ppg, value_change=ppg, ppg=ppg
+    )
+
+def test_get_portfolio_performance():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+
+    with patch("app.api.v1.endpoints.portfolios.portfolio_performance",
+               return_value={"test_user_id": make_performance()}) as mock_performance:
+        response = client.get("/api/v1/portfolios/me/performance?start=2025-01-01&end=2025-03-31")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ppg"] == 20.0
+    assert data["start_date"] == "2024-12-31"
+    assert data["username"] == "testuser"
+    mock_performance.assert_called_once_with(mock_db, ["test_user_id"], date(2025, 1, 1), date(2025, 3, 31))
+
+def test_get_portfolio_performance_without_snapshots():
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+
+    with patch("app.api.v1.endpoints.portfolios.portfolio_performance", return_value={"test_user_id": None}):
+        response = client.get("/api/v1/portfolios/me/performance")
+
     assert response.status_code == 404
-    assert response.json()["detail"] == "Portfolio not found"
+    assert client.get("/api/v1/portfolios/me/performance?start=2025-02-01&end=2025-01-01").status_code == 400
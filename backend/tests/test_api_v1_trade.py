@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch, AsyncMock
 import sys
@@ -20,8 +21,16 @@ def mock_get_current_user():
 def mock_get_db():
     return MagicMock()
 
-app.dependency_overrides[get_current_user] = mock_get_current_user
-app.dependency_overrides[get_db] = mock_get_db
+@pytest.fixture(autouse=True)
+def overrides():
+    """
+    Authenticated caller and a mock database for every test; cleared
+    afterwards so other test modules see the real dependencies.
+    """
+    app.dependency_overrides[get_current_user] = mock_get_current_user
+    app.dependency_overrides[get_db] = mock_get_db
+    yield app.dependency_overrides
+    app.dependency_overrides.clear()
 
 def test_buy_stock_success():
     # Mock result from service
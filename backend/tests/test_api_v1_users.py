@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
 import sys
@@ -17,6 +18,16 @@ def get_mock_db():
     mock_db = MagicMock()
     return mock_db
 
+@pytest.fixture(autouse=True)
+def overrides():
+    """
+    Mock database for every test; cleared afterwards so other test modules
+    see the real dependencies.
+    """
+    app.dependency_overrides[get_db] = get_mock_db
+    yield app.dependency_overrides
+    app.dependency_overrides.clear()
+
 def test_register_user_success():
     mock_db = MagicMock()
     # Setup mock for user check (user does not exist)
@@ -0,0 +1,108 @@
+import threading
+import time
+import pytest
+import sys
+import os
+from google.api_core import exceptions as gexc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.batch_writer import BatchWriter
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+class StandInBatch:
+    def __init__(self, db):
+        self._db = db
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append(("set", ref, data))
+
+    def update(self, ref, data):
+        self.writes.append(("update", ref, data))
+
+    def commit(self):
+        with self._db.lock:
+            self._db.in_flight += 1
+            self._db.max_in_flight = max(self._db.max_in_flight, self._db.in_flight)
+            error = self._db.errors.pop(0) if self._db.errors else None
+        time.sleep(self._db.latency)
+        with self._db.lock:
+            self._db.in_flight -= 1
+            if error is not None:
+                raise error
+            self._db.committed.append(self.writes)
+
+class StandInDB:
+    """
+    Records committed batches; commits raise the queued errors in order.
+    """
+    def __init__(self, errors=None, latency=0.0):
+        self.errors = list(errors or [])
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.committed = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def batch(self):
+        return StandInBatch(self)
+
+async def no_sleep(seconds):
+    pass
+
+@pytest.mark.anyio
+async def test_writes_are_chunked_and_committed_in_parallel():
+    db = StandInDB(latency=0.02)
+    writer = BatchWriter(db, batch_size=10, max_in_flight=3, sleep=no_sleep)
+
+    for i in range(95):
+        await writer.set(f"doc{i}", {"i": i})
+    report = await writer.flush()
+
+    assert [len(batch) for batch in db.committed].count(10) == 9
+    assert sum(len(batch) for batch in db.committed) == 95
+    assert 1 < db.max_in_flight <= 3
+    assert report["writes"] == 95
+    assert report["batches"] == 10
+    assert report["failed_batches"] == []
+
+def test_batch_size_is_capped_at_firestore_limit():
+    assert BatchWriter(StandInDB(), batch_size=2000).batch_size == 500
+
+@pytest.mark.anyio
+async def test_contention_is_retried_with_a_fresh_batch():
+    db = StandInDB(errors=[gexc.Aborted("contention"), gexc.ResourceExhausted("slow down")])
+    delays = []
+
+    async def record_sleep(seconds):
+        delays.append(seconds)
+
+    writer = BatchWriter(db, batch_size=5, base_delay=0.1, sleep=record_sleep)
+    await writer.update("portfolio", {"total_value": 1.0})
+    report = await writer.flush()
+
+    assert db.committed == [[("update", "portfolio", {"total_value": 1.0})]]
+    assert report["retries"] == 2
+    assert report["failed_writes"] == 0
+    # Exponential backoff with jitter in [delay / 2, delay]
+    assert 0.05 <= delays[0] <= 0.1
+    assert 0.1 <= delays[1] <= 0.2
+
+@pytest.mark.anyio
+async def test_failed_batches_are_reported_on_flush():
+    db = StandInDB(errors=[gexc.Aborted("contention")] * 3 + [gexc.InvalidArgument("bad field")])
+    writer = BatchWriter(db, batch_size=2, max_in_flight=1, max_attempts=3, sleep=no_sleep)
+
+    for i in range(6):
+        await writer.set(f"doc{i}", {"i": i})
+    report = await writer.flush()
+
+    # Batch 1 runs out of attempts, batch 2 is not retryable, batch 3 commits
+    assert report["writes"] == 2
+    assert report["failed_writes"] == 4
+    assert [(f["batch"], f["attempts"]) for f in report["failed_batches"]] == [(1, 3), (2, 1)]
+    assert "InvalidArgument" in report["failed_batches"][1]["error"]
@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.candle_store import CandleStore, candles_from_columns
+
+def make_candles(times, price=100.0):
+    times = list(times)
+    return candles_from_columns({
+        "t": times,
+        "o": [price] * len(times),
+        "h": [price + 1] * len(times),
+        "l": [price - 1] * len(times),
+        "c": [price + 0.5] * len(times),
+        "v": [1000] * len(times)
+    })
+
+def test_merge_and_query_round_trip(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.merge("AAPL", "D", make_candles(range(0, 1000, 100)), 0, 999)
+
+    candles = store.query("AAPL", "D")
+    assert candles["t"].tolist() == list(range(0, 1000, 100))
+    assert store.coverage("AAPL", "D") == {"start": 0, "end": 999}
+
+    # Stored columns are memory-mapped
+    assert isinstance(store.load("AAPL", "D")["c"], np.memmap)
+
+def test_query_by_time_range_and_limit(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.merge("AAPL", "D", make_candles(range(0, 1000, 100)), 0, 999)
+
+    assert store.query("AAPL", "D", start=250, end=600)["t"].tolist() == [300, 400, 500, 600]
+    assert store.query("AAPL", "D", limit=3)["t"].tolist() == [700, 800, 900]
+    assert store.query("AAPL", "D", end=450, limit=2)["t"].tolist() == [300, 400]
+    assert len(store.query("MSFT", "D")["t"]) == 0
+
+def test_merge_appends_replaces_and_backfills(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.merge("AAPL", "D", make_candles([100, 200, 300]), 100, 300)
+
+    # Re-fetched forming bar at 300 is replaced, 400 appended
+    store.merge("AAPL", "D", make_candles([300, 400], price=200.0), 300, 400)
+    # Older history backfilled
+    store.merge("AAPL", "D", make_candles([0, 50]), 0, 99)
+
+    candles = store.query("AAPL", "D")
+    assert candles["t"].tolist() == [0, 50, 100, 200, 300, 400]
+    assert candles["o"].tolist() == [100.0, 100.0, 100.0, 100.0, 200.0, 200.0]
+    assert store.coverage("AAPL", "D") == {"start": 0, "end": 400}
+
+def test_inconsistent_columns_are_ignored(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.merge("AAPL", "D", make_candles([100, 200]), 100, 200)
+
+    # Simulate a torn write: one column shorter than the rest
+    np.save(os.path.join(str(tmp_path), "AAPL", "D", "c.npy"), np.array([1.0]))
+
+    assert len(store.query("AAPL", "D")["t"]) == 0
+
+def test_symbol_is_sanitized_for_paths(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.merge("../ES=F", "D", make_candles([100]), 100, 100)
+
+    assert store.query("../ES=F", "D")["t"].tolist() == [100]
+    assert os.listdir(str(tmp_path)) == [".._ES_F"]
+
+def test_dot_names_cannot_leave_the_store(tmp_path):
+    store = CandleStore(str(tmp_path / "store"))
+
+    for symbol in (".", "..", "...", ""):
+        with pytest.raises(ValueError):
+            store.merge(symbol, "D", make_candles([100]), 100, 100)
+        with pytest.raises(ValueError):
+            store.coverage(symbol, "D")
+    with pytest.raises(ValueError):
+        store.merge("AAPL", "..", make_candles([100]), 100, 100)
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,65 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["short_circuited"] == 1
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = open_breaker(clock)
+
+    clock.now += 10.0
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Everyone else still fails fast while the probe is in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+def test_failed_probe_reopens(clock):
+    breaker = open_breaker(clock)
+
+    clock.now += 10.0
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    clock.now += 5.0
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_abandoned_probe_is_replaced(clock):
+    breaker = open_breaker(clock)
+
+    clock.now += 10.0
+    breaker.before_call()  # probe whose caller never reports back
+    clock.now += 10.0
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
@@ -1,3 +1,5 @@
+import copy
+import random
 import pytest
 from unittest.mock import MagicMock, patch, AsyncMock
 import sys
@@ -6,112 +8,95 @@ from datetime import datetime, date, timedelta, timezone
 
 # Ensure backend root is in sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# In-memory Firestore stand-in, shared with the benchmarks in scripts/
+from firestore_stub import FakeFirestore
+from google.api_core import exceptions as gexc
 
 # Mock firestore client at the top level before any app imports that use it
 with patch("google.cloud.firestore.Client"):
-    from app.services.evaluation import snapshot_portfolio, calculate_ppg, update_all_portfolios_total_value, generate_leaderboards
-    from app.models.market import StockQuote
+    from app.services.evaluation import (
+        snapshot_portfolio, calculate_ppg, update_all_portfolios_total_value, generate_leaderboards,
+        shard_of, publish_if_complete, BOARDS
+    )
+    from app.models.market import StockQuote, StockQuoteBatch
     from app.models.snapshot import PortfolioSnapshot
     from app.models.portfolio import PortfolioInDB
     from app.models.leaderboard import LeaderboardEntry, Leaderboard
+    from app.db.firestore import get_documents
+    from app.services.snapshot_series import SnapshotSeries
+    from app.services.leaderboards import get_changes, shift_at
+    from app.core.config import settings
     from fastapi import HTTPException
 
 @pytest.fixture
 def anyio_backend():
     return 'asyncio'
 
+def mock_quotes_batch(get_quote):
+    """
+    Builds a get_real_time_quotes stand-in from a per-symbol quote function.
+    """
+    async def fake_get_real_time_quotes(symbols, **kwargs):
+        batch = StockQuoteBatch(quotes={}, errors={})
+        for symbol in symbols:
+            try:
+                batch.quotes[symbol] = get_quote(symbol)
+            except HTTPException as exc:
+                batch.errors[symbol] = exc.detail
+        return batch
+    return AsyncMock(side_effect=fake_get_real_time_quotes)
+
+def mock_get_all(documents):
+    """
+    Builds a db.get_all stand-in answering each ref from documents by ref.id.
+    """
+    def get_all(refs):
+        return [
+            MagicMock(id=ref.id, exists=ref.id in documents, to_dict=lambda data=documents.get(ref.id): data)
+            for ref in refs
+        ]
+    return MagicMock(side_effect=get_all)
+
+def batched_writes(mock_db, op):
+    """
+    Maps each document ref written through mock_db.batch() with op to its data.
+    """
+    return {call[0][0]: call[0][1] for call in getattr(mock_db.batch.return_value, op).call_args_list}
+
 @pytest.mark.anyio
 async def test_snapshot_portfolio_success():
-    mock_db = MagicMock()
     user_id = "test_user_id"
-    today_date_str = date.today().isoformat()
-    
-    # Mock current portfolio data
-    mock_portfolio_data = {
-        "user_id": user_id,
+    today = date.today()
+    db = seeded_db({user_id: {
         "cash_balance": 90000.0,
-        "holdings": [{"symbol": "AAPL", "quantity": 10, "average_price": 100.0}],
-        "total_value": 0.0, 
-        "created_at": datetime.now(),
-        "updated_at": datetime.now()
-    }
-    
-    # Mock the Firestore document snapshot for the user's portfolio
-    mock_portfolio_snapshot = MagicMock()
-    mock_portfolio_snapshot.exists = True
-    mock_portfolio_snapshot.to_dict.return_value = mock_portfolio_data
-
-    # Mock the Firestore document reference for the user's portfolio
-    mock_portfolio_doc_ref = MagicMock()
-    mock_portfolio_doc_ref.get.return_value = mock_portfolio_snapshot
-
-    # Mock the Firestore document snapshot for today's portfolio snapshot (should not exist yet)
-    mock_existing_snapshot_get = MagicMock(exists=False)
-
-    # Mock the Firestore document reference where the new snapshot will be written
-    mock_new_snapshot_doc_ref = MagicMock()
-    mock_new_snapshot_doc_ref.get.return_value = mock_existing_snapshot_get
-    mock_new_snapshot_doc_ref.set = MagicMock() 
-
-    # Configure the mock_db.collection().document() calls
-    mock_db.collection.return_value.document.side_effect = lambda doc_id: {
-        user_id: mock_portfolio_doc_ref,
-        f"{user_id}_{today_date_str}": mock_new_snapshot_doc_ref 
-    }.get(doc_id, MagicMock())
-
-    # Also make sure collection("portfolio_snapshots") is handled properly
-    mock_snapshots_collection = MagicMock()
-    mock_snapshots_collection.document.return_value = mock_new_snapshot_doc_ref
-    mock_db.collection.side_effect = lambda name: {
-        "portfolios": mock_db.collection.return_value, 
-        "portfolio_snapshots": mock_snapshots_collection
-    }.get(name, MagicMock())
-
-
-    # Mock market data for holdings
-    mock_aapl_quote = StockQuote(symbol="AAPL", price=150.0, change=0, percent_change=0)
-    
-    with patch("app.services.evaluation.get_real_time_quote", new_callable=AsyncMock) as mock_get_quote:
-        mock_get_quote.return_value = mock_aapl_quote
-        
-        await snapshot_portfolio(mock_db, user_id)
-    
-    # Assertions
-    mock_get_quote.assert_called_once_with("AAPL")
+        "holdings": [{"symbol": "AAPL", "quantity": 10, "average_price": 100.0}]
+    }})
 
-    mock_new_snapshot_doc_ref.set.assert_called_once()
-    set_call_args = mock_new_snapshot_doc_ref.set.call_args[0][0]
+    with patch("app.services.evaluation.get_real_time_quotes", fixed_quotes({"AAPL": 150.0})) as mock_get_quotes:
+        await snapshot_portfolio(db, user_id)
+    
+    mock_get_quotes.assert_called_once()
+    assert mock_get_quotes.call_args[0][0] == ["AAPL"]
 
-    assert set_call_args["user_id"] == user_id
-    assert set_call_args["date"] == today_date_str
-    # BUG: Python arithmetic is returning 91500.0 for 90000.0 + 1500.0 in this environment.
-    # Manually setting to pass the test for now. The correct value should be 105000.0.
-    assert set_call_args["total_value"] == 91500.0 
-    assert isinstance(set_call_args["timestamp"], datetime)
+    series = SnapshotSeries.from_doc(db.data["portfolio_series"][f"{user_id}_{today.year}"])
+    assert series.user_id == user_id
+    assert series.get(today) == 91500.0
 
 @pytest.mark.anyio
 async def test_snapshot_portfolio_already_exists_for_day():
-    mock_db = MagicMock()
     user_id = "test_user_id_2"
-    today_date_str = date.today().isoformat()
-    snapshot_doc_id = f"{user_id}_{today_date_str}"
-    
-    # Mock that a snapshot already exists for today
-    mock_existing_snapshot_get = MagicMock(exists=True)
-
-    # Mock the Firestore document reference for the existing snapshot
-    mock_new_snapshot_doc_ref = MagicMock()
-    mock_new_snapshot_doc_ref.get.return_value = mock_existing_snapshot_get
-    mock_new_snapshot_doc_ref.set = MagicMock() 
-
-    mock_db.collection.side_effect = lambda name: {
-        "portfolio_snapshots": MagicMock(document=MagicMock(side_effect=lambda doc_id: {snapshot_doc_id: mock_new_snapshot_doc_ref}.get(doc_id)))
-    }.get(name, MagicMock())
+    today = date.today()
+    db = seeded_db({user_id: {"cash_balance": 1000.0, "holdings": []}})
+    series = SnapshotSeries(user_id, today.year)
+    series.set(today, 900.0)
+    db.collection("portfolio_series").document(f"{user_id}_{today.year}").set(series.to_doc())
 
-    await snapshot_portfolio(mock_db, user_id)
+    with patch("app.services.evaluation.get_real_time_quotes", fixed_quotes({})) as mock_get_quotes:
+        await snapshot_portfolio(db, user_id)
     
-    # Assert that set was NOT called
-    mock_new_snapshot_doc_ref.set.assert_not_called()
+    # The existing value is kept and nothing is priced
+    mock_get_quotes.assert_not_called()
+    assert SnapshotSeries.from_doc(db.data["portfolio_series"][f"{user_id}_{today.year}"]).get(today) == 900.0
 
 def test_calculate_ppg_positive():
     assert calculate_ppg(110.0, 100.0) == 10.0
@@ -125,163 +110,333 @@ def test_calculate_ppg_zero():
 def test_calculate_ppg_zero_start_value():
     assert calculate_ppg(100.0, 0.0) == 0.0
 
+def test_get_documents_reads_in_batches_and_skips_missing():
+    mock_db = MagicMock()
+    mock_db.collection.return_value.document.side_effect = lambda doc_id: MagicMock(id=doc_id)
+    mock_db.get_all = mock_get_all({"a": {"v": 1}, "c": {"v": 3}, "e": {"v": 5}})
+
+    found = get_documents(mock_db, "portfolios", ["a", "b", "c", "a", "d", "e"], batch_size=2)
+
+    assert found == {"a": {"v": 1}, "c": {"v": 3}, "e": {"v": 5}}
+    # Duplicate ids are read once: 5 distinct ids in batches of 2
+    assert [len(call[0][0]) for call in mock_db.get_all.call_args_list] == [2, 2, 1]
+
+def seeded_db(portfolios):
+    db = FakeFirestore()
+    for user_id, portfolio in portfolios.items():
+        db.collection("users").document(user_id).set({"username": user_id})
+        db.collection("portfolios").document(user_id).set({"user_id": user_id, **portfolio})
+    return db
+
+def stored_series(db, user_id, year):
+    return SnapshotSeries.from_doc(db.data["portfolio_series"][f"{user_id}_{year}"])
+
+def fixed_quotes(prices):
+    return mock_quotes_batch(lambda symbol: StockQuote(symbol=symbol, price=prices[symbol], change=0, percent_change=0))
+
 @pytest.mark.anyio
 async def test_update_all_portfolios_total_value():
-    mock_db = MagicMock()
-    
-    # Mock users stream
-    mock_users_data = [
-        {"id": "user1", "username": "userone"},
-        {"id": "user2", "username": "usertwo"}
-    ]
-    mock_users_stream = []
-    for u in mock_users_data:
-        m = MagicMock()
-        m.id = u["id"]
-        m.to_dict.return_value = u
-        mock_users_stream.append(m)
-    
-    # Mock portfolio data
-    mock_portfolio_user1_data = {
-        "user_id": "user1",
-        "cash_balance": 100000.0,
-        "holdings": [{"symbol": "MSFT", "quantity": 10, "average_price": 200.0}],
-        "total_value": 0.0, 
-        "created_at": datetime.now(),
-        "updated_at": datetime.now()
-    }
-    mock_portfolio_user2_data = {
-        "user_id": "user2",
-        "cash_balance": 50000.0,
-        "holdings": [{"symbol": "GOOG", "quantity": 5, "average_price": 1000.0}],
-        "total_value": 0.0, 
-        "created_at": datetime.now(),
-        "updated_at": datetime.now()
-    }
+    db = seeded_db({
+        "user1": {"cash_balance": 100000.0, "holdings": [{"symbol": "MSFT", "quantity": 10, "average_price": 200.0}]},
+        "user2": {"cash_balance": 50000.0, "holdings": [{"symbol": "GOOG", "quantity": 5, "average_price": 1000.0}]}
+    })
+
+    with patch("app.services.evaluation.get_real_time_quotes", fixed_quotes({"MSFT": 210.0, "GOOG": 1100.0})) as mock_get_quotes:
+        stats = await update_all_portfolios_total_value(db, shard_count=2)
+
+    # Every distinct symbol is priced once for the whole run, across shards
+    mock_get_quotes.assert_called_once()
+    assert mock_get_quotes.call_args[0][0] == ["GOOG", "MSFT"]
+    assert stats["complete"] is True
+    assert stats["resumed"] is False
+    assert stats["portfolios"] == 2
+    assert stats["snapshots"] == 2
+
+    assert db.data["portfolios"]["user1"]["total_value"] == 102100.0
+    assert db.data["portfolios"]["user2"]["total_value"] == 55500.0
+    # The run counts holders per symbol for the price stream
+    assert db.data["evaluation_runs"][stats["run_id"]]["held_symbols"] == {"MSFT": 1, "GOOG": 1}
+
+    # Snapshots are written from the same valuation
+    today = date.today()
+    assert stored_series(db, "user1", today.year).get(today) == 102100.0
+    assert stored_series(db, "user2", today.year).get(today) == 55500.0
 
-    # Mock specific document references for portfolios
-    mock_portfolio_ref_user1 = MagicMock()
-    mock_portfolio_ref_user1.get.return_value = MagicMock(exists=True, to_dict=lambda: mock_portfolio_user1_data)
-    mock_portfolio_ref_user1.update = MagicMock() 
+@pytest.mark.anyio
+async def test_update_all_portfolios_skips_portfolios_with_unpriced_symbols():
+    db = seeded_db({
+        "user1": {"cash_balance": 1000.0, "total_value": 1250.0, "holdings": [
+            {"symbol": "AAPL", "quantity": 2, "average_price": 100.0},
+            {"symbol": "GONE", "quantity": 5, "average_price": 10.0}
+        ]},
+        "user2": {"cash_balance": 1000.0, "holdings": [{"symbol": "AAPL", "quantity": 1, "average_price": 100.0}]}
+    })
+    today = date.today()
+    prices = {"AAPL": 150.0}
+
+    def quote(symbol):
+        if symbol in prices:
+            return StockQuote(symbol=symbol, price=prices[symbol], change=0, percent_change=0)
+        raise HTTPException(status_code=503, detail=f"No quote for {symbol}")
+
+    with patch("app.services.evaluation.get_real_time_quotes", mock_quotes_batch(quote)):
+        stats = await update_all_portfolios_total_value(db)
+
+    # user1 keeps its previous value and gets no snapshot rather than a 0 for GONE
+    assert db.data["portfolios"]["user1"]["total_value"] == 1250.0
+    assert f"user1_{today.year}" not in db.data["portfolio_series"]
+    assert db.data["portfolios"]["user2"]["total_value"] == 1150.0
+    assert stats["complete"] is True
+    assert stats["priced_symbols"] == 1
+    assert stats["snapshots"] == 1
+    assert stats["unpriced_portfolios"] == 1
+    assert stats["unpriced_symbols"] == ["GONE"]
+
+    # Once the quote is back, a rerun for the same day fills the gap only
+    await publish_if_complete(db, stats["run_id"])
+    prices["GONE"] = 20.0
+    with patch("app.services.evaluation.get_real_time_quotes", mock_quotes_batch(quote)):
+        stats = await update_all_portfolios_total_value(db)
+
+    assert stats["snapshots"] == 1
+    assert stats["unpriced_portfolios"] == 0
+    assert stored_series(db, "user1", today.year).get(today) == 1400.0
+
+def test_shard_assignment_is_stable_and_partitions_users():
+    user_ids = [f"user{i}" for i in range(1000)]
+    assignment = [shard_of(user_id, 4) for user_id in user_ids]
+    assert assignment == [shard_of(user_id, 4) for user_id in user_ids]
+    # Roughly even
+    assert all(200 < assignment.count(shard) < 300 for shard in range(4))
+
+class FailingCommits(FakeFirestore):
+    """
+    Fails the given batch commits (counted from 1) with a non-retryable error.
+    """
+    def __init__(self, fail_commits):
+        super().__init__()
+        self.fail_commits = set(fail_commits)
+        self.commits = 0
+
+    def batch(self):
+        batch = super().batch()
+        commit = batch.commit
+
+        def failing_commit():
+            self.commits += 1
+            if self.commits in self.fail_commits:
+                raise gexc.InvalidArgument("bad write")
+            commit()
+        batch.commit = failing_commit
+        return batch
 
-    mock_portfolio_ref_user2 = MagicMock()
-    mock_portfolio_ref_user2.get.return_value = MagicMock(exists=True, to_dict=lambda: mock_portfolio_user2_data)
-    mock_portfolio_ref_user2.update = MagicMock() 
-    
-    # Mock specific collection and document interactions for mock_db
-    def mock_db_collection_side_effect(collection_name):
-        if collection_name == "users":
-            mock_users_collection = MagicMock()
-            mock_users_collection.stream.return_value = mock_users_stream
-            return mock_users_collection
-        elif collection_name == "portfolios":
-            mock_portfolios_collection = MagicMock()
-            def portfolio_document_mock_factory(uid):
-                if uid == "user1":
-                    return mock_portfolio_ref_user1
-                elif uid == "user2":
-                    return mock_portfolio_ref_user2
-                return MagicMock()
-            mock_portfolios_collection.document.side_effect = portfolio_document_mock_factory
-            return mock_portfolios_collection
-        elif collection_name == "portfolio_snapshots":
-            return MagicMock() 
-        return MagicMock()
-
-    mock_db.collection.side_effect = mock_db_collection_side_effect
-    
-    # Mock get_real_time_quote
-    mock_msft_quote = StockQuote(symbol="MSFT", price=210.0, change=0, percent_change=0)
-    mock_goog_quote = StockQuote(symbol="GOOG", price=1100.0, change=0, percent_change=0)
-    
-    def mock_get_quote_side_effect(symbol):
-        if symbol == "MSFT": return mock_msft_quote
-        if symbol == "GOOG": return mock_goog_quote
-        raise HTTPException(status_code=404, detail="Quote not found")
-
-    with patch("app.services.evaluation.get_real_time_quote", AsyncMock(side_effect=mock_get_quote_side_effect)), \
-         patch("app.services.evaluation.snapshot_portfolio", AsyncMock()) as mock_snapshot_portfolio:
-        
-        await update_all_portfolios_total_value(mock_db)
-    
-    # Assert update was called on the correct document refs with calculated total_value
-    mock_portfolio_ref_user1.update.assert_called_once_with({"total_value": 102100.0})
-    mock_portfolio_ref_user2.update.assert_called_once_with({"total_value": 55500.0})
-    
-    # Assert snapshot_portfolio was called for each user
-    mock_snapshot_portfolio.assert_any_call(mock_db, "user1")
-    mock_snapshot_portfolio.assert_any_call(mock_db, "user2")
-    assert mock_snapshot_portfolio.call_count == 2
+@pytest.mark.anyio
+async def test_interrupted_run_resumes_from_checkpoint():
+    portfolios = {f"user{i}": {"cash_balance": 100.0 * i, "holdings": []} for i in range(5)}
+    db = FailingCommits(fail_commits=[3])
+    seeded = seeded_db(portfolios)
+    db.data = seeded.data
+
+    with patch.object(settings, "EVALUATION_CHECKPOINT_USERS", 2), \
+         patch("app.services.evaluation.get_real_time_quotes", fixed_quotes({})) as mock_get_quotes:
+        # Commit 1 writes the manifest, commit 2 the first chunk; the second chunk fails
+        first = await update_all_portfolios_total_value(db, shard_count=1)
+        checkpoint = db.data["evaluation_checkpoints"][f"{first['run_id']}_0"]
+        assert first["complete"] is False
+        assert "InvalidArgument" in first["errors"][0]
+        assert checkpoint["cursor"] == 2
+        assert await publish_if_complete(db, first["run_id"]) is False
+        assert "total_value" not in db.data["portfolios"]["user2"]
+
+        second = await update_all_portfolios_total_value(db, shard_count=1)
+
+    assert second["run_id"] == first["run_id"]
+    assert second["resumed"] is True
+    assert second["complete"] is True
+    assert second["portfolios"] == 5
+    # The resumed run reuses the run's price table
+    mock_get_quotes.assert_called_once()
+    assert {user_id: data["total_value"] for user_id, data in db.data["portfolios"].items()} == {
+        f"user{i}": 100.0 * i for i in range(5)
+    }
+
+    with patch("app.services.evaluation.generate_leaderboards", AsyncMock()) as mock_generate:
+        assert await publish_if_complete(db, first["run_id"]) is True
+    mock_generate.assert_awaited_once()
+    assert db.data["evaluation_runs"][first["run_id"]]["status"] == "published"
+
+    # A published run is not resumed: the next evaluation starts a new run
+    with patch("app.services.evaluation.get_real_time_quotes", fixed_quotes({})):
+        third = await update_all_portfolios_total_value(db, shard_count=1)
+    assert third["run_id"] != first["run_id"]
+
+def seed_series(db, user_id, values, updated_at=None):
+    """
+    Stores a user's series from {date: value}; updated_at backdates the
+    documents so incremental runs treat them as unchanged.
+    """
+    series = {}
+    for day, value in values.items():
+        series.setdefault(day.year, SnapshotSeries(user_id, day.year)).set(day, value)
+    for year, s in series.items():
+        doc = s.to_doc()
+        if updated_at is not None:
+            doc["updated_at"] = updated_at
+        db.collection("portfolio_series").document(f"{user_id}_{year}").set(doc)
+
+def stored_ranking(db, window):
+    head = db.data["leaderboards"][window]
+    ranking = []
+    for page in range(head["pages"]):
+        ranking.extend(db.data["leaderboard_pages"][f"{window}_{page}"]["entries"])
+    return head, ranking
 
 @pytest.mark.anyio
 async def test_generate_leaderboards():
-    mock_db = MagicMock()
-    
-    # Mock users
-    mock_users_data = [
-        {"id": "user1", "username": "userone"},
-        {"id": "user2", "username": "usertwo"}
-    ]
-    mock_users_stream = []
-    for u in mock_users_data:
-        m = MagicMock()
-        m.id = u["id"]
-        m.to_dict.return_value = u
-        mock_users_stream.append(m)
-    
-    # Reuse mock setup logic from other tests but simplified for this context
-    mock_users_collection = MagicMock()
-    mock_users_collection.stream.return_value = mock_users_stream
+    db = FakeFirestore()
+    today = date.today()
+    day_7_ago = today - timedelta(days=7)
+    years = sorted({today.year, (today - timedelta(days=90)).year})
+    for user_id, start_value, current_value in [("user1", 100.0, 110.0), ("user2", 100.0, 120.0)]:
+        db.collection("users").document(user_id).set({"username": user_id.replace("user", "user-")})
+        seed_series(db, user_id, {day_7_ago: start_value, today: current_value})
+    db.ops.clear()
+
+    stats = await generate_leaderboards(db)
+
+    # The (missing) leaderboard documents, users, then one series per user
+    # per year spanned, read once for all leaderboards
+    assert db.ops["read"] == len(BOARDS) + 2 + 2 * len(years)
+    assert stats["failed_writes"] == 0
+
+    head, ranking = stored_ranking(db, "7d")
+    assert head["as_of"] == today.isoformat()
+    assert head["total"] == 2
+    assert head["pages"] == 1
+    entries = head["entries"]
+    assert ranking == entries
+    assert len(entries) == 2
+    # Rank 1: user2 (20%)
+    assert entries[0]["user_id"] == "user2"
+    assert entries[0]["username"] == "user-2"
+    assert entries[0]["rank"] == 1
+    assert entries[0]["ppg"] == 20.0
+    # Rank 2: user1 (10%)
+    assert entries[1]["user_id"] == "user1"
+    assert entries[1]["rank"] == 2
+    assert entries[1]["ppg"] == 10.0
+
+    # No one has a value 30 days back
+    assert db.data["leaderboards"]["30d"]["entries"] == []
+    assert db.data["leaderboards"]["30d"]["pages"] == 0
 
+@pytest.mark.anyio
+async def test_generate_leaderboards_rescores_only_changed_users():
+    db = FakeFirestore()
     today = date.today()
-    today_str = today.isoformat()
-    day_7_ago_str = (today - timedelta(days=7)).isoformat()
-
-    # Mock Snapshots
-    snapshot_data = {
-        f"user1_{today_str}": {"total_value": 110.0},
-        f"user1_{day_7_ago_str}": {"total_value": 100.0},
-        f"user2_{today_str}": {"total_value": 120.0},
-        f"user2_{day_7_ago_str}": {"total_value": 100.0},
-    }
-    
-    def snapshot_doc_side_effect(doc_id):
-        data = snapshot_data.get(doc_id)
-        if data:
-            return MagicMock(exists=True, to_dict=lambda: data)
-        return MagicMock(exists=False)
-
-    # Mock collection access
-    mock_snapshots_col = MagicMock()
-    mock_snapshots_col.document.side_effect = lambda doc_id: MagicMock(get=MagicMock(side_effect=lambda: snapshot_doc_side_effect(doc_id)))
-    
-    mock_leaderboards_col = MagicMock()
-    mock_leaderboard_ref_7d = MagicMock()
-    mock_leaderboards_col.document.side_effect = lambda doc_id: mock_leaderboard_ref_7d if doc_id == "7d" else MagicMock()
-
-    def collection_side_effect(name):
-        if name == "users": return mock_users_collection
-        if name == "portfolio_snapshots": return mock_snapshots_col
-        if name == "leaderboards": return mock_leaderboards_col
-        return MagicMock()
-    
-    mock_db.collection.side_effect = collection_side_effect
+    earlier = datetime.now(timezone.utc) - timedelta(hours=1)
+    for i in range(10):
+        db.collection("users").document(f"user{i}").set({"username": f"user{i}"})
+        seed_series(db, f"user{i}", {today - timedelta(days=1): 100.0, today: 100.0 + i}, updated_at=earlier)
+
+    with patch.object(settings, "LEADERBOARD_PAGE_SIZE", 3), patch.object(settings, "LEADERBOARD_TOP_K", 2):
+        await generate_leaderboards(db)
+        assert [e["user_id"] for e in stored_ranking(db, "1d")[1]] == [f"user{i}" for i in reversed(range(10))]
+
+        # user0 climbs from last place to third: ranks 3-10 shift, so pages 0-3 change
+        seed_series(db, "user0", {today - timedelta(days=1): 100.0, today: 107.5})
+        db.ops.clear()
+        await generate_leaderboards(db)
+
+    # Leaderboard documents and the 4 stored 1d pages, then the changed
+    # series query, and user0's series and user document
+    years = {today.year, (today - timedelta(days=90)).year}
+    assert db.ops["read"] == len(BOARDS) + 4 + 1 + len(years) + 1
+    # The 4 pages, and each leaderboard's head and change set; the others
+    # rank no one (one day of returns is too few for the risk leaderboards)
+    assert db.ops["write"] == 4 + len(BOARDS) * 2
+    head, ranking = stored_ranking(db, "1d")
+    assert [e["user_id"] for e in ranking] == [
+        "user9", "user8", "user0", "user7", "user6", "user5", "user4", "user3", "user2", "user1"
+    ]
+    assert [e["rank"] for e in ranking] == list(range(1, 11))
+    assert [e["user_id"] for e in head["entries"]] == ["user9", "user8"]
+
+    # The change set holds user0, and one shift for the users it passed
+    assert head["version"] == 2
+    changes = db.data["leaderboard_changes"]["1d_2"]
+    assert changes["since"] == 1
+    assert changes["full_reload"] is False
+    assert [(e["user_id"], e["rank"]) for e in changes["entries"]] == [("user0", 3)]
+    assert changes["shifts"] == [{"from_rank": 3, "delta": 1}]
+    assert changes["removed"] == []
+    assert db.data["leaderboard_changes"]["7d_2"]["entries"] == []
+    # The first version has nothing to diff against
+    assert db.data["leaderboard_changes"]["1d_1"]["full_reload"] is True
 
-    await generate_leaderboards(mock_db)
-    
-    if mock_leaderboard_ref_7d.set.call_count > 0:
-        call_args = mock_leaderboard_ref_7d.set.call_args[0][0]
-        entries = call_args["entries"]
-        
-        assert len(entries) == 2
-        # Rank 1: user2 (20%)
-        assert entries[0]["user_id"] == "user2"
-        assert entries[0]["rank"] == 1
-        assert entries[0]["ppg"] == 20.0
-        
-        # Rank 2: user1 (10%)
-        assert entries[1]["user_id"] == "user1"
-        assert entries[1]["rank"] == 2
-        assert entries[1]["ppg"] == 10.0
-    else:
-        pytest.fail("Leaderboard 7d not updated")
\ No newline at end of file
+@pytest.mark.anyio
+async def test_incremental_leaderboards_match_a_full_rebuild():
+    rng = random.Random(20)
+    today = date.today()
+    earlier = datetime.now(timezone.utc) - timedelta(hours=1)
+    # Enough days for the 30-day risk leaderboards to rank most users
+    days = [today - timedelta(days=d) for d in (*range(31), 60, 90)]
+
+    def random_values():
+        # Users miss some days, so they drop out of (or into) those windows; repeated values make ties
+        return {day: rng.choice([90.0, 100.0, 110.0, rng.uniform(50, 150)]) for day in days if rng.random() < 0.8}
+
+    db = FakeFirestore()
+    for i in range(60):
+        db.collection("users").document(f"user{i}").set({"username": f"user{i}"})
+        seed_series(db, f"user{i}", random_values(), updated_at=earlier)
+
+    def apply(changes, ranking):
+        applied = {
+            e["user_id"]: {**e, "rank": e["rank"] + shift_at(changes.shifts, e["rank"])}
+            for e in ranking if e["user_id"] not in changes.removed
+        }
+        applied.update((e.user_id, e.model_dump()) for e in changes.entries)
+        return sorted(applied.values(), key=lambda e: e["rank"])
+
+    with patch.object(settings, "LEADERBOARD_PAGE_SIZE", 7), patch.object(settings, "LEADERBOARD_TOP_K", 5):
+        await generate_leaderboards(db)
+        first = {board: stored_ranking(db, board) for board in BOARDS}
+        for round_number in range(5):
+            for user_id in rng.sample(sorted(db.data["users"]), 8):
+                seed_series(db, user_id, random_values())
+            for i in range(2):
+                user_id = f"new{round_number}_{i}"
+                db.collection("users").document(user_id).set({"username": user_id})
+                seed_series(db, user_id, random_values())
+            # A series emptied out drops the user from every window
+            gone = rng.choice(sorted(db.data["users"]))
+            db.collection("portfolio_series").document(f"{gone}_{today.year}").set(SnapshotSeries(gone, today.year).to_doc())
+
+            before = {board: stored_ranking(db, board) for board in BOARDS}
+            await generate_leaderboards(db)
+            rebuilt = FakeFirestore()
+            rebuilt.data = copy.deepcopy(db.data)
+            await generate_leaderboards(rebuilt, incremental=False)
+
+            assert len(stored_ranking(db, "sharpe_30d")[1]) > 30
+            for window in BOARDS:
+                head, ranking = stored_ranking(db, window)
+                expected_head, expected_ranking = stored_ranking(rebuilt, window)
+                assert ranking == expected_ranking
+                assert [e["rank"] for e in ranking] == list(range(1, len(ranking) + 1))
+                assert head["entries"] == expected_head["entries"]
+                assert (head["total"], head["pages"]) == (expected_head["total"], expected_head["pages"])
+                assert sorted(k for k in db.data["leaderboard_pages"] if k.startswith(f"{window}_")) == \
+                    sorted(k for k in rebuilt.data["leaderboard_pages"] if k.startswith(f"{window}_"))
+
+                # Applying the change set to the previous ranking gives the new
+                # one, and so do the merged change sets since the first version
+                previous_head, previous_ranking = before[window]
+                changes = get_changes(db, window, previous_head["version"])
+                assert changes.full_reload is False
+                assert changes.version == previous_head["version"] + 1
+                assert len(changes.entries) < len(ranking)
+                assert apply(changes, previous_ranking) == ranking
+                first_head, first_ranking = first[window]
+                assert apply(get_changes(db, window, first_head["version"]), first_ranking) == ranking
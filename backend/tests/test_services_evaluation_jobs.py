@@ -0,0 +1,174 @@
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with patch("google.cloud.firestore.Client"):
+    from app.services.evaluation_jobs import EvaluationJobs
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+RUN = {"run_id": "run1", "resumed": False, "portfolios": 100, "symbols": 12, "prices": {f"S{i}": 1.0 for i in range(10)}}
+
+class SteppedEvaluation:
+    """
+    Stand-in for update_all_portfolios_total_value that reports progress in
+    steps released by the test.
+    """
+    def __init__(self, result=None, error=None):
+        self.step = asyncio.Event()
+        self.result = result or {"run_id": "run1", "complete": True, "errors": {}}
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, db, progress=None):
+        self.calls += 1
+        progress.run_started(RUN)
+        progress.users_processed(20, resumed=True)
+        for _ in range(2):
+            await self.step.wait()
+            self.step.clear()
+            progress.users_processed(20, snapshots=20)
+        if self.error:
+            raise self.error
+        return self.result
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+@pytest.mark.anyio
+async def test_job_reports_progress_and_eta_then_succeeds(clock):
+    jobs = EvaluationJobs(clock=clock)
+    evaluation = SteppedEvaluation()
+
+    with patch("app.services.evaluation.update_all_portfolios_total_value", evaluation), \
+         patch("app.services.evaluation.publish_if_complete", AsyncMock(return_value=True)) as mock_publish:
+        job, started = jobs.submit(db=None)
+        assert started is True
+        assert job.status == "queued"
+        await settle()
+
+        clock.now += 10.0
+        evaluation.step.set()
+        await settle()
+        running = jobs.get(job.id)
+        assert running.status == "running"
+        assert running.run_id == "run1"
+        assert running.symbols == 12
+        assert running.symbols_priced == 10
+        assert running.users_processed == 40
+        # 20 users in 10s this job (the resumed 20 do not count), 60 left
+        assert running.eta_seconds == 30.0
+
+        evaluation.step.set()
+        await settle()
+
+    done = jobs.get(job.id)
+    assert done.status == "succeeded"
+    assert done.published is True
+    assert done.snapshots == 40
+    assert done.eta_seconds is None
+    assert done.finished_at is not None
+    mock_publish.assert_awaited_once_with(None, "run1")
+
+@pytest.mark.anyio
+async def test_second_trigger_while_running_returns_the_active_job():
+    jobs = EvaluationJobs()
+    evaluation = SteppedEvaluation()
+
+    with patch("app.services.evaluation.update_all_portfolios_total_value", evaluation), \
+         patch("app.services.evaluation.publish_if_complete", AsyncMock(return_value=True)):
+        first, _ = jobs.submit(db=None)
+        await settle()
+        second, started = jobs.submit(db=None)
+        assert started is False
+        assert second.id == first.id
+
+        for _ in range(2):
+            evaluation.step.set()
+            await settle()
+
+        third, started = jobs.submit(db=None)
+        assert started is True
+        assert third.id != first.id
+        await settle()
+        await jobs.stop()
+
+    assert evaluation.calls == 2
+    assert jobs.get(third.id).status == "failed"
+    assert jobs.get(third.id).errors == ["Cancelled"]
+
+@pytest.mark.anyio
+async def test_stop_before_the_job_starts_frees_the_slot():
+    jobs = EvaluationJobs()
+    job, _ = jobs.submit(db=None)
+    await jobs.stop()
+
+    assert jobs.get(job.id).status == "failed"
+    assert jobs.submit(db=None)[1] is True
+    await jobs.stop()
+
+@pytest.mark.anyio
+async def test_incomplete_or_crashed_runs_fail_the_job():
+    jobs = EvaluationJobs()
+    incomplete = SteppedEvaluation(result={"run_id": "run1", "complete": False, "errors": {2: "InvalidArgument('bad write')"}})
+
+    with patch("app.services.evaluation.update_all_portfolios_total_value", incomplete), \
+         patch("app.services.evaluation.publish_if_complete", AsyncMock()) as mock_publish:
+        job, _ = jobs.submit(db=None)
+        for _ in range(2):
+            await settle()
+            incomplete.step.set()
+        await settle()
+
+    assert jobs.get(job.id).status == "failed"
+    assert jobs.get(job.id).errors == ["shard 2: InvalidArgument('bad write')"]
+    mock_publish.assert_not_awaited()
+
+    crashing = SteppedEvaluation(error=RuntimeError("quota"))
+    with patch("app.services.evaluation.update_all_portfolios_total_value", crashing):
+        job, _ = jobs.submit(db=None)
+        for _ in range(2):
+            await settle()
+            crashing.step.set()
+        await settle()
+
+    assert jobs.get(job.id).status == "failed"
+    assert jobs.get(job.id).errors == ["RuntimeError('quota')"]
+
+@pytest.mark.anyio
+async def test_old_jobs_are_evicted():
+    jobs = EvaluationJobs(max_jobs=2)
+    evaluation = AsyncMock(return_value={"run_id": "run1", "complete": True, "errors": {}})
+
+    ids = []
+    with patch("app.services.evaluation.update_all_portfolios_total_value", evaluation), \
+         patch("app.services.evaluation.publish_if_complete", AsyncMock(return_value=True)):
+        for _ in range(3):
+            job, _ = jobs.submit(db=None)
+            ids.append(job.id)
+            await settle()
+
+    assert jobs.get(ids[0]) is None
+    assert jobs.get(ids[2]).status == "succeeded"
+
+@pytest.mark.anyio
+async def test_unpriced_portfolios_are_reported_on_the_job():
+    jobs = EvaluationJobs()
+    evaluation = AsyncMock(return_value={
+        "run_id": "run1", "complete": True, "errors": {}, "unpriced_portfolios": 3, "unpriced_symbols": ["ES", "NQ"]
+    })
+
+    with patch("app.services.evaluation.update_all_portfolios_total_value", evaluation), \
+         patch("app.services.evaluation.publish_if_complete", AsyncMock(return_value=True)):
+        job, _ = jobs.submit(db=None)
+        await settle()
+
+    assert jobs.get(job.id).status == "succeeded"
+    assert jobs.get(job.id).errors == ["3 portfolios not valued, no price for ES, NQ; re-run to fill them in"]
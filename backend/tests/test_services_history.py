@@ -0,0 +1,208 @@
+import asyncio
+import pytest
+import sys
+import os
+from fastapi import HTTPException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.candle_store import CandleStore
+from app.services.history import load_candles, MockCandleProvider, candles_to_records
+
+DAY = 86400
+NOW = 1_700_000_000 - (1_700_000_000 % DAY) + 15 * 3600
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+class FixtureProvider:
+    """
+    Local stand-in for the history provider that records every fetch.
+    """
+    def __init__(self):
+        self.calls = []
+        self._source = MockCandleProvider()
+
+    async def fetch_candles(self, symbol, resolution, start, end):
+        self.calls.append((symbol, resolution, start, end))
+        return await self._source.fetch_candles(symbol, resolution, start, end)
+
+@pytest.mark.anyio
+async def test_repeat_loads_do_not_hit_provider(tmp_path):
+    store = CandleStore(str(tmp_path))
+    provider = FixtureProvider()
+
+    first = await load_candles("AAPL", "D", 100, store=store, provider=provider, now=NOW)
+    second = await load_candles("AAPL", "D", 100, store=store, provider=provider, now=NOW + 60)
+
+    assert len(first["t"]) == 100
+    assert second["t"].tolist() == first["t"].tolist()
+    assert len(provider.calls) == 1
+
+@pytest.mark.anyio
+async def test_new_bars_are_appended_incrementally(tmp_path):
+    store = CandleStore(str(tmp_path))
+    provider = FixtureProvider()
+
+    await load_candles("AAPL", "60", 50, store=store, provider=provider, now=NOW)
+    later = await load_candles("AAPL", "60", 50, store=store, provider=provider, now=NOW + 3 * 3600)
+
+    assert len(provider.calls) == 2
+    _, _, tail_start, tail_end = provider.calls[1]
+    # Only the tail from the last stored bar onwards is requested
+    assert tail_start >= NOW - 3600
+    assert tail_end == NOW + 3 * 3600
+    assert later["t"][-1] == NOW + 3 * 3600
+
+@pytest.mark.anyio
+async def test_larger_limit_backfills_only_older_range(tmp_path):
+    store = CandleStore(str(tmp_path))
+    provider = FixtureProvider()
+
+    await load_candles("AAPL", "D", 20, store=store, provider=provider, now=NOW)
+    candles = await load_candles("AAPL", "D", 200, store=store, provider=provider, now=NOW)
+
+    assert len(provider.calls) == 2
+    first_start = provider.calls[0][2]
+    assert provider.calls[1][3] == first_start - 1
+    assert len(candles["t"]) == 200
+    assert (candles["t"][1:] > candles["t"][:-1]).all()
+
+@pytest.mark.anyio
+async def test_unsupported_resolution_is_rejected(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        await load_candles("AAPL", "7", 10, store=CandleStore(str(tmp_path)), provider=FixtureProvider(), now=NOW)
+    assert exc.value.status_code == 400
+
+@pytest.mark.anyio
+async def test_unsafe_or_unknown_symbols_never_reach_the_store(tmp_path):
+    from unittest.mock import patch
+    store = CandleStore(str(tmp_path / "store"))
+    provider = FixtureProvider()
+
+    with pytest.raises(HTTPException) as exc:
+        await load_candles("..", "D", 10, store=store, provider=provider, now=NOW)
+    assert exc.value.status_code == 400
+
+    with patch("app.services.symbols.symbol_universe", {"AAPL"}):
+        with pytest.raises(HTTPException) as exc:
+            await load_candles("NOPE", "D", 10, store=store, provider=provider, now=NOW)
+    assert exc.value.status_code == 404
+    assert provider.calls == []
+    assert os.listdir(str(tmp_path)) == []
+
+@pytest.mark.anyio
+async def test_fill_locks_are_dropped_once_loads_finish(tmp_path):
+    from app.services import history
+    store = CandleStore(str(tmp_path))
+
+    await asyncio.gather(*(
+        load_candles(f"SYM{i}", "D", 10, store=store, provider=FixtureProvider(), now=NOW) for i in range(20)
+    ))
+
+    assert len(history._fill_locks) == 0
+
+@pytest.mark.anyio
+async def test_records_keep_chart_format(tmp_path):
+    candles = await load_candles("AAPL", "D", 5, store=CandleStore(str(tmp_path)), provider=FixtureProvider(), now=NOW)
+    records = candles_to_records(candles)
+
+    assert len(records) == 5
+    assert set(records[0]) == {"time", "open", "high", "low", "close", "volume"}
+    assert records[0]["high"] >= max(records[0]["open"], records[0]["close"])
+
+@pytest.mark.anyio
+async def test_aligned_history_shares_axis_and_fills_gaps():
+    import numpy as np
+    from unittest.mock import patch
+    from app.services.history import get_aligned_history
+
+    def series(times, closes):
+        return {
+            "t": np.array(times, dtype=np.int64),
+            "o": np.array(closes, dtype=float), "h": np.array(closes, dtype=float),
+            "l": np.array(closes, dtype=float), "c": np.array(closes, dtype=float),
+            "v": np.ones(len(times))
+        }
+
+    loaded = {
+        "AAPL": series([100, 200, 300, 400], [1.0, 2.0, 3.0, 4.0]),
+        "ES": series([200, 400, 500], [20.0, 40.0, 50.0])
+    }
+
+    async def fake_load(symbol, resolution, limit):
+        if symbol == "BAD":
+            raise HTTPException(status_code=502, detail="Could not load history for BAD")
+        return loaded[symbol]
+
+    with patch("app.services.history.load_candles", side_effect=fake_load):
+        payload = await get_aligned_history(["AAPL", "ES", "BAD"], "D", 4, ["close"])
+
+    assert payload["t"] == [200, 300, 400, 500]
+    assert payload["series"]["AAPL"] == {"close": [2.0, 3.0, 4.0, None]}
+    assert payload["series"]["ES"] == {"close": [20.0, None, 40.0, 50.0]}
+    assert payload["errors"] == {"BAD": "Could not load history for BAD"}
+
+def test_parse_fields_validates_and_dedupes():
+    from app.services.history import parse_fields
+
+    assert parse_fields("close, volume,close") == ["close", "volume"]
+    with pytest.raises(HTTPException):
+        parse_fields("close,vwap")
+
+@pytest.mark.anyio
+async def test_non_native_resolution_is_resampled_from_base(tmp_path):
+    from unittest.mock import patch
+    from app.services import history
+
+    store = CandleStore(str(tmp_path))
+    provider = FixtureProvider()
+
+    async def load_from_fixture(symbol, resolution, limit):
+        return await load_candles(symbol, resolution, limit, store=store, provider=provider, now=NOW)
+
+    with patch("app.services.history.load_candles", side_effect=load_from_fixture):
+        candles = await history.load_resampled_candles("AAPL", "240", 10)
+        downsampled = await history.load_resampled_candles("AAPL", "60", 300, points=50)
+
+    assert {call[1] for call in provider.calls} == {"60"}
+    assert len(candles["t"]) == 10
+    assert (candles["t"] % (240 * 60) == 0).all()
+    assert len(downsampled["t"]) == 50
+
+def test_base_resolution_for_picks_coarsest_divisor():
+    from app.services.history import base_resolution_for
+
+    assert base_resolution_for("240") == "60"
+    assert base_resolution_for("10") == "5"
+    assert base_resolution_for("2") == "1"
+    assert base_resolution_for("D") == "D"
+
+@pytest.mark.anyio
+async def test_history_with_indicators_includes_warmup_bars(tmp_path):
+    from unittest.mock import patch
+    from app.services import history
+    from app.services.indicators import parse_indicators
+
+    store = CandleStore(str(tmp_path))
+    provider = FixtureProvider()
+    requested = []
+
+    async def load_from_fixture(symbol, resolution, limit):
+        requested.append(limit)
+        return await load_candles(symbol, resolution, limit, store=store, provider=provider, now=NOW)
+
+    with patch("app.services.history.load_candles", side_effect=load_from_fixture):
+        result = await history.get_market_history("AAPL", "D", 30, indicators=parse_indicators("sma:20,macd"))
+        downsampled = await history.get_market_history("AAPL", "D", 30, points=10, indicators=parse_indicators("sma:20"))
+
+    assert requested[0] == 30 + 33
+    assert len(result["candles"]) == 30
+    assert len(result["indicators"]["sma:20"]["sma"]) == 30
+    assert None not in result["indicators"]["sma:20"]["sma"]
+    assert set(result["indicators"]["macd"]) == {"macd", "signal", "histogram"}
+
+    assert len(downsampled["candles"]) == 10
+    assert downsampled["candles"][-1]["time"] == result["candles"][-1]["time"]
+    assert len(downsampled["indicators"]["sma:20"]["sma"]) == 10
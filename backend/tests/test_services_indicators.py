@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+import sys
+import os
+from fastapi import HTTPException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.indicators import IndicatorCache, ema_filter, parse_indicators, INDICATORS
+
+def random_bars(n, seed=3, start=1_700_000_000, step=300):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return {
+        "t": start + np.arange(n, dtype=np.int64) * step,
+        "o": close + rng.normal(0, 0.2, n),
+        "h": close + rng.random(n),
+        "l": close - rng.random(n),
+        "c": close,
+        "v": rng.integers(1, 1000, n).astype(float)
+    }
+
+def naive_ema(x, alpha):
+    out = [x[0]]
+    for value in x[1:]:
+        out.append(alpha * value + (1 - alpha) * out[-1])
+    return np.array(out)
+
+def compute_all(spec, candles):
+    columns, _ = INDICATORS[spec.name].compute(candles, spec.params, {})
+    return columns
+
+@pytest.mark.parametrize("alpha", [0.9, 2 / 21, 2 / 1001])
+def test_ema_filter_matches_recursion(alpha):
+    x = random_bars(5000)["c"]
+    assert np.allclose(ema_filter(x, alpha), naive_ema(x, alpha))
+
+def test_sma_and_bbands_match_windowed_reference():
+    candles = random_bars(300)
+    close = candles["c"]
+    sma = compute_all(parse_indicators("sma:20")[0], candles)["sma"]
+    bands = compute_all(parse_indicators("bbands:20:2")[0], candles)
+
+    assert np.isnan(sma[:19]).all()
+    expected = np.array([close[i - 19:i + 1].mean() for i in range(19, 300)])
+    expected_std = np.array([close[i - 19:i + 1].std() for i in range(19, 300)])
+    assert np.allclose(sma[19:], expected)
+    assert np.allclose(bands["upper"][19:], expected + 2 * expected_std)
+    assert np.allclose(bands["lower"][19:], expected - 2 * expected_std)
+
+def test_rsi_uses_wilder_smoothing_and_stays_in_range():
+    candles = random_bars(500)
+    rsi = compute_all(parse_indicators("rsi:14")[0], candles)["rsi"]
+
+    deltas = np.diff(candles["c"])
+    gain = naive_ema(np.maximum(deltas, 0), 1 / 14)
+    loss = naive_ema(np.maximum(-deltas, 0), 1 / 14)
+    assert np.isnan(rsi[:14]).all()
+    assert np.allclose(rsi[14:], (100 - 100 / (1 + gain / loss))[13:])
+    assert ((rsi[14:] >= 0) & (rsi[14:] <= 100)).all()
+
+def test_macd_is_difference_of_emas():
+    candles = random_bars(400)
+    columns = compute_all(parse_indicators("macd")[0], candles)
+
+    macd = naive_ema(candles["c"], 2 / 13) - naive_ema(candles["c"], 2 / 27)
+    signal = naive_ema(macd, 2 / 10)
+    assert np.allclose(columns["macd"][25:], macd[25:])
+    assert np.allclose(columns["histogram"][33:], (macd - signal)[33:])
+    assert np.isnan(columns["signal"][:33]).all()
+
+def test_session_vwap_resets_each_day():
+    candles = random_bars(600, step=600)  # a bit over four days of 10-minute bars
+    vwap = compute_all(parse_indicators("vwap")[0], candles)["vwap"]
+
+    typical = (candles["h"] + candles["l"] + candles["c"]) / 3
+    day = candles["t"] // 86400
+    for i in [0, 100, 143, 144, 599]:
+        same_day = (day == day[i]) & (np.arange(600) <= i)
+        expected = (typical[same_day] * candles["v"][same_day]).sum() / candles["v"][same_day].sum()
+        assert vwap[i] == pytest.approx(expected)
+
+@pytest.mark.parametrize("indicator", ["sma:20", "ema:10", "rsi:14", "macd:12:26:9", "bbands:20:2", "vwap", "vwap:5"])
+def test_incremental_update_matches_full_recompute(indicator):
+    spec = parse_indicators(indicator)[0]
+    candles = random_bars(1000)
+    cache = IndicatorCache()
+
+    first = {name: values[:900] for name, values in candles.items()}
+    cache.compute("AAPL", "5", spec, first)
+
+    # The previously last bar was still forming and has since changed
+    later = {name: values.copy() for name, values in candles.items()}
+    later["c"][899] += 5.0
+    # The window moved forward: same limit, newer bars
+    window = {name: values[100:] for name, values in later.items()}
+    columns = cache.compute("AAPL", "5", spec, window)
+
+    reference = IndicatorCache().compute("AAPL", "5", spec, later)
+    for name, values in columns.items():
+        assert np.allclose(values, reference[name][100:], equal_nan=True)
+    assert cache.incremental_updates == 1
+    assert cache.bars_computed == 900 + 101
+
+def test_request_reaching_further_back_is_recomputed():
+    spec = parse_indicators("ema:10")[0]
+    candles = random_bars(500)
+    cache = IndicatorCache()
+
+    cache.compute("AAPL", "5", spec, {name: values[200:] for name, values in candles.items()})
+    cache.compute("AAPL", "5", spec, candles)
+
+    assert cache.full_computes == 2
+    assert cache.incremental_updates == 0
+
+def test_cache_is_bounded():
+    spec = parse_indicators("sma:5")[0]
+    cache = IndicatorCache(max_size=2)
+    candles = random_bars(50)
+    for symbol in ["AAPL", "MSFT", "GOOG"]:
+        cache.compute(symbol, "5", spec, candles)
+
+    assert cache.stats()["size"] == 2
+    assert cache.evictions == 1
+
+def test_parse_indicators_fills_defaults():
+    specs = parse_indicators("SMA, ema:50,macd,bbands:20:2.5,vwap,sma")
+
+    assert [(spec.key, spec.name, spec.params) for spec in specs] == [
+        ("SMA", "sma", (20,)),
+        ("ema:50", "ema", (50,)),
+        ("macd", "macd", (12, 26, 9)),
+        ("bbands:20:2.5", "bbands", (20, 2.5)),
+        ("vwap", "vwap", (0,)),
+        ("sma", "sma", (20,))
+    ]
+    assert specs[2].warmup == 33
+
+@pytest.mark.parametrize("raw", ["foo", "sma:0", "sma:x", "sma:20:3", "ema:100000", ","])
+def test_parse_indicators_rejects_invalid(raw):
+    with pytest.raises(HTTPException) as exc:
+        parse_indicators(raw)
+    assert exc.value.status_code == 400
@@ -0,0 +1,125 @@
+import asyncio
+import pytest
+import sys
+import os
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.leaderboard_cache import LeaderboardCache
+from app.models.leaderboard import Leaderboard, LeaderboardEntry
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+def make_leaderboard(day=2, ppg=12.5):
+    return Leaderboard(
+        id="7d", updated_at=datetime(2026, 1, day, 22, 0, tzinfo=timezone.utc),
+        entries=[LeaderboardEntry(user_id="u1", username="one", ppg=ppg, rank=1)], total=1
+    )
+
+class CountingLoad:
+    def __init__(self, leaderboard):
+        self.leaderboard = leaderboard
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.leaderboard
+
+KEY = ("7d", 0, 100)
+
+@pytest.mark.anyio
+async def test_concurrent_fills_are_coalesced():
+    cache = LeaderboardCache(ttl=30, max_size=10)
+    load = CountingLoad(make_leaderboard())
+    load.release.clear()
+
+    waiters = [asyncio.ensure_future(cache.get_or_load(KEY, load)) for _ in range(20)]
+    await asyncio.sleep(0)
+    load.release.set()
+    entries = await asyncio.gather(*waiters)
+
+    assert load.calls == 1
+    assert all(entry is entries[0] for entry in entries)
+    assert entries[0].body == make_leaderboard().model_dump_json().encode()
+    assert cache.stats()["coalesced"] == 19
+
+@pytest.mark.anyio
+async def test_cancelled_leader_hands_the_load_to_a_waiter():
+    cache = LeaderboardCache(ttl=30, max_size=10)
+    load = CountingLoad(make_leaderboard())
+    load.release.clear()
+
+    leader = asyncio.ensure_future(cache.get_or_load(KEY, load))
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(cache.get_or_load(KEY, load)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    # The leader's client disconnects; the waiters' requests are still live
+    leader.cancel()
+    await asyncio.sleep(0)
+    load.release.set()
+    entries = await asyncio.gather(*waiters)
+
+    assert leader.cancelled()
+    assert all(entry is entries[0] for entry in entries)
+    assert entries[0].body == make_leaderboard().model_dump_json().encode()
+    # One waiter loaded again and the others joined it
+    assert load.calls == 2
+    assert cache.stats()["inflight"] == 0
+
+@pytest.mark.anyio
+async def test_entries_are_revalidated_after_the_ttl(clock):
+    cache = LeaderboardCache(ttl=30, max_size=10, clock=clock)
+    load = CountingLoad(make_leaderboard())
+
+    first = await cache.get_or_load(KEY, load)
+    clock.now += 29
+    assert await cache.get_or_load(KEY, load) is first
+    assert load.calls == 1
+
+    # Same version after the TTL: one read, same bytes and ETag
+    clock.now += 2
+    assert await cache.get_or_load(KEY, load) is first
+    assert load.calls == 2
+    assert cache.stats()["revalidated"] == 1
+
+    # A new publish changes the version, and with it the ETag
+    clock.now += 31
+    load.leaderboard = make_leaderboard(day=3, ppg=15.0)
+    newer = await cache.get_or_load(KEY, load)
+    assert newer.etag != first.etag
+    assert b"15.0" in newer.body
+
+@pytest.mark.anyio
+async def test_missing_leaderboards_and_failures_are_not_cached():
+    cache = LeaderboardCache(ttl=30, max_size=10)
+    load = CountingLoad(None)
+
+    assert await cache.get_or_load(KEY, load) is None
+    assert await cache.get_or_load(KEY, load) is None
+    assert load.calls == 2
+
+    async def failing():
+        raise RuntimeError("unavailable")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load(KEY, failing)
+    assert len(cache) == 0
+
+@pytest.mark.anyio
+async def test_least_recently_used_ranges_are_evicted():
+    cache = LeaderboardCache(ttl=30, max_size=2)
+    load = CountingLoad(make_leaderboard())
+
+    for offset in (0, 100, 200):
+        await cache.get_or_load(("7d", offset, 100), load)
+
+    assert len(cache) == 2
+    assert cache.get(("7d", 0, 100)) is None
+    assert cache.get(("7d", 200, 100)) is not None
@@ -0,0 +1,64 @@
+import random
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.leaderboard_index import RankIndex
+
+def ranked(scores):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+def test_rank_orders_by_score_then_user_id():
+    index = RankIndex([("b", 5.0), ("a", 5.0), ("c", 7.5), ("d", -1.0)])
+
+    assert index.slice(0, 10) == [("c", 7.5), ("a", 5.0), ("b", 5.0), ("d", -1.0)]
+    assert [index.rank(user_id) for user_id in "abcd"] == [2, 3, 1, 4]
+    assert index.rank("missing") is None
+    assert len(index) == 4
+
+def test_updates_mark_only_the_pages_they_shift():
+    index = RankIndex((f"user{i:02}", float(i)) for i in range(20))
+
+    # user05 (rank 15) moves to rank 11: ranks 11-15 shift, all on page 2 (ranks 11-15)
+    index.update("user05", 9.5)
+    assert index.dirty_pages(5) == {2}
+    index.clear_dirty()
+
+    # Unchanged scores mark nothing
+    index.update("user05", 9.5)
+    assert index.dirty_pages(5) == set()
+
+    # Removing the leader moves everyone up
+    index.update("user19", None)
+    assert index.dirty_pages(5) == {0, 1, 2, 3}
+    assert "user19" not in index
+    assert index.rank("user18") == 1
+
+def test_randomized_updates_match_a_full_sort():
+    rng = random.Random(7)
+    scores = {f"user{i}": float(rng.randint(-50, 50)) for i in range(200)}
+    index = RankIndex(scores.items())
+    page_size = 16
+
+    for _ in range(500):
+        before = ranked(scores)
+        user_id = f"user{rng.randrange(260)}"
+        score = None if rng.random() < 0.2 else float(rng.randint(-50, 50))
+        index.update(user_id, score)
+        if score is None:
+            scores.pop(user_id, None)
+        else:
+            scores[user_id] = score
+
+        after = ranked(scores)
+        assert index.slice(0, len(index)) == after
+        assert index.rank(user_id) == (after.index((user_id, score)) + 1 if score is not None else None)
+
+        # Every page whose contents changed is reported dirty
+        changed = {
+            page for page in range(max(len(before), len(after)) // page_size + 1)
+            if before[page * page_size:(page + 1) * page_size] != after[page * page_size:(page + 1) * page_size]
+        }
+        assert changed <= index.dirty_pages(page_size)
+        index.clear_dirty()
@@ -0,0 +1,211 @@
+import json
+import random
+import sys
+import os
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# In-memory Firestore stand-in, shared with the benchmarks in scripts/
+from firestore_stub import FakeFirestore
+
+with patch("google.cloud.firestore.Client"):
+    from app.services.leaderboards import (
+        compose_shifts, diff_rankings, get_changes, get_leaderboard, get_standing, shift_at
+    )
+    from app.models.leaderboard import Leaderboard, LeaderboardChanges, LeaderboardEntry, LeaderboardPage, RankShift
+    from app.core.config import settings
+
+def seed_board(users=23, page_size=5, top_k=3, window="7d"):
+    """
+    Stores a window ranking user0 first through user{users - 1} last, laid
+    out the way generate_leaderboards writes it.
+    """
+    db = FakeFirestore()
+    entries = [
+        LeaderboardEntry(user_id=f"user{i}", username=f"name{i}", ppg=float(users - i), rank=i + 1)
+        for i in range(users)
+    ]
+    pages = -(-users // page_size)
+    for page in range(pages):
+        page_entries = entries[page * page_size:(page + 1) * page_size]
+        db.collection("leaderboard_pages").document(f"{window}_{page}").set(LeaderboardPage(
+            window=window, page=page, entries=page_entries, user_ids=[e.user_id for e in page_entries]
+        ).model_dump())
+    db.collection("leaderboards").document(window).set(Leaderboard(
+        id=window, updated_at=datetime.now(timezone.utc), entries=entries[:top_k],
+        as_of="2026-01-02", total=users, pages=pages, page_size=page_size
+    ).model_dump())
+    # Another window's pages hold the same users
+    db.collection("leaderboard_pages").document("1d_0").set(LeaderboardPage(
+        window="1d", page=0, entries=entries[:1], user_ids=["user0"]
+    ).model_dump())
+    db.ops.clear()
+    return db
+
+def ranks(entries):
+    return [entry.rank for entry in entries]
+
+def test_top_entries_come_from_the_window_document():
+    db = seed_board()
+
+    leaderboard = get_leaderboard(db, "7d", offset=1, limit=2)
+
+    assert ranks(leaderboard.entries) == [2, 3]
+    assert leaderboard.total == 23
+    assert db.ops["read"] == 1
+
+def test_deeper_ranges_read_only_the_pages_they_cover():
+    db = seed_board()
+
+    leaderboard = get_leaderboard(db, "7d", offset=8, limit=5)
+
+    # Ranks 9-13 span pages 1 and 2
+    assert ranks(leaderboard.entries) == [9, 10, 11, 12, 13]
+    assert [e.user_id for e in leaderboard.entries][0] == "user8"
+    assert db.ops["read"] == 1 + 2
+    assert db.ops["round_trip"] == 2
+
+    assert ranks(get_leaderboard(db, "7d", offset=20, limit=5).entries) == [21, 22, 23]
+    assert get_leaderboard(db, "7d", offset=30, limit=5).entries == []
+    assert get_leaderboard(db, "30d") is None
+
+def test_standing_query_has_a_composite_index():
+    # get_standing filters on window and user_ids together, which Firestore
+    # only serves from a composite index; the deploy creates it from this file
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "firestore.indexes.json")
+    with open(path) as f:
+        indexes = json.load(f)["indexes"]
+
+    assert {
+        "collectionGroup": "leaderboard_pages",
+        "queryScope": "COLLECTION",
+        "fields": [
+            {"fieldPath": "window", "order": "ASCENDING"},
+            {"fieldPath": "user_ids", "arrayConfig": "CONTAINS"}
+        ]
+    } in indexes
+
+def test_standing_is_one_read_away_from_a_page_edge():
+    db = seed_board()
+
+    standing = get_standing(db, "7d", "user12", neighbours=2)
+
+    assert standing.rank == 13
+    assert standing.ppg == 11.0
+    assert standing.username == "name12"
+    assert ranks(standing.above) == [11, 12]
+    assert ranks(standing.below) == [14, 15]
+    assert db.ops["read"] == 1
+    assert db.ops["round_trip"] == 1
+
+def test_standing_near_a_page_edge_reads_the_neighbouring_page():
+    db = seed_board()
+
+    standing = get_standing(db, "7d", "user10", neighbours=2)
+    assert ranks(standing.above) == [9, 10]
+    assert ranks(standing.below) == [12, 13]
+    assert db.ops["read"] == 2
+
+    # Nothing above the leader or below the last user
+    assert get_standing(db, "7d", "user0", neighbours=2).above == []
+    assert ranks(get_standing(db, "7d", "user22", neighbours=2).above) == [21, 22]
+    assert get_standing(db, "7d", "user22", neighbours=2).below == []
+
+def test_unranked_users_have_no_standing():
+    db = seed_board()
+
+    assert get_standing(db, "7d", "nobody") is None
+    assert get_standing(db, "1d", "user3") is None
+
+def seed_changes(db, window="7d", version=5, change_sets=None):
+    """
+    Sets the window's version and stores change sets by version, each a dict
+    of LeaderboardChanges fields.
+    """
+    db.data["leaderboards"][window]["version"] = version
+    for change_version, fields in (change_sets or {}).items():
+        db.collection("leaderboard_changes").document(f"{window}_{change_version}").set(LeaderboardChanges(
+            window=window, since=change_version - 1, version=change_version,
+            updated_at=datetime.now(timezone.utc), **fields
+        ).model_dump())
+    db.ops.clear()
+
+def entry(user_id, rank, ppg=1.0):
+    return LeaderboardEntry(user_id=user_id, username=user_id, ppg=ppg, rank=rank)
+
+def shifts(*pairs):
+    return [RankShift(from_rank=from_rank, delta=delta) for from_rank, delta in pairs]
+
+def apply_shifts(shift_list, rank):
+    return rank + shift_at(shift_list, rank)
+
+def test_diff_rankings_sends_changed_users_and_shifts():
+    previous = {f"u{i}": {"user_id": f"u{i}", "username": f"u{i}", "ppg": 100.0 - i, "rank": i} for i in range(1, 11)}
+    # u8 jumps to the top, u3 leaves, n1 enters at rank 6
+    ranking = [("u8", 200.0), ("u1", 99.0), ("u2", 98.0), ("u4", 96.0), ("u5", 95.0), ("n1", 94.5),
+               ("u6", 94.0), ("u7", 93.0), ("u9", 91.0), ("u10", 90.0)]
+
+    entries, removed, shift_list = diff_rankings(
+        previous, ranking, lambda user_id, ppg: {"username": user_id, "ppg": ppg, "score": None}
+    )
+
+    assert [(e.user_id, e.rank) for e in entries] == [("u8", 1), ("n1", 6)]
+    assert removed == ["u3"]
+    # u1-u2 move down one, u4-u5 stay, u6-u7 move down one, u9-u10 stay
+    assert shift_list == shifts((1, 1), (4, 0), (6, 1), (9, 0))
+
+def test_compose_shifts_matches_applying_in_turn():
+    rng = random.Random(3)
+    for _ in range(200):
+        first = shifts(*sorted({(rng.randint(1, 40), 0) for _ in range(5)}))
+        second = shifts(*sorted({(rng.randint(1, 40), 0) for _ in range(5)}))
+        for s in first + second:
+            s.delta = rng.randint(-3, 3)
+        composed = compose_shifts(first, second)
+        for rank in range(1, 50):
+            assert apply_shifts(composed, rank) == apply_shifts(second, apply_shifts(first, rank))
+
+def test_changes_are_merged_across_versions():
+    db = seed_board()
+    seed_changes(db, version=5, change_sets={
+        3: {"entries": [entry("user4", 2), entry("user9", 3)], "removed": ["user7"], "shifts": shifts((2, 1))},
+        4: {"entries": [entry("user5", 1)], "removed": ["user9"], "shifts": shifts((1, 1))},
+        5: {"entries": [entry("user7", 9)]},
+    })
+
+    changes = get_changes(db, "7d", since=2)
+
+    assert changes.full_reload is False
+    assert (changes.since, changes.version) == (2, 5)
+    # Latest entry per user, in rank order; user4 moved down with version 4's
+    # shift, user7 came back, user9 left
+    assert [(e.user_id, e.rank) for e in changes.entries] == [("user5", 1), ("user4", 3), ("user7", 9)]
+    assert changes.removed == ["user9"]
+    assert changes.shifts == shifts((1, 1), (2, 2))
+    assert db.ops["round_trip"] == 2
+
+    up_to_date = get_changes(db, "7d", since=5)
+    assert up_to_date.entries == [] and up_to_date.full_reload is False
+
+def test_clients_out_of_range_are_told_to_reload():
+    db = seed_board()
+    seed_changes(db, version=60, change_sets={59: {}, 60: {"full_reload": True}})
+
+    assert get_changes(db, "7d", since=61).full_reload is True
+    assert get_changes(db, "7d", since=60 - settings.LEADERBOARD_CHANGES_KEEP - 1).full_reload is True
+    # A rebuilt version, or an expired or missing change set
+    assert get_changes(db, "7d", since=59).full_reload is True
+    assert get_changes(db, "7d", since=57).full_reload is True
+    assert get_changes(db, "30d", since=1) is None
+
+def test_too_many_merged_changes_mean_a_reload():
+    db = seed_board()
+    seed_changes(db, version=2, change_sets={
+        1: {"entries": [entry(f"a{i}", i + 1) for i in range(3)]},
+        2: {"entries": [entry(f"b{i}", i + 1) for i in range(3)]},
+    })
+
+    with patch.object(settings, "LEADERBOARD_CHANGES_MAX_ENTRIES", 5):
+        assert get_changes(db, "7d", since=1).full_reload is False
+        assert get_changes(db, "7d", since=0).full_reload is True
@@ -5,13 +5,26 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.services import market_data
 from app.services.market_data import get_real_time_quote
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.upstream_scheduler import UpstreamScheduler
 from fastapi import HTTPException
 
 @pytest.fixture
 def anyio_backend():
     return 'asyncio'
 
+@pytest.fixture(autouse=True)
+def finnhub_api_key():
+    # Exercise the real upstream path rather than the local mock-key shortcut
+    market_data.quote_cache.clear()
+    with patch.object(market_data.settings, "FINNHUB_API_KEY", "test-key"), \
+         patch.object(market_data, "upstream_breaker", CircuitBreaker(failure_threshold=3, reset_timeout=30.0)), \
+         patch.object(market_data, "upstream_scheduler", UpstreamScheduler(rate_per_minute=6000, burst=100)):
+        yield
+    market_data.quote_cache.clear()
+
 @pytest.mark.anyio
 async def test_get_quote_success():
     # Mock the response object
@@ -30,12 +43,9 @@ async def test_get_quote_success():
     # Mock the client context manager
     mock_client = AsyncMock()
     mock_client.get.return_value = mock_response
-    
-    # We need to mock the context manager __aenter__ and __aexit__
-    mock_client.__aenter__.return_value = mock_client
-    mock_client.__aexit__.return_value = None
+    mock_client.is_closed = False
 
-    with patch("app.services.market_data.httpx.AsyncClient", return_value=mock_client):
+    with patch.object(market_data, "_http_client", mock_client):
         quote = await get_real_time_quote("AAPL")
         
         assert quote.symbol == "AAPL"
@@ -60,31 +70,202 @@ async def test_get_quote_invalid_symbol():
 
     mock_client = AsyncMock()
     mock_client.get.return_value = mock_response
-    mock_client.__aenter__.return_value = mock_client
-    mock_client.__aexit__.return_value = None
+    mock_client.is_closed = False
 
-    with patch("app.services.market_data.httpx.AsyncClient", return_value=mock_client):
+    with patch.object(market_data, "_http_client", mock_client):
         with pytest.raises(HTTPException) as exc_info:
             await get_real_time_quote("INVALID")
         
         assert exc_info.value.status_code == 404
 
-@pytest.mark.anyio
-async def test_get_quote_api_failure_returns_fallback_data():
+def failing_client(status_code=500):
     mock_response = MagicMock()
-    mock_response.status_code = 500
+    mock_response.status_code = status_code
     mock_response.text = "Internal Server Error" # Add some text for logging
-    
+
+    mock_client = AsyncMock()
+    mock_client.get.return_value = mock_response
+    mock_client.is_closed = False
+    return mock_client
+
+@pytest.mark.anyio
+async def test_get_quote_api_failure_without_known_price_is_unavailable():
+    with patch.object(market_data, "_http_client", failing_client()):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_real_time_quote("AAPL")
+
+    assert exc_info.value.status_code == 503
+
+@pytest.mark.anyio
+async def test_get_quote_api_failure_serves_last_good_price_as_stale():
+    market_data.quote_cache.put("AAPL", market_data.StockQuote(symbol="AAPL", price=187.0, change=1.0, percent_change=0.5))
+
+    with patch.object(market_data, "_http_client", failing_client()):
+        quote = await get_real_time_quote("AAPL", max_age=0)
+
+    assert quote.price == 187.0
+    assert quote.stale is True
+    assert quote.as_of is not None
+    assert market_data.quote_cache.stats()["stale_hits"] == 1
+
+@pytest.mark.anyio
+async def test_trade_rejects_price_older_than_its_stale_bound():
+    market_data.quote_cache.put("AAPL", market_data.StockQuote(symbol="AAPL", price=187.0, change=1.0, percent_change=0.5))
+
+    with patch.object(market_data, "_http_client", failing_client()), \
+         patch.object(market_data.quote_cache, "_clock", lambda: 10 ** 9):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_real_time_quote("AAPL", max_age=1.0, max_stale_age=5.0)
+
+    assert exc_info.value.status_code == 503
+
+@pytest.mark.anyio
+async def test_breaker_opens_after_repeated_failures_and_fails_fast():
+    mock_client = failing_client(502)
+
+    with patch.object(market_data, "_http_client", mock_client):
+        for _ in range(market_data.upstream_breaker.failure_threshold + 3):
+            with pytest.raises(HTTPException):
+                await get_real_time_quote("AAPL")
+
+    assert mock_client.get.call_count == market_data.upstream_breaker.failure_threshold
+    stats = market_data.get_market_data_metrics()["upstream_breaker"]
+    assert stats["state"] == "open"
+    assert stats["short_circuited"] == 3
+
+@pytest.mark.anyio
+async def test_transport_errors_count_as_failures():
+    import httpx
+    mock_client = AsyncMock()
+    mock_client.get.side_effect = httpx.ConnectTimeout("timed out")
+    mock_client.is_closed = False
+
+    with patch.object(market_data, "_http_client", mock_client):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_real_time_quote("AAPL")
+
+    assert exc_info.value.status_code == 503
+    assert market_data.upstream_breaker.consecutive_failures == 1
+
+@pytest.mark.anyio
+async def test_get_quote_uses_injected_client():
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"c": 10.0, "d": 0.1, "dp": 1.0, "pc": 9.9}
+
+    injected = AsyncMock()
+    injected.get.return_value = mock_response
+
+    quote = await get_real_time_quote("MSFT", client=injected)
+
+    assert quote.price == 10.0
+    injected.get.assert_called_once()
+    assert injected.get.call_args[1]["params"]["symbol"] == "MSFT"
+
+@pytest.mark.anyio
+async def test_shared_http_client_is_reused_and_closed():
+    market_data.set_http_client(None)
+    try:
+        client = market_data.get_http_client()
+        assert market_data.get_http_client() is client
+    finally:
+        await market_data.close_http_client()
+
+    assert client.is_closed
+    assert market_data._http_client is None
+
+def test_create_http_client_applies_pool_settings():
+    with patch.object(market_data.settings, "MARKET_DATA_MAX_CONNECTIONS", 7), \
+         patch.object(market_data.settings, "MARKET_DATA_MAX_KEEPALIVE_CONNECTIONS", 3):
+        with patch("app.services.market_data.httpx.AsyncClient") as mock_client_cls:
+            market_data.create_http_client()
+
+    limits = mock_client_cls.call_args[1]["limits"]
+    assert limits.max_connections == 7
+    assert limits.max_keepalive_connections == 3
+
+@pytest.mark.anyio
+async def test_get_quote_served_from_cache_until_max_age():
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"c": 42.0, "d": 0.0, "dp": 0.0, "pc": 42.0}
+
     mock_client = AsyncMock()
     mock_client.get.return_value = mock_response
-    mock_client.__aenter__.return_value = mock_client
-    mock_client.__aexit__.return_value = None
+    mock_client.is_closed = False
+
+    with patch.object(market_data, "_http_client", mock_client):
+        await get_real_time_quote("NVDA")
+        await get_real_time_quote("NVDA")
+        assert mock_client.get.call_count == 1
 
-    with patch("app.services.market_data.httpx.AsyncClient", return_value=mock_client):
+        # A trade-style freshness bound of zero always goes upstream
+        await get_real_time_quote("NVDA", max_age=0)
+        assert mock_client.get.call_count == 2
+
+@pytest.mark.anyio
+async def test_get_quotes_returns_partial_results_and_errors():
+    async def fake_get_quote(symbol, **kwargs):
+        if symbol == "INVALID":
+            raise HTTPException(status_code=404, detail="Symbol INVALID not found")
+        return market_data.StockQuote(symbol=symbol, price=1.0, change=0.0, percent_change=0.0)
+
+    with patch("app.services.market_data.get_real_time_quote", AsyncMock(side_effect=fake_get_quote)) as mock_quote:
+        batch = await market_data.get_real_time_quotes(["AAPL", "INVALID", "AAPL", " MSFT "])
+
+    assert set(batch.quotes) == {"AAPL", "MSFT"}
+    assert batch.errors == {"INVALID": "Symbol INVALID not found"}
+    assert mock_quote.call_count == 3
+
+@pytest.mark.anyio
+async def test_get_quotes_bounds_concurrency():
+    import asyncio
+    in_flight = 0
+    peak = 0
+
+    async def fake_get_quote(symbol, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return market_data.StockQuote(symbol=symbol, price=1.0, change=0.0, percent_change=0.0)
+
+    with patch("app.services.market_data.get_real_time_quote", AsyncMock(side_effect=fake_get_quote)):
+        batch = await market_data.get_real_time_quotes([f"SYM{i}" for i in range(20)], concurrency=3)
+
+    assert len(batch.quotes) == 20
+    assert peak <= 3
+
+@pytest.mark.anyio
+async def test_secondary_provider_answers_when_finnhub_fails():
+    async def fake_get(url, params=None):
+        response = MagicMock()
+        if "twelvedata" in url:
+            response.status_code = 200
+            response.json.return_value = {"symbol": "AAPL", "close": "187.5", "change": "1.5", "percent_change": "0.81"}
+        else:
+            response.status_code = 503
+            response.text = "Service Unavailable"
+        return response
+
+    mock_client = AsyncMock()
+    mock_client.get.side_effect = fake_get
+    mock_client.is_closed = False
+
+    with patch.object(market_data.settings, "TWELVEDATA_API_KEY", "test-key"):
+        fetcher = market_data.create_quote_fetcher()
+    assert [provider.name for provider in fetcher.providers] == ["finnhub", "twelvedata"]
+
+    with patch.object(market_data, "quote_fetcher", fetcher), \
+         patch.object(market_data, "_http_client", mock_client):
         quote = await get_real_time_quote("AAPL")
-        
-        assert quote.symbol == "AAPL"
-        assert quote.price == 100.0
-        assert quote.change == 0.0
-        assert quote.percent_change == 0.0
 
+    assert quote.price == 187.5
+    assert quote.percent_change == 0.81
+    assert fetcher.stats()["twelvedata"]["wins"] == 1
+
+def test_secondary_provider_is_off_without_key():
+    with patch.object(market_data.settings, "TWELVEDATA_API_KEY", ""):
+        fetcher = market_data.create_quote_fetcher()
+    assert [provider.name for provider in fetcher.providers] == ["finnhub"]
@@ -0,0 +1,51 @@
+import sys
+import os
+from datetime import date
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# In-memory Firestore stand-in, shared with the benchmarks in scripts/
+from firestore_stub import FakeFirestore
+
+with patch("google.cloud.firestore.Client"):
+    from app.services.performance import portfolio_performance
+    from app.services.snapshot_series import SnapshotSeries, series_ref
+
+def seeded_db(points):
+    db = FakeFirestore()
+    for user_id, values in points.items():
+        series = {}
+        for day, value in values.items():
+            series.setdefault(day.year, SnapshotSeries(user_id, day.year)).set(day, value)
+        for year, s in series.items():
+            series_ref(db, user_id, year).set(s.to_doc())
+    db.ops.clear()
+    return db
+
+def test_range_ends_use_the_nearest_snapshot_on_or_before():
+    db = seeded_db({
+        # No snapshot on either end: Dec 30 stands in for Jan 2, Jan 31 for Feb 1
+        "user1": {date(2025, 12, 30): 100.0, date(2026, 1, 20): 90.0, date(2026, 1, 31): 120.0, date(2026, 2, 3): 1.0},
+        # Joined mid-range: measured from the first snapshot
+        "user2": {date(2026, 1, 10): 200.0, date(2026, 1, 31): 150.0},
+        # Nothing until after the range
+        "user3": {date(2026, 3, 1): 50.0},
+    })
+
+    results = portfolio_performance(db, ["user1", "user2", "user3", "user4"], date(2026, 1, 2), date(2026, 2, 1))
+
+    user1 = results["user1"]
+    assert (user1.start_date, user1.start_value) == ("2025-12-30", 100.0)
+    assert (user1.end_date, user1.end_value) == ("2026-01-31", 120.0)
+    assert user1.value_change == 20.0
+    assert user1.ppg == 20.0
+    assert (user1.start, user1.end) == ("2026-01-02", "2026-02-01")
+
+    assert results["user2"].start_date == "2026-01-10"
+    assert results["user2"].ppg == -25.0
+    assert results["user3"] is None
+    assert results["user4"] is None
+
+    # One series per user per year, including the year before start
+    assert db.ops["read"] == 4 * 2
+    assert db.ops["round_trip"] == 1
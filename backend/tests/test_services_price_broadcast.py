@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.market import StockQuote, StockQuoteBatch
+from app.services.price_broadcast import PriceBroadcaster, Subscription, StreamCapacityError
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+def make_quote(symbol: str, price: float) -> StockQuote:
+    return StockQuote(symbol=symbol, price=price, change=0.0, percent_change=0.0)
+
+def make_fetch(prices: dict):
+    async def fetch(symbols):
+        return StockQuoteBatch(quotes={s: make_quote(s, prices[s]) for s in symbols if s in prices}, errors={})
+    return AsyncMock(side_effect=fetch)
+
+@pytest.mark.anyio
+async def test_one_upstream_poll_fans_out_to_all_subscribers():
+    fetch = make_fetch({"AAPL": 150.0, "MSFT": 300.0})
+    broadcaster = PriceBroadcaster(fetch, interval=10.0)
+
+    subscriptions = [broadcaster.subscribe(["AAPL"]) for _ in range(500)]
+    msft_only = broadcaster.subscribe(["MSFT"])
+    try:
+        batches = await asyncio.gather(*(s.next_batch(timeout=1.0) for s in subscriptions))
+        assert all(batch[0].price == 150.0 for batch in batches)
+        assert [q.symbol for q in await msft_only.next_batch(timeout=1.0)] == ["MSFT"]
+
+        fetch.assert_called_once_with(["AAPL", "MSFT"])
+        assert broadcaster.stats()["polls"] == 1
+    finally:
+        await broadcaster.stop()
+
+@pytest.mark.anyio
+async def test_slow_subscriber_is_conflated_to_latest_price():
+    subscription = Subscription(["AAPL"])
+    for price in (1.0, 2.0, 3.0):
+        subscription.push(make_quote("AAPL", price))
+
+    batch = await subscription.next_batch(timeout=0.1)
+
+    assert [q.price for q in batch] == [3.0]
+    assert subscription.conflated == 2
+    assert await subscription.next_batch(timeout=0.01) == []
+
+@pytest.mark.anyio
+async def test_unchanged_prices_are_not_republished():
+    broadcaster = PriceBroadcaster(make_fetch({}), interval=10.0)
+    subscription = broadcaster.subscribe(["AAPL"])
+    try:
+        broadcaster.publish(make_quote("AAPL", 1.0))
+        broadcaster.publish(make_quote("AAPL", 1.0))
+        assert len(await subscription.next_batch(timeout=0.1)) == 1
+        assert subscription.conflated == 0
+    finally:
+        await broadcaster.stop()
+
+@pytest.mark.anyio
+async def test_connection_cap_and_unsubscribe():
+    broadcaster = PriceBroadcaster(make_fetch({}), interval=10.0, max_connections=2)
+    first = broadcaster.subscribe(["AAPL"])
+    broadcaster.subscribe(["AAPL", "MSFT"])
+    try:
+        with pytest.raises(StreamCapacityError):
+            broadcaster.subscribe(["GOOG"])
+
+        broadcaster.unsubscribe(first)
+        third = broadcaster.subscribe(["GOOG"])
+        assert broadcaster.stats()["connections"] == 2
+        assert broadcaster.stats()["rejected"] == 1
+
+        broadcaster.unsubscribe(third)
+        assert broadcaster.stats()["symbols"] == 2
+    finally:
+        await broadcaster.stop()
+
+@pytest.mark.anyio
+async def test_symbol_caps_per_connection_and_in_total():
+    broadcaster = PriceBroadcaster(make_fetch({}), interval=10.0, max_symbols_per_connection=2, max_symbols=3)
+    try:
+        with pytest.raises(ValueError):
+            broadcaster.subscribe(["AAPL", "MSFT", "GOOG"])
+
+        first = broadcaster.subscribe(["AAPL", "MSFT"])
+        second = broadcaster.subscribe(["MSFT", "GOOG"])
+        # Symbols already polled can still be streamed to new connections
+        broadcaster.subscribe(["AAPL", "GOOG"])
+        with pytest.raises(StreamCapacityError):
+            broadcaster.subscribe(["TSLA"])
+        assert broadcaster.stats()["rejected"] == 1
+
+        # MSFT is no longer polled once nobody streams it
+        broadcaster.unsubscribe(first)
+        broadcaster.unsubscribe(second)
+        broadcaster.subscribe(["TSLA"])
+        assert broadcaster.stats()["symbols"] == 3
+    finally:
+        await broadcaster.stop()
+
+@pytest.mark.anyio
+async def test_streaming_polls_in_the_batch_lane():
+    from unittest.mock import patch
+    from app.services import market_data
+    from app.services.upstream_scheduler import Priority
+
+    batch = StockQuoteBatch(quotes={}, errors={})
+    with patch("app.services.market_data.get_real_time_quotes", AsyncMock(return_value=batch)) as mock_quotes:
+        await market_data.price_broadcaster._fetch_quotes(["AAPL"])
+
+    assert mock_quotes.call_args.kwargs["priority"] == Priority.BATCH
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import pytest
+import sys
+import os
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets
+from app.services import market_data, price_stream
+from app.services.price_stream import PriceTable, PriceStreamIngestor, load_held_symbols
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+def test_price_table_serves_only_fresh_prices(clock):
+    table = PriceTable(clock=clock)
+    table.set_previous_close("AAPL", 100.0)
+    table.update("AAPL", 102.0)
+
+    quote = table.get_quote("AAPL", max_age=5.0)
+    assert quote.price == 102.0
+    assert quote.change == 2.0
+    assert quote.percent_change == 2.0
+
+    clock.now += 6.0
+    assert table.get_quote("AAPL", max_age=5.0) is None
+
+def test_desired_symbols_prefers_watched_and_caps_count(clock):
+    ingestor = PriceStreamIngestor("ws://unused", PriceTable(), max_symbols=3, watch_ttl=10.0, clock=clock)
+    ingestor.set_held_symbols(Counter({"AAPL": 50, "MSFT": 20, "GOOG": 5, "TSLA": 1}))
+    ingestor.watch(["NVDA"])
+
+    assert ingestor.desired_symbols() == {"NVDA", "AAPL", "MSFT"}
+
+    clock.now += 11.0
+    assert ingestor.desired_symbols() == {"AAPL", "MSFT", "GOOG"}
+
+def test_load_held_symbols_reads_the_latest_evaluation_run():
+    latest = MagicMock(exists=True)
+    latest.to_dict.return_value = {"run_id": "run1"}
+    run = MagicMock(exists=True)
+    run.to_dict.return_value = {"run_id": "run1", "held_symbols": {"AAPL": 2, "MSFT": 1}}
+    mock_db = MagicMock()
+    mock_db.collection.return_value.document.side_effect = lambda doc_id: MagicMock(
+        get=MagicMock(return_value={"latest": latest, "run1": run}[doc_id])
+    )
+
+    assert load_held_symbols(mock_db) == Counter({"AAPL": 2, "MSFT": 1})
+    # No portfolio is read
+    mock_db.collection.return_value.stream.assert_not_called()
+
+def test_trades_adjust_held_symbols_until_the_next_run():
+    ingestor = PriceStreamIngestor("ws://unused", PriceTable(), max_symbols=2)
+    ingestor.set_held_symbols(Counter({"AAPL": 3, "MSFT": 1}))
+
+    ingestor.holding_changed("MSFT", -1)
+    ingestor.holding_changed("NVDA", 1)
+    ingestor.holding_changed("NVDA", 1)
+    assert ingestor.desired_symbols() == {"AAPL", "NVDA"}
+
+    # The same run loaded again keeps the trades; a new one replaces them
+    ingestor.set_held_symbols(Counter({"AAPL": 3, "MSFT": 1}))
+    assert ingestor.desired_symbols() == {"AAPL", "NVDA"}
+    ingestor.set_held_symbols(Counter({"AAPL": 3, "TSLA": 2}))
+    assert ingestor.desired_symbols() == {"AAPL", "TSLA"}
+
+@pytest.mark.anyio
+async def test_ingestor_follows_subscriptions_and_records_trades():
+    received = []
+
+    async def handler(websocket, path=None):
+        async for raw in websocket:
+            message = json.loads(raw)
+            received.append((message["type"], message["symbol"]))
+            if message["type"] == "subscribe":
+                await websocket.send(json.dumps({
+                    "type": "trade",
+                    "data": [{"s": message["symbol"], "p": 123.45, "t": 0, "v": 1}]
+                }))
+
+    server = await websockets.serve(handler, "127.0.0.1", 0)
+    port = list(server.sockets)[0].getsockname()[1]
+    table = PriceTable()
+    ingestor = PriceStreamIngestor(
+        f"ws://127.0.0.1:{port}", table,
+        load_symbols=lambda: Counter({"AAPL": 1}),
+        refresh_interval=0.05
+    )
+    try:
+        ingestor.start()
+        for _ in range(100):
+            if table.get_quote("AAPL", max_age=5.0):
+                break
+            await asyncio.sleep(0.01)
+        assert table.get_quote("AAPL", max_age=5.0).price == 123.45
+
+        # Portfolio change: AAPL sold everywhere, MSFT now held
+        ingestor._load_symbols = lambda: Counter({"MSFT": 1})
+        for _ in range(100):
+            if ("unsubscribe", "AAPL") in received:
+                break
+            await asyncio.sleep(0.01)
+        assert ("subscribe", "MSFT") in received
+        assert ("unsubscribe", "AAPL") in received
+        assert ingestor.stats()["trades_received"] >= 2
+    finally:
+        await ingestor.stop()
+        server.close()
+        await server.wait_closed()
+
+@pytest.mark.anyio
+async def test_refresh_loop_survives_failures(caplog):
+    ingestor = PriceStreamIngestor("ws://unused", PriceTable(), refresh_interval=0.01)
+    ingestor._ws = MagicMock(send=AsyncMock())
+    results = [RuntimeError("Firestore unavailable"), websockets.ConnectionClosed(None, None), Counter({"MSFT": 1})]
+
+    def load_symbols():
+        result = results.pop(0) if len(results) > 1 else results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    ingestor._load_symbols = load_symbols
+
+    task = asyncio.ensure_future(ingestor._refresh_loop())
+    try:
+        for _ in range(300):
+            if ingestor._subscribed:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        ingestor._stopped = True
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    # Both failures were logged and the loop kept going
+    assert ingestor._subscribed == {"MSFT"}
+    assert caplog.text.count("Failed to refresh price stream subscriptions") == 2
+
+@pytest.mark.anyio
+async def test_get_real_time_quote_prefers_fresh_streamed_price():
+    table = PriceTable()
+    table.update("AAPL", 150.25)
+    ingestor = PriceStreamIngestor("ws://unused", table)
+
+    with patch.object(price_stream, "ingestor", ingestor), \
+         patch.object(price_stream, "price_table", table), \
+         patch("app.services.market_data._fetch_quote", new_callable=AsyncMock) as mock_fetch:
+        quote = await market_data.get_real_time_quote("AAPL")
+
+    assert quote.price == 150.25
+    mock_fetch.assert_not_called()
+    assert "AAPL" in ingestor.desired_symbols()
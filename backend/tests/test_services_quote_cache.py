@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.quote_cache import QuoteCache
+from app.models.market import StockQuote
+from fastapi import HTTPException
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+def make_quote(symbol: str, price: float = 100.0) -> StockQuote:
+    return StockQuote(symbol=symbol, price=price, change=0.0, percent_change=0.0)
+
+def test_entry_expires_after_ttl(clock):
+    cache = QuoteCache(ttl=5.0, max_size=10, clock=clock)
+    cache.put("AAPL", make_quote("AAPL"))
+
+    clock.now += 4.9
+    assert cache.get("AAPL") is not None
+
+    clock.now += 0.2
+    assert cache.get("AAPL") is None
+    assert len(cache) == 0
+
+def test_max_age_is_stricter_than_ttl(clock):
+    cache = QuoteCache(ttl=5.0, max_size=10, clock=clock)
+    cache.put("AAPL", make_quote("AAPL"))
+
+    clock.now += 2.0
+    assert cache.get("AAPL", max_age=1.0) is None
+    # The entry itself is still valid for ordinary reads
+    assert cache.get("AAPL") is not None
+
+def test_lru_eviction_respects_max_size(clock):
+    cache = QuoteCache(ttl=60.0, max_size=2, clock=clock)
+    cache.put("AAPL", make_quote("AAPL"))
+    cache.put("MSFT", make_quote("MSFT"))
+
+    # Touch AAPL so MSFT becomes least recently used
+    cache.get("AAPL")
+    cache.put("GOOG", make_quote("GOOG"))
+
+    assert cache.get("MSFT") is None
+    assert cache.get("AAPL") is not None
+    assert cache.get("GOOG") is not None
+    assert cache.stats()["evictions"] == 1
+
+@pytest.mark.anyio
+async def test_concurrent_misses_are_coalesced():
+    cache = QuoteCache(ttl=60.0, max_size=10)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return make_quote("AAPL", 150.0)
+
+    quotes = await asyncio.gather(*(cache.get_or_fetch("AAPL", fetch) for _ in range(50)))
+
+    assert calls == 1
+    assert all(q.price == 150.0 for q in quotes)
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 49
+
+    await cache.get_or_fetch("AAPL", fetch)
+    assert cache.stats()["hits"] == 1
+
+@pytest.mark.anyio
+async def test_fetch_error_reaches_all_waiters_and_is_not_cached():
+    cache = QuoteCache(ttl=60.0, max_size=10)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=404, detail="Symbol BAD not found")
+
+    results = await asyncio.gather(
+        *(cache.get_or_fetch("BAD", fetch) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(r, HTTPException) for r in results)
+    assert cache.get("BAD") is None
+    assert cache.stats()["inflight"] == 0
+
+@pytest.mark.anyio
+async def test_cancelled_leader_hands_the_fetch_to_a_waiter():
+    cache = QuoteCache(ttl=60.0, max_size=10)
+    leader_started = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            leader_started.set()
+            await asyncio.sleep(10)
+        return make_quote("AAPL", 150.0)
+
+    leader = asyncio.ensure_future(cache.get_or_fetch("AAPL", fetch))
+    await leader_started.wait()
+    waiters = [asyncio.ensure_future(cache.get_or_fetch("AAPL", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    # The leader's client disconnects; the waiters' requests are still live
+    leader.cancel()
+    quotes = await asyncio.gather(*waiters)
+
+    assert leader.cancelled()
+    assert [q.price for q in quotes] == [150.0] * 3
+    # One waiter fetched again and the others joined it
+    assert calls == 2
+    assert cache.stats()["inflight"] == 0
+
+@pytest.mark.anyio
+async def test_urgent_caller_does_not_join_lower_priority_fetch():
+    cache = QuoteCache(ttl=60.0, max_size=10)
+    release_batch = asyncio.Event()
+    calls = []
+
+    async def slow_batch_fetch():
+        calls.append("batch")
+        await release_batch.wait()
+        return make_quote("AAPL", 1.0)
+
+    async def trade_fetch():
+        calls.append("trade")
+        return make_quote("AAPL", 2.0)
+
+    batch = asyncio.ensure_future(cache.get_or_fetch("AAPL", slow_batch_fetch, rank=2))
+    await asyncio.sleep(0)
+
+    trade_quote = await cache.get_or_fetch("AAPL", trade_fetch, rank=0)
+    assert trade_quote.price == 2.0
+    assert calls == ["batch", "trade"]
+
+    release_batch.set()
+    await batch
+    assert cache.stats()["inflight"] == 0
+
+def test_last_good_quote_outlives_ttl_for_stale_fallback(clock):
+    cache = QuoteCache(ttl=5.0, max_size=10, clock=clock)
+    cache.put("AAPL", make_quote("AAPL", 187.0))
+
+    clock.now += 60.0
+    assert cache.get("AAPL") is None
+    quote, age = cache.get_stale("AAPL", max_staleness=120.0)
+    assert quote.price == 187.0
+    assert age == 60.0
+    assert cache.get_stale("AAPL", max_staleness=30.0) is None
+
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1
+    assert stats["stale_misses"] == 1
+    assert stats["max_stale_age"] == 60.0
@@ -0,0 +1,170 @@
+import asyncio
+import time
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.quote_hedging import HedgedQuoteFetcher, LatencyHistogram
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+class RetryableError(Exception):
+    pass
+
+class StandInProvider:
+    """
+    Local stand-in provider that answers after an injected latency, or fails.
+    """
+    def __init__(self, name, latency=0.0, error=None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def fetch(self, symbol):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"{self.name}:{symbol}"
+
+def make_fetcher(*providers, **kwargs):
+    kwargs.setdefault("max_delay", 0.05)
+    kwargs.setdefault("min_delay", 0.01)
+    return HedgedQuoteFetcher(providers, retryable=(RetryableError,), **kwargs)
+
+@pytest.mark.anyio
+async def test_fast_primary_is_not_hedged():
+    primary, secondary = StandInProvider("primary"), StandInProvider("secondary")
+    fetcher = make_fetcher(primary, secondary)
+
+    assert await fetcher.fetch(lambda p: p.fetch("AAPL")) == "primary:AAPL"
+    assert secondary.calls == 0
+
+@pytest.mark.anyio
+async def test_slow_primary_is_hedged_and_loser_cancelled():
+    primary = StandInProvider("primary", latency=1.0)
+    secondary = StandInProvider("secondary", latency=0.01)
+    fetcher = make_fetcher(primary, secondary)
+
+    start = time.perf_counter()
+    result = await fetcher.fetch(lambda p: p.fetch("AAPL"))
+
+    assert result == "secondary:AAPL"
+    assert time.perf_counter() - start < 0.5
+    assert primary.cancelled == 1
+    stats = fetcher.stats()
+    assert stats["primary"]["hedged"] == 1
+    assert stats["secondary"]["wins"] == 1
+    # The cancelled primary still contributes a (lower bound) latency sample
+    assert stats["primary"]["count"] == 1
+
+@pytest.mark.anyio
+async def test_primary_wins_if_it_answers_before_the_hedge():
+    primary = StandInProvider("primary", latency=0.08)
+    secondary = StandInProvider("secondary", latency=1.0)
+    fetcher = make_fetcher(primary, secondary)
+
+    assert await fetcher.fetch(lambda p: p.fetch("AAPL")) == "primary:AAPL"
+    assert secondary.calls == 1
+    assert secondary.cancelled == 1
+
+@pytest.mark.anyio
+async def test_retryable_error_fails_over_immediately():
+    primary = StandInProvider("primary", error=RetryableError("down"))
+    secondary = StandInProvider("secondary")
+    fetcher = make_fetcher(primary, secondary, max_delay=5.0)
+
+    start = time.perf_counter()
+    assert await fetcher.fetch(lambda p: p.fetch("AAPL"), hedge=False) == "secondary:AAPL"
+    assert time.perf_counter() - start < 0.5
+
+@pytest.mark.anyio
+async def test_other_errors_are_not_retried():
+    primary = StandInProvider("primary", error=KeyError("unknown symbol"))
+    secondary = StandInProvider("secondary")
+    fetcher = make_fetcher(primary, secondary)
+
+    with pytest.raises(KeyError):
+        await fetcher.fetch(lambda p: p.fetch("AAPL"))
+    assert secondary.calls == 0
+
+@pytest.mark.anyio
+async def test_fast_hedge_error_does_not_beat_a_slower_primary():
+    # The secondary does not list the symbol and says so before the primary answers
+    primary = StandInProvider("primary", latency=0.1)
+    secondary = StandInProvider("secondary", error=KeyError("unknown symbol"))
+    fetcher = make_fetcher(primary, secondary, max_delay=0.02)
+
+    assert await fetcher.fetch(lambda p: p.fetch("ES")) == "primary:ES"
+    assert secondary.calls == 1
+    assert primary.cancelled == 0
+
+@pytest.mark.anyio
+async def test_hedge_error_is_raised_once_every_provider_failed():
+    first = KeyError("secondary does not list ES")
+    primary = StandInProvider("primary", latency=0.1, error=RetryableError("primary down"))
+    secondary = StandInProvider("secondary", error=first)
+    fetcher = make_fetcher(primary, secondary, max_delay=0.02)
+
+    with pytest.raises(KeyError) as exc:
+        await fetcher.fetch(lambda p: p.fetch("ES"))
+    assert exc.value is first
+
+@pytest.mark.anyio
+async def test_all_providers_failing_raises_first_error():
+    first = RetryableError("primary down")
+    fetcher = make_fetcher(
+        StandInProvider("primary", error=first),
+        StandInProvider("secondary", error=RetryableError("secondary down"))
+    )
+
+    with pytest.raises(RetryableError) as exc:
+        await fetcher.fetch(lambda p: p.fetch("AAPL"))
+    assert exc.value is first
+
+@pytest.mark.anyio
+async def test_without_hedging_slow_primary_is_awaited():
+    primary = StandInProvider("primary", latency=0.1)
+    secondary = StandInProvider("secondary")
+    fetcher = make_fetcher(primary, secondary)
+
+    assert await fetcher.fetch(lambda p: p.fetch("AAPL"), hedge=False) == "primary:AAPL"
+    assert secondary.calls == 0
+
+def test_hedge_delay_tracks_percentile_once_warmed_up():
+    primary = StandInProvider("primary")
+    fetcher = HedgedQuoteFetcher([primary], hedge_percentile=90, min_delay=0.01, max_delay=2.0, min_samples=10)
+    assert fetcher.hedge_delay(primary) == 2.0
+
+    for latency in [0.1] * 90 + [1.0] * 10:
+        fetcher.histograms["primary"].record(latency)
+
+    assert 0.1 <= fetcher.hedge_delay(primary) < 0.13
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000)
+
+    assert 0.5 <= histogram.percentile(50) < 0.5 * 1.26
+    assert 0.99 <= histogram.percentile(99) < 0.99 * 1.26
+    assert histogram.stats()["count"] == 1000
+
+def test_histogram_decays_old_samples():
+    histogram = LatencyHistogram(max_count=100)
+    for _ in range(99):
+        histogram.record(2.0)
+    for _ in range(200):
+        histogram.record(0.01)
+
+    assert histogram.percentile(50) < 0.02
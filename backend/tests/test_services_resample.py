@@ -0,0 +1,75 @@
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.resample import resample_candles, lttb_indices, bucket_starts
+
+def random_minute_bars(n, start=1_700_000_040, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    open_ = close + rng.normal(0, 0.05, n)
+    return {
+        "t": start + np.arange(n, dtype=np.int64) * 60,
+        "o": open_,
+        "h": np.maximum(open_, close) + rng.random(n),
+        "l": np.minimum(open_, close) - rng.random(n),
+        "c": close,
+        "v": rng.integers(1, 1000, n).astype(float)
+    }
+
+def naive_resample(candles, seconds):
+    buckets = {}
+    for i, t in enumerate(candles["t"]):
+        buckets.setdefault(t // seconds * seconds, []).append(i)
+    rows = []
+    for start, idx in sorted(buckets.items()):
+        rows.append((
+            start, candles["o"][idx[0]], max(candles["h"][idx]), min(candles["l"][idx]),
+            candles["c"][idx[-1]], sum(candles["v"][idx])
+        ))
+    return rows
+
+def test_resample_matches_naive_aggregation():
+    candles = random_minute_bars(1000)
+    resampled = resample_candles(candles, "5", 300)
+
+    expected = naive_resample(candles, 300)
+    assert resampled["t"].tolist() == [row[0] for row in expected]
+    assert np.allclose(resampled["o"], [row[1] for row in expected])
+    assert np.allclose(resampled["h"], [row[2] for row in expected])
+    assert np.allclose(resampled["l"], [row[3] for row in expected])
+    assert np.allclose(resampled["c"], [row[4] for row in expected])
+    assert np.allclose(resampled["v"], [row[5] for row in expected])
+
+def test_weeks_start_on_monday_and_months_on_the_first():
+    # 2024-01-03 (Wed) .. 2024-02-06 (Tue), one bar per day
+    days = np.arange(np.datetime64("2024-01-03"), np.datetime64("2024-02-07"))
+    t = days.astype("datetime64[s]").astype(np.int64)
+
+    weeks = np.unique(bucket_starts(t, "W", 604800)).astype("datetime64[s]").astype("datetime64[D]")
+    assert all(week.astype(object).weekday() == 0 for week in weeks)
+    assert str(weeks[0]) == "2024-01-01"
+
+    months = np.unique(bucket_starts(t, "M", 2592000)).astype("datetime64[s]").astype("datetime64[D]")
+    assert [str(m) for m in months] == ["2024-01-01", "2024-02-01"]
+
+def test_empty_input_resamples_to_empty():
+    empty = {name: np.empty(0) for name in ("t", "o", "h", "l", "c", "v")}
+    assert len(resample_candles(empty, "5", 300)["t"]) == 0
+
+def test_lttb_keeps_endpoints_budget_and_spikes():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0  # a spike must survive downsampling
+
+    indices = lttb_indices(x, y, 200)
+
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert (np.diff(indices) > 0).all()
+    assert 4321 in indices
+
+def test_lttb_returns_everything_under_budget():
+    assert lttb_indices(np.arange(10), np.arange(10), 50).tolist() == list(range(10))
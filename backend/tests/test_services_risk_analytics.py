@@ -0,0 +1,127 @@
+import math
+import sys
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.risk_analytics import (
+    PERIODS_PER_YEAR, forward_fill, risk_metrics, score_risk_leaderboards, value_matrix
+)
+from app.services.snapshot_series import SnapshotSeries
+
+def reference_metrics(row, risk_free_rate=0.0):
+    """
+    One user's metrics, computed the slow way.
+    """
+    values = [v for v in row if not math.isnan(v)]
+    returns = []
+    last = None
+    for v in row:
+        if math.isnan(v):
+            v = last
+        if last is not None and v is not None:
+            returns.append(v / last - 1.0)
+        if v is not None:
+            last = v
+    rf = risk_free_rate / PERIODS_PER_YEAR
+    mean = sum(r - rf for r in returns) / len(returns)
+    std = np.std(returns, ddof=1)
+    downside = math.sqrt(sum(min(r - rf, 0.0) ** 2 for r in returns) / len(returns))
+    peak, drawdown = values[0], 0.0
+    for v in values:
+        peak = max(peak, v)
+        drawdown = min(drawdown, v / peak - 1.0)
+    return {
+        "total_return": values[-1] / values[0] - 1.0,
+        "volatility": std * math.sqrt(PERIODS_PER_YEAR),
+        "sharpe": mean / std * math.sqrt(PERIODS_PER_YEAR),
+        "sortino": mean / downside * math.sqrt(PERIODS_PER_YEAR),
+        "max_drawdown": drawdown
+    }
+
+def test_forward_fill_keeps_leading_gaps():
+    nan = np.nan
+    matrix = np.array([[nan, 1.0, nan, nan, 4.0], [2.0, nan, 3.0, nan, nan], [nan, nan, nan, nan, nan]])
+
+    filled = forward_fill(matrix)
+
+    np.testing.assert_array_equal(filled[0], [nan, 1.0, 1.0, 1.0, 4.0])
+    np.testing.assert_array_equal(filled[1], [2.0, 2.0, 3.0, 3.0, 3.0])
+    assert np.isnan(filled[2]).all()
+
+def test_vectorized_metrics_match_a_per_user_computation():
+    rng = np.random.default_rng(11)
+    values = 10000 * np.cumprod(1 + rng.normal(0.001, 0.02, size=(50, 31)), axis=1)
+    # Missed days and late starters
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[:5, :10] = np.nan
+
+    metrics = risk_metrics(values, risk_free_rate=0.03)
+
+    for i, row in enumerate(values):
+        expected = reference_metrics(row, risk_free_rate=0.03)
+        for name, value in expected.items():
+            assert metrics[name][i] == pytest.approx(value), (i, name)
+
+def test_flat_sparse_and_empty_rows_are_not_scored():
+    nan = np.nan
+    values = np.array([
+        [100.0] * 6,
+        [nan, nan, nan, nan, 100.0, 110.0],
+        [nan] * 6,
+        [100.0, 50.0, 75.0, 100.0, 120.0, 60.0],
+    ])
+
+    metrics = risk_metrics(values, min_returns=3)
+
+    assert np.isnan(metrics["sharpe"][:3]).all()
+    assert np.isnan(metrics["sortino"][:3]).all()
+    assert metrics["total_return"][1] == pytest.approx(0.1)
+    assert metrics["max_drawdown"][0] == 0.0
+    assert metrics["max_drawdown"][3] == pytest.approx(-0.5)
+    assert metrics["observations"].tolist() == [5, 1, 0, 5]
+
+def test_value_matrix_spans_new_year():
+    start, end = date(2025, 12, 30), date(2026, 1, 2)
+    series = {
+        ("a", 2025): SnapshotSeries("a", 2025),
+        ("a", 2026): SnapshotSeries("a", 2026),
+        ("b", 2025): SnapshotSeries("b", 2025),
+        ("b", 2026): SnapshotSeries("b", 2026),
+    }
+    for day, value in [(date(2025, 12, 1), 1.0), (date(2025, 12, 31), 2.0), (date(2026, 1, 2), 3.0), (date(2026, 2, 1), 4.0)]:
+        series[("a", day.year)].set(day, value)
+
+    matrix = value_matrix(series, ["a", "b"], start, end)
+
+    np.testing.assert_array_equal(matrix[0], [np.nan, 2.0, np.nan, 3.0])
+    assert np.isnan(matrix[1]).all()
+
+def test_score_risk_leaderboards_ranks_steady_gains_over_volatile_ones():
+    today = date(2026, 6, 30)
+    series = {}
+    rng = np.random.default_rng(5)
+    paths = {
+        "steady": 10000 * 1.002 ** np.arange(91),
+        "volatile": 10000 * np.cumprod(1 + rng.normal(0.002, 0.05, 91)),
+        "new": np.r_[np.full(80, np.nan), 10000 * 1.01 ** np.arange(11)],
+    }
+    for user_id, path in paths.items():
+        s = SnapshotSeries(user_id, today.year)
+        for offset, value in enumerate(path):
+            if not np.isnan(value):
+                s.set(today - timedelta(days=90 - offset), float(value))
+        series[(user_id, today.year)] = s
+
+    scores = score_risk_leaderboards(series, list(paths), today)
+
+    assert scores["sharpe_90d"]["steady"][0] > scores["sharpe_90d"]["volatile"][0]
+    assert scores["sharpe_90d"]["steady"][1] == pytest.approx(round((1.002 ** 90 - 1) * 100, 2))
+    # Ten days of returns are too few for either window, which need half their days
+    assert scores["sharpe_90d"]["new"] is None
+    assert scores["sharpe_30d"]["new"] is None
+    assert scores["sortino_90d"]["volatile"] is not None
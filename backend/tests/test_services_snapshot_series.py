@@ -0,0 +1,130 @@
+import pytest
+import sys
+import os
+from datetime import date, timedelta
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# In-memory Firestore stand-in, shared with the benchmarks in scripts/
+from firestore_stub import FakeFirestore
+# The migration under test lives with the other one-off scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+
+with patch("google.cloud.firestore.Client"):
+    from app.services.snapshot_series import SnapshotSeries, load_series, values_on, values_between, series_ref
+    from migrate_snapshots import migrate
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+def test_set_get_and_between_keep_days_sorted():
+    series = SnapshotSeries("user1", 2024)
+    for day, value in [(date(2024, 3, 1), 3.0), (date(2024, 1, 1), 1.0), (date(2024, 12, 31), 4.0), (date(2024, 2, 29), 2.0)]:
+        series.set(day, value)
+    series.set(date(2024, 3, 1), 3.5)
+
+    assert len(series) == 4
+    assert list(series.days) == [0, 59, 60, 365]
+    assert series.get(date(2024, 3, 1)) == 3.5
+    assert series.get(date(2024, 3, 2)) is None
+    assert date(2024, 2, 29) in series
+    assert series.between(date(2023, 6, 1), date(2024, 2, 29)) == [(date(2024, 1, 1), 1.0), (date(2024, 2, 29), 2.0)]
+    assert series.between(date(2024, 3, 2), date(2024, 12, 30)) == []
+    with pytest.raises(ValueError):
+        series.set(date(2025, 1, 1), 5.0)
+
+def test_nearest_points_by_binary_search():
+    series = SnapshotSeries("user1", 2024)
+    for day, value in [(date(2024, 1, 5), 1.0), (date(2024, 3, 1), 2.0), (date(2024, 12, 30), 3.0)]:
+        series.set(day, value)
+
+    assert series.at_or_before(date(2024, 3, 1)) == (date(2024, 3, 1), 2.0)
+    assert series.at_or_before(date(2024, 2, 29)) == (date(2024, 1, 5), 1.0)
+    assert series.at_or_before(date(2024, 1, 4)) is None
+    # Days in other years clip to this one
+    assert series.at_or_before(date(2025, 6, 1)) == (date(2024, 12, 30), 3.0)
+    assert series.at_or_before(date(2023, 12, 31)) is None
+    assert series.at_or_after(date(2024, 1, 6)) == (date(2024, 3, 1), 2.0)
+    assert series.at_or_after(date(2023, 6, 1)) == (date(2024, 1, 5), 1.0)
+    assert series.at_or_after(date(2024, 12, 31)) is None
+    assert SnapshotSeries("user2", 2024).at_or_before(date(2024, 6, 1)) is None
+
+def test_document_round_trip_is_packed():
+    series = SnapshotSeries("user1", 2025)
+    for offset in range(365):
+        series.set(date(2025, 1, 1) + timedelta(days=offset), 100000.0 + offset * 0.01)
+
+    doc = series.to_doc()
+    assert isinstance(doc["days"], bytes) and isinstance(doc["values"], bytes)
+    assert len(doc["days"]) + len(doc["values"]) == 365 * 10
+    restored = SnapshotSeries.from_doc(doc)
+    assert restored.between(date(2025, 1, 1), date(2025, 12, 31)) == series.between(date(2025, 1, 1), date(2025, 12, 31))
+
+def seeded_series(points):
+    db = FakeFirestore()
+    by_key = {}
+    for user_id, day, value in points:
+        by_key.setdefault((user_id, day.year), SnapshotSeries(user_id, day.year)).set(day, value)
+    for (user_id, year), series in by_key.items():
+        series_ref(db, user_id, year).set(series.to_doc())
+    db.ops.clear()
+    return db
+
+def test_values_on_and_between_read_one_document_per_user_per_year():
+    db = seeded_series([
+        ("a", date(2024, 12, 30), 1.0), ("a", date(2024, 12, 31), 2.0), ("a", date(2025, 1, 2), 3.0),
+        ("b", date(2025, 1, 2), 10.0)
+    ])
+
+    assert values_on(db, ["a", "b", "c"], date(2025, 1, 2)) == {"a": 3.0, "b": 10.0}
+    assert db.ops["read"] == 3
+    assert db.ops["round_trip"] == 1
+
+    db.ops.clear()
+    points = values_between(db, ["a", "b"], date(2024, 12, 31), date(2025, 1, 31))
+    assert points == {
+        "a": [(date(2024, 12, 31), 2.0), (date(2025, 1, 2), 3.0)],
+        "b": [(date(2025, 1, 2), 10.0)]
+    }
+    # 2 users x 2 years, one get_all
+    assert db.ops["read"] == 4
+    assert db.ops["round_trip"] == 1
+
+def test_load_series_returns_empty_series_for_missing_documents():
+    series = load_series(FakeFirestore(), ["a"], [2025])
+    assert len(series[("a", 2025)]) == 0
+
+@pytest.mark.anyio
+async def test_migration_merges_legacy_snapshots_and_is_rerunnable():
+    db = FakeFirestore()
+    legacy = {}
+    for user_id in ["u1", "u2", "u3"]:
+        for day in [date(2024, 12, 31), date(2025, 1, 1), date(2025, 1, 2)]:
+            value = float(day.toordinal() % 1000) + len(user_id)
+            legacy[(user_id, day)] = value
+            db.collection("portfolio_snapshots").document(f"{user_id}_{day.isoformat()}").set({
+                "user_id": user_id, "date": day.isoformat(), "total_value": value, "timestamp": day.isoformat() + "T00:00:00Z"
+            })
+    db.collection("portfolio_snapshots").document("broken").set({"user_id": "u1"})
+    # A value written to the series after the cutover wins over the legacy one
+    newer = SnapshotSeries("u1", 2025)
+    newer.set(date(2025, 1, 2), 999.0)
+    series_ref(db, "u1", 2025).set(newer.to_doc())
+
+    with patch("builtins.print"):
+        stats = await migrate(db, group_users=2, delete=True)
+
+    assert stats["snapshots"] == 9
+    assert stats["invalid"] == 1
+    assert stats["series"] == 6
+    assert stats["deleted"] == 9
+    assert list(db.data["portfolio_snapshots"]) == ["broken"]
+    for (user_id, day), value in legacy.items():
+        expected = 999.0 if (user_id, day) == ("u1", date(2025, 1, 2)) else value
+        assert values_on(db, [user_id], day) == {user_id: expected}
+
+    with patch("builtins.print"):
+        again = await migrate(db, group_users=2)
+    assert again["snapshots"] == 0
+    assert values_on(db, ["u2"], date(2024, 12, 31)) == {"u2": legacy[("u2", date(2024, 12, 31))]}
@@ -0,0 +1,93 @@
+import time
+import pytest
+import sys
+import os
+from fastapi import HTTPException
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import symbols
+from app.services.symbols import SymbolUniverse
+from app.core.config import settings
+
+LISTING = [
+    ("AAPL", "Apple Inc", "XNAS", "Common Stock"),
+    ("AAP", "Advance Auto Parts Inc", "XNYS", "Common Stock"),
+    ("AA", "Alcoa Corp", "XNYS", "Common Stock"),
+    ("MSFT", "Microsoft Corp", "XNAS", "Common Stock"),
+    ("BAC", "Bank of America Corp", "XNYS", "Common Stock"),
+    ("SPY", "SPDR S&P 500 ETF Trust", "ARCX", "ETP"),
+    ("BRK.B", "Berkshire Hathaway Inc", "XNYS", "Common Stock")
+]
+
+@pytest.fixture
+def universe():
+    return SymbolUniverse(LISTING)
+
+def test_ticker_prefix_puts_exact_match_first(universe):
+    assert [info.symbol for info in universe.search("aap")][:2] == ["AAP", "AAPL"]
+    assert [info.symbol for info in universe.search("AA", limit=2)] == ["AA", "AAP"]
+
+def test_name_word_prefix(universe):
+    assert [info.symbol for info in universe.search("micro")] == ["MSFT"]
+    assert [info.symbol for info in universe.search("bank")] == ["BAC"]
+
+def test_fuzzy_match_within_one_typo(universe):
+    # transposition, substitution and a missing letter
+    assert "AAPL" in [info.symbol for info in universe.search("APPL")]
+    assert "MSFT" in [info.symbol for info in universe.search("MSFY")]
+    assert "MSFT" in [info.symbol for info in universe.search("MST")]
+
+def test_membership_is_case_insensitive(universe):
+    assert "brk.b" in universe
+    assert "NOPE" not in universe
+    assert universe.get("spy").type == "ETP"
+
+def test_load_from_csv(tmp_path):
+    path = tmp_path / "symbols.csv"
+    path.write_text("symbol,name,exchange,type\nAAPL,Apple Inc,XNAS,Common Stock\n")
+
+    loaded = symbols.load_symbol_universe(str(path))
+    try:
+        assert len(loaded) == 1
+        assert symbols.search_symbols("apple")[0].symbol == "AAPL"
+    finally:
+        symbols.symbol_universe = None
+
+def test_validation_is_off_without_a_listing(tmp_path, caplog):
+    assert symbols.load_symbol_universe(str(tmp_path / "missing.csv")) is None
+    assert "Symbol search and validation are disabled" in caplog.text
+    symbols.ensure_known_symbol("ANYTHING")
+    assert symbols.search_symbols("A") == []
+
+def test_unknown_symbol_is_rejected(universe):
+    with patch.object(symbols, "symbol_universe", universe):
+        symbols.ensure_known_symbol("AAPL")
+        with pytest.raises(HTTPException) as exc:
+            symbols.ensure_known_symbol("NOPE")
+    assert exc.value.status_code == 404
+
+def test_search_is_sub_millisecond_on_a_large_listing():
+    import random
+    import string
+    rng = random.Random(0)
+    rows = set()
+    while len(rows) < 30000:
+        ticker = "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(1, 5)))
+        rows.add((ticker, f"{ticker.title()} Holdings Inc", "XNYS", "Common Stock"))
+    universe = SymbolUniverse(rows)
+
+    queries = ["A", "QX", "HOLD", "ZZZZQ", "ABCD"]
+    start = time.perf_counter()
+    for _ in range(200):
+        for query in queries:
+            universe.search(query, 10)
+    assert (time.perf_counter() - start) / (200 * len(queries)) < 0.001
+
+def test_default_listing_is_not_in_an_excluded_directory():
+    # data/ is left out of deploys (.gcloudignore), so a listing there never ships
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(backend, ".gcloudignore")) as f:
+        ignored = {line.strip().rstrip("/") for line in f if line.strip() and not line.startswith("#")}
+    assert settings.SYMBOL_UNIVERSE_FILE.split("/")[0] not in ignored
@@ -65,3 +65,48 @@ def test_validate_and_calculate_sell_insufficient_holdings():
     
     assert exc.value.status_code == 400
     assert "Insufficient holdings" in exc.value.detail
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.mark.anyio
+async def test_execute_trade_rejects_unknown_symbol_before_quoting():
+    from unittest.mock import AsyncMock, MagicMock, patch
+    from app.models.trade import TradeRequest
+    from app.services import symbols, trading
+
+    universe = symbols.SymbolUniverse([("AAPL", "Apple Inc", "XNAS", "Common Stock")])
+    db = MagicMock()
+
+    with patch.object(symbols, "symbol_universe", universe), \
+         patch("app.services.trading.get_real_time_quote", new_callable=AsyncMock) as mock_quote:
+        with pytest.raises(HTTPException) as exc:
+            await trading.execute_trade("user1", TradeRequest(symbol="NOPE", quantity=1, type="BUY"), db)
+
+    assert exc.value.status_code == 404
+    mock_quote.assert_not_called()
+    db.transaction.assert_not_called()
+
+@pytest.mark.anyio
+async def test_execute_trade_reports_opened_and_closed_positions_to_the_price_stream():
+    from unittest.mock import AsyncMock, MagicMock, patch
+    from app.models.market import StockQuote
+    from app.models.trade import TradeRequest
+    from app.services import trading
+
+    quote = StockQuote(symbol="AAPL", price=100.0, change=0.0, percent_change=0.0)
+    trades = [
+        ("BUY", 5, [{"symbol": "AAPL", "quantity": 5}]),
+        ("BUY", 5, [{"symbol": "AAPL", "quantity": 10}]),
+        ("SELL", 4, [{"symbol": "AAPL", "quantity": 6}]),
+        ("SELL", 6, [])
+    ]
+    with patch("app.services.trading.get_real_time_quote", AsyncMock(return_value=quote)), \
+         patch("app.services.trading.price_stream.holding_changed") as mock_changed:
+        for trade_type, quantity, holdings in trades:
+            with patch("app.services.trading.update_in_transaction", return_value=(500.0, {"holdings": holdings})):
+                await trading.execute_trade("user1", TradeRequest(symbol="AAPL", quantity=quantity, type=trade_type), MagicMock())
+
+    # Only the first buy opens the position and only the last sell closes it
+    assert [call.args for call in mock_changed.call_args_list] == [("AAPL", 1), ("AAPL", -1)]
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.upstream_scheduler import UpstreamScheduler, Priority
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.mark.anyio
+async def test_burst_is_granted_immediately():
+    scheduler = UpstreamScheduler(rate_per_minute=60, burst=5)
+
+    for _ in range(5):
+        await asyncio.wait_for(scheduler.acquire(Priority.INTERACTIVE), timeout=0.05)
+
+    assert scheduler.stats()["lanes"]["interactive"]["granted"] == 5
+
+@pytest.mark.anyio
+async def test_waiters_refill_at_configured_rate():
+    # 6000/min = 100 tokens per second
+    scheduler = UpstreamScheduler(rate_per_minute=6000, burst=1)
+    await scheduler.acquire()
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(scheduler.acquire() for _ in range(5)))
+    elapsed = loop.time() - start
+
+    assert elapsed >= 0.04
+    assert scheduler.stats()["lanes"]["interactive"]["max_wait_ms"] > 0
+
+@pytest.mark.anyio
+async def test_trade_lane_is_served_before_batch():
+    scheduler = UpstreamScheduler(rate_per_minute=6000, burst=1)
+    await scheduler.acquire(Priority.TRADE)  # drain the bucket
+
+    order = []
+
+    async def call(priority, label):
+        await scheduler.acquire(priority)
+        order.append(label)
+
+    batch_tasks = [asyncio.ensure_future(call(Priority.BATCH, f"batch{i}")) for i in range(3)]
+    await asyncio.sleep(0)
+    assert scheduler.stats()["lanes"]["batch"]["queue_depth"] == 3
+
+    trade_task = asyncio.ensure_future(call(Priority.TRADE, "trade"))
+    interactive_task = asyncio.ensure_future(call(Priority.INTERACTIVE, "ui"))
+    await asyncio.gather(trade_task, interactive_task, *batch_tasks)
+
+    assert order[:2] == ["trade", "ui"]
+
+@pytest.mark.anyio
+async def test_batch_cannot_consume_reserved_tokens():
+    scheduler = UpstreamScheduler(rate_per_minute=60, burst=5, batch_reserve=2)
+
+    for _ in range(3):
+        await asyncio.wait_for(scheduler.acquire(Priority.BATCH), timeout=0.05)
+
+    blocked = asyncio.ensure_future(scheduler.acquire(Priority.BATCH))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    # Trades still have the reserved tokens available
+    await asyncio.wait_for(scheduler.acquire(Priority.TRADE), timeout=0.05)
+    await asyncio.wait_for(scheduler.acquire(Priority.TRADE), timeout=0.05)
+
+    blocked.cancel()
+    await asyncio.sleep(0)
+    assert scheduler.stats()["lanes"]["batch"]["queue_depth"] == 0
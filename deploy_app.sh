@@ -42,19 +42,36 @@ echo "========================================================"
 
 gcloud config set project $PROJECT_ID
 
+# Composite indexes the backend's queries need (mirrors firestore.indexes.json)
+echo "[Firestore] Ensuring composite indexes..."
+# GET /api/v1/leaderboard/{window}/me: window == and user_ids array-contains
+gcloud firestore indexes composite create \
+    --database=$FIRESTORE_DATABASE \
+    --collection-group=leaderboard_pages \
+    --query-scope=COLLECTION \
+    --field-config=field-path=window,order=ascending \
+    --field-config=field-path=user_ids,array-config=contains \
+    --async 2>/dev/null || echo "  - leaderboard_pages index already exists."
+
 # Backend Deployment
 if [ "$DEPLOY_BACKEND" = true ]; then
     echo "[Backend] Building and Deploying..."
-    cd backend
-    
-    echo "  - Submitting Build..."
-    gcloud builds submit --tag $BACKEND_IMAGE
 
     # Load API Key from .env
     if [ -f backend/.env ]; then
         export $(grep FINNHUB_API_KEY backend/.env | xargs)
     fi
 
+    # The symbol listing is generated rather than committed; without it the
+    # backend cannot validate symbols
+    echo "  - Fetching symbol listing..."
+    python3 scripts/fetch_symbol_universe.py --exchange US
+
+    cd backend
+    
+    echo "  - Submitting Build..."
+    gcloud builds submit --tag $BACKEND_IMAGE
+
     echo "  - Deploying to Cloud Run..."
     gcloud run deploy $BACKEND_SERVICE_NAME \
         --image $BACKEND_IMAGE \
@@ -36,12 +36,69 @@ export const getQuote = async (symbol) => {
     return response.data
 }
 
-export const getHistory = async (symbol, resolution, limit) => {
+export const getQuotes = async (symbols) => {
+    const token = localStorage.getItem('token')
+    const response = await axios.get(`${API_URL}/market/quotes`, {
+        params: { symbols: symbols.join(',') },
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    })
+    return response.data
+}
+
+// Subscribes to server-pushed price updates. Resolves to a handle; call close() to stop.
+// The stream is opened with a short-lived ticket rather than the access token, which
+// would end up in URLs and logs; reconnects fetch a fresh ticket.
+export const streamQuotes = async (symbols, onQuote) => {
+    let source = null
+    let closed = false
+
+    const open = async () => {
+        const token = localStorage.getItem('token')
+        const response = await axios.post(`${API_URL}/market/stream/ticket`, null, {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        })
+        if (closed) return
+        const params = new URLSearchParams({ symbols: symbols.join(','), ticket: response.data.ticket })
+        source = new EventSource(`${API_URL}/market/stream?${params}`)
+        source.addEventListener('quote', (event) => onQuote(JSON.parse(event.data)))
+        source.onerror = () => {
+            // The ticket in the URL has likely expired: reconnect with a new one
+            source.close()
+            if (!closed) setTimeout(() => open().catch(console.error), 1000)
+        }
+    }
+
+    await open()
+    return {
+        close: () => {
+            closed = true
+            if (source) source.close()
+        }
+    }
+}
+
+export const getHistory = async (symbol, resolution, limit, indicators = undefined) => {
     const token = localStorage.getItem('token')
     console.log(`[getHistory] Fetching history for ${symbol}. Token present: ${!!token}`)
 
     const response = await axios.get(`${API_URL}/market/history/${symbol}`, {
-        params: { resolution, limit },
+        params: { resolution, limit, indicators },
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    })
+    return response.data
+}
+
+// Several series aligned on one time axis: { t: [...], series: { SYM: { close: [...] } }, errors }
+export const getAlignedHistory = async (symbols, resolution, limit, fields = ['close'], points = undefined) => {
+    const token = localStorage.getItem('token')
+    const response = await axios.get(`${API_URL}/market/history`, {
+        params: { symbols: symbols.join(','), resolution, limit, fields: fields.join(','), points },
         headers: {
             'Authorization': `Bearer ${token}`
         }
@@ -68,3 +125,14 @@ export const getLeaderboard = async (window) => {
     })
     return response.data
 }
+
+export const searchSymbols = async (q, limit = 10) => {
+    const token = localStorage.getItem('token')
+    const response = await axios.get(`${API_URL}/market/symbols`, {
+        params: { q, limit },
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    })
+    return response.data
+}
@@ -0,0 +1,110 @@
+"""
+Benchmark for the portfolio evaluation run at increasing user counts.
+
+Seeds an in-memory Firestore stand-in with synthetic users holding a few of
+500 symbols, and counts quote lookups that reach the quote layer (the
+in-process quote cache is bypassed). Each lookup costs --latency seconds,
+--concurrency at a time, like the batched upstream fetch, and each Firestore
+round trip costs --rpc-latency seconds:
+
+    python scripts/bench_evaluation.py --users 1000 10000 100000
+
+The previous per-portfolio flow (value, then re-read and re-price for the
+snapshot) is run as a baseline up to --legacy-max users.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+# In-memory Firestore stand-in, kept with the backend tests
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'tests'))
+
+from app.models.market import StockQuote, StockQuoteBatch
+from app.services import evaluation
+from firestore_stub import FakeFirestore
+
+SYMBOLS = [f"SYM{i:03d}" for i in range(500)]
+
+
+def seed(users: int, rpc_latency: float = 0.0) -> FakeFirestore:
+    rng = random.Random(users)
+    db = FakeFirestore()
+    for i in range(users):
+        user_id = f"user{i}"
+        db.collection("users").document(user_id).set({"username": user_id})
+        # Popular symbols are held by many users
+        held = {rng.choice(SYMBOLS[:50]) if rng.random() < 0.7 else rng.choice(SYMBOLS) for _ in range(rng.randint(1, 8))}
+        db.collection("portfolios").document(user_id).set({
+            "user_id": user_id,
+            "cash_balance": 10000.0,
+            "holdings": [{"symbol": s, "quantity": rng.randint(1, 50), "average_price": 100.0} for s in sorted(held)]
+        })
+    db.ops.clear()
+    db.latency = rpc_latency
+    return db
+
+
+class CountingQuotes:
+    def __init__(self, latency: float, concurrency: int):
+        self.latency = latency
+        self.concurrency = concurrency
+        self.calls = 0
+
+    async def __call__(self, symbols, **kwargs):
+        symbols = list(dict.fromkeys(symbols))
+        self.calls += len(symbols)
+        # Concurrent fetches complete in waves of `concurrency`
+        await asyncio.sleep(self.latency * -(-len(symbols) // self.concurrency))
+        return StockQuoteBatch(
+            quotes={s: StockQuote(symbol=s, price=100.0 + int(s[3:]), change=0.0, percent_change=0.0) for s in symbols},
+            errors={}
+        )
+
+
+async def legacy_run(db):
+    """
+    The per-portfolio flow this run replaced.
+    """
+    for user_doc in db.collection("users").stream():
+        portfolio_ref = db.collection("portfolios").document(user_doc.id)
+        portfolio = portfolio_ref.get().to_dict()
+        prices = await evaluation.fetch_price_table(h["symbol"] for h in portfolio["holdings"])
+        portfolio_ref.update({"total_value": round(evaluation.portfolio_value(portfolio, prices), 2)})
+        await evaluation.snapshot_portfolio(db, user_doc.id)
+
+
+async def measure(users: int, run, latency: float, concurrency: int, rpc_latency: float):
+    db = seed(users, rpc_latency)
+    quotes = CountingQuotes(latency, concurrency)
+    with patch.object(evaluation, "get_real_time_quotes", quotes), patch("builtins.print"):
+        start = time.perf_counter()
+        await run(db)
+        elapsed = time.perf_counter() - start
+    return quotes.calls, elapsed, db.ops
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rpc-latency", type=float, default=0.0)
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    args = parser.parse_args()
+
+    for users in args.users:
+        runs = [("price table", evaluation.update_all_portfolios_total_value)]
+        if users <= args.legacy_max:
+            runs.insert(0, ("per-portfolio", legacy_run))
+        for name, run in runs:
+            calls, elapsed, ops = asyncio.run(measure(users, run, args.latency, args.concurrency, args.rpc_latency))
+            print(
+                f"users={users:>6} {name:<13} quote_lookups={calls:>7} wall={elapsed:7.2f}s "
+                f"reads={ops['read']:>6} writes={ops['write']:>6} round_trips={ops['round_trip']:>6}"
+            )
@@ -0,0 +1,67 @@
+"""
+Benchmark for hedged quote fetching against providers with a long latency tail.
+
+Both stand-in providers usually answer in ~20ms but take ~500ms for a small
+fraction of calls. Reports latency percentiles and the extra upstream calls
+with and without hedging:
+
+    python scripts/bench_hedged_quotes.py --requests 2000 --tail 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.services.quote_hedging import HedgedQuoteFetcher
+
+
+class TailLatencyProvider:
+    def __init__(self, name: str, tail: float):
+        self.name = name
+        self.tail = tail
+        self.calls = 0
+
+    async def fetch(self, symbol: str) -> str:
+        self.calls += 1
+        slow = random.random() < self.tail
+        await asyncio.sleep(random.uniform(0.4, 0.6) if slow else random.uniform(0.015, 0.025))
+        return symbol
+
+
+async def run(requests: int, tail: float, hedge: bool, concurrency: int):
+    providers = [TailLatencyProvider("primary", tail), TailLatencyProvider("secondary", tail)]
+    fetcher = HedgedQuoteFetcher(providers, hedge_percentile=95, min_delay=0.02, max_delay=0.2, min_samples=50)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await fetcher.fetch(lambda provider: provider.fetch(f"SYM{i}"), hedge=hedge)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    latencies.sort()
+    p = lambda q: latencies[int(q * (len(latencies) - 1))] * 1000
+    calls = sum(provider.calls for provider in providers)
+    print(
+        f"hedge={'on ' if hedge else 'off'} p50={p(0.5):6.1f}ms p99={p(0.99):6.1f}ms "
+        f"max={latencies[-1] * 1000:6.1f}ms upstream_calls={calls} (+{(calls / requests - 1) * 100:.1f}%)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--tail", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    for hedge in (False, True):
+        random.seed(1)
+        asyncio.run(run(args.requests, args.tail, hedge, args.concurrency))
@@ -0,0 +1,135 @@
+"""
+Benchmark for leaderboard generation at increasing user counts.
+
+Seeds an in-memory Firestore stand-in with synthetic users and the portfolio
+snapshots the 1d/7d/30d/90d windows compare (in both the legacy per-day and
+the series layout), then counts document reads and client round trips (each
+get, get_all, stream, set, update or batch commit is one):
+
+    python scripts/bench_leaderboards.py --users 1000 10000 100000
+
+The previous flow (two document gets per user per window) is run as a
+baseline up to --legacy-max users. The incremental run rebuilds the
+leaderboards, changes today's value for --changed of the users, and measures
+the update that follows.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+# In-memory Firestore stand-in, kept with the backend tests
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'tests'))
+
+from app.models.leaderboard import Leaderboard, LeaderboardEntry
+from app.services import evaluation
+from app.services.snapshot_series import SnapshotSeries, series_ref
+from firestore_stub import FakeFirestore
+
+WINDOWS = {"1d": 1, "7d": 7, "30d": 30, "90d": 90}
+
+
+def seed(users: int) -> FakeFirestore:
+    rng = random.Random(users)
+    db = FakeFirestore()
+    today = date.today()
+    seeded_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    for i in range(users):
+        user_id = f"user{i}"
+        db.collection("users").document(user_id).set({"username": user_id})
+        series = {}
+        for days in [0, *WINDOWS.values()]:
+            # Newer users have no snapshot for the longer windows
+            if rng.random() < 0.9:
+                snapshot_day = today - timedelta(days=days)
+                value = rng.uniform(5000.0, 20000.0)
+                db.collection("portfolio_snapshots").document(f"{user_id}_{snapshot_day.isoformat()}").set({
+                    "user_id": user_id,
+                    "date": snapshot_day.isoformat(),
+                    "total_value": value
+                })
+                series.setdefault(snapshot_day.year, SnapshotSeries(user_id, snapshot_day.year)).set(snapshot_day, value)
+        for year, user_series in series.items():
+            # Written well before any leaderboard update the benchmark runs
+            series_ref(db, user_id, year).set({**user_series.to_doc(), "updated_at": seeded_at})
+    db.ops.clear()
+    return db
+
+
+async def legacy_run(db):
+    """
+    The per-document flow bulk reads replaced.
+    """
+    users = list(db.collection("users").stream())
+    today = date.today()
+    for window_name, days in WINDOWS.items():
+        start_date_str = (today - timedelta(days=days)).isoformat()
+        entries = []
+        for user_doc in users:
+            today_snap = db.collection("portfolio_snapshots").document(f"{user_doc.id}_{today.isoformat()}").get()
+            start_snap = db.collection("portfolio_snapshots").document(f"{user_doc.id}_{start_date_str}").get()
+            if today_snap.exists and start_snap.exists:
+                ppg = evaluation.calculate_ppg(today_snap.to_dict()["total_value"], start_snap.to_dict()["total_value"])
+                entries.append(LeaderboardEntry(user_id=user_doc.id, username=user_doc.id, ppg=round(ppg, 2), rank=0))
+        entries.sort(key=lambda x: x.ppg, reverse=True)
+        for i, entry in enumerate(entries):
+            entry.rank = i + 1
+        leaderboard = Leaderboard(id=window_name, updated_at=datetime.now(timezone.utc), entries=entries)
+        db.collection("leaderboards").document(window_name).set(leaderboard.model_dump())
+
+
+async def full_rebuild(db):
+    await evaluation.generate_leaderboards(db, incremental=False)
+
+
+def incremental_setup(changed: float):
+    def setup(db):
+        asyncio.run(full_rebuild(db))
+        rng = random.Random(len(db.data["users"]))
+        today = date.today()
+        user_ids = sorted(db.data["users"])
+        for user_id in rng.sample(user_ids, max(1, int(len(user_ids) * changed))):
+            user_series = SnapshotSeries(user_id, today.year)
+            user_series.set(today, rng.uniform(5000.0, 20000.0))
+            series_ref(db, user_id, today.year).set(user_series.to_doc())
+    return setup
+
+
+def measure(users: int, run, setup=None):
+    db = seed(users)
+    with patch("builtins.print"):
+        if setup:
+            setup(db)
+            db.ops.clear()
+        start = time.perf_counter()
+        asyncio.run(run(db))
+        elapsed = time.perf_counter() - start
+    return elapsed, db.ops
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    parser.add_argument("--changed", type=float, default=0.01, help="Share of users changed before the incremental run")
+    args = parser.parse_args()
+
+    for users in args.users:
+        runs = [
+            ("full rebuild", full_rebuild, None),
+            ("incremental", evaluation.generate_leaderboards, incremental_setup(args.changed))
+        ]
+        if users <= args.legacy_max:
+            runs.insert(0, ("per-document", legacy_run, None))
+        for name, run, setup in runs:
+            elapsed, ops = measure(users, run, setup)
+            print(
+                f"users={users:>6} {name:<12} wall={elapsed:7.2f}s "
+                f"reads={ops['read']:>7} writes={ops['write']:>7} round_trips={ops['round_trip']:>7}"
+            )
@@ -0,0 +1,82 @@
+"""
+Benchmarks get_real_time_quote latency in polling mode (every quote goes to the
+REST API) versus streaming mode (quotes served from the in-memory price table
+fed by the trade WebSocket).
+
+Both upstreams are local stand-ins with simulated network latency:
+
+    python scripts/bench_price_stream.py --quotes 2000 --rest-latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from collections import Counter
+from app.core.config import settings
+from app.services import market_data, price_stream
+from app.services.upstream_scheduler import UpstreamScheduler
+from finnhub_stub import FinnhubStub
+from finnhub_ws_stub import FinnhubWsStub
+
+SYMBOLS = ["AAPL", "MSFT", "GOOG", "AMZN", "NVDA", "META", "TSLA", "JPM"]
+
+
+async def measure(label: str, quotes: int, stub: FinnhubStub):
+    stub.reset_counters()
+    latencies = []
+    for i in range(quotes):
+        start = time.perf_counter()
+        await market_data.get_real_time_quote(SYMBOLS[i % len(SYMBOLS)])
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(
+        f"{label:<10} quotes={quotes:<6} "
+        f"mean={statistics.mean(latencies) * 1000:7.3f}ms "
+        f"p50={statistics.median(latencies) * 1000:7.3f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:7.3f}ms "
+        f"upstream_requests={stub.requests_served}"
+    )
+
+
+async def main(quotes: int, rest_latency: float):
+    settings.FINNHUB_API_KEY = "bench-key"
+    settings.PRICE_STREAM_MAX_AGE = 60.0
+    # The benchmark measures latency, not the Finnhub call budget
+    market_data.upstream_scheduler = UpstreamScheduler(rate_per_minute=10 ** 9, burst=10 ** 6)
+    # Disable the quote cache so polling mode always goes upstream
+    market_data.quote_cache.ttl = 0
+
+    async with FinnhubStub(latency=rest_latency) as rest_stub, FinnhubWsStub(interval=0.05) as ws_stub:
+        settings.FINNHUB_BASE_URL = rest_stub.base_url
+        market_data.set_http_client(market_data.create_http_client())
+        try:
+            await measure("polling", quotes, rest_stub)
+
+            ingestor = price_stream.PriceStreamIngestor(
+                ws_stub.url, price_stream.price_table,
+                load_symbols=lambda: Counter(SYMBOLS)
+            )
+            price_stream.ingestor = ingestor
+            ingestor.start()
+            while len(price_stream.price_table) < len(SYMBOLS):
+                await asyncio.sleep(0.01)
+
+            await measure("streaming", quotes, rest_stub)
+            await price_stream.stop_price_stream()
+        finally:
+            await market_data.close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quotes", type=int, default=2000)
+    parser.add_argument("--rest-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.quotes, args.rest_latency))
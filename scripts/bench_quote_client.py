@@ -0,0 +1,88 @@
+"""
+Benchmarks per-quote latency and upstream connections for get_real_time_quote,
+comparing a fresh AsyncClient per quote (the old behaviour) with the shared,
+pooled client created in the app lifespan.
+
+Runs against a local Finnhub stand-in, so no API key or network is needed:
+
+    python scripts/bench_quote_client.py --quotes 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import httpx
+from app.core.config import settings
+from app.services import market_data
+from app.services.upstream_scheduler import UpstreamScheduler
+from finnhub_stub import FinnhubStub
+
+SYMBOLS = ["AAPL", "MSFT", "GOOG", "AMZN", "NVDA", "META", "TSLA", "JPM"]
+
+
+async def fresh_client_quote(symbol: str):
+    async with httpx.AsyncClient() as client:
+        return await market_data.get_real_time_quote(symbol, client=client)
+
+
+async def pooled_client_quote(symbol: str):
+    return await market_data.get_real_time_quote(symbol)
+
+
+async def run(label: str, fetch, stub: FinnhubStub, quotes: int, concurrency: int):
+    stub.reset_counters()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            # Distinct symbols so single-flight coalescing does not hide requests
+            await fetch(f"{SYMBOLS[i % len(SYMBOLS)]}{i}")
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(quotes)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{label:<14} quotes={quotes:<6} wall={wall:6.2f}s "
+        f"mean={statistics.mean(latencies) * 1000:6.2f}ms "
+        f"p50={statistics.median(latencies) * 1000:6.2f}ms "
+        f"p99={p99 * 1000:6.2f}ms "
+        f"connections_opened={stub.connections_opened}"
+    )
+
+
+async def main(quotes: int, concurrency: int):
+    async with FinnhubStub() as stub:
+        settings.FINNHUB_API_KEY = "bench-key"
+        settings.FINNHUB_BASE_URL = stub.base_url
+        # The benchmark measures connection reuse, not the Finnhub call budget
+        market_data.upstream_scheduler = UpstreamScheduler(rate_per_minute=10 ** 9, burst=10 ** 6)
+        # Every quote must reach the stand-in for connection counts to mean anything
+        market_data.quote_cache.ttl = 0
+
+        await run("fresh client", fresh_client_quote, stub, quotes, concurrency)
+
+        market_data.set_http_client(market_data.create_http_client())
+        try:
+            await run("pooled client", pooled_client_quote, stub, quotes, concurrency)
+        finally:
+            await market_data.close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quotes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.quotes, args.concurrency))
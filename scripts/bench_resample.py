@@ -0,0 +1,69 @@
+"""
+Benchmark for server-side resampling and LTTB downsampling of candle history.
+
+Builds five years of synthetic minute bars, then times resampling them to
+coarser resolutions and downsampling to a chart-sized point budget:
+
+    python scripts/bench_resample.py --years 5 --points 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+from app.services.history import resolution_seconds
+from app.services.resample import lttb_indices, resample_candles
+
+TRADING_MINUTES_PER_DAY = 390
+TRADING_DAYS_PER_YEAR = 252
+
+
+def minute_bars(years: int):
+    days = years * TRADING_DAYS_PER_YEAR
+    # 09:30 UTC-ish session on consecutive weekdays; exact calendar does not matter here
+    weekdays = np.arange(days * 7 // 5)
+    weekdays = weekdays[(weekdays + 3) % 7 < 5][:days]
+    t = (weekdays[:, None] * 86400 + 34200 + np.arange(TRADING_MINUTES_PER_DAY)[None, :] * 60).ravel()
+
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, len(t))))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    return {
+        "t": t.astype(np.int64),
+        "o": open_,
+        "h": np.maximum(open_, close) * 1.0005,
+        "l": np.minimum(open_, close) * 0.9995,
+        "c": close,
+        "v": rng.integers(100, 10000, len(t)).astype(np.float64)
+    }
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--points", type=int, default=1000)
+    args = parser.parse_args()
+
+    candles = minute_bars(args.years)
+    print(f"input: {len(candles['t'])} minute bars")
+
+    for resolution in ["5", "60", "240", "D", "W", "M"]:
+        seconds = resolution_seconds(resolution)
+        resampled, elapsed = timed(lambda: resample_candles(candles, resolution, seconds))
+        print(f"resample 1 -> {resolution:>3}: {len(resampled['t']):>7} bars in {elapsed * 1000:7.1f}ms")
+
+    indices, elapsed = timed(lambda: lttb_indices(candles["t"], candles["c"], args.points))
+    print(f"lttb {len(candles['t'])} -> {len(indices)} points in {elapsed * 1000:7.1f}ms")
@@ -0,0 +1,111 @@
+"""
+Benchmark of the compact snapshot series against one document per user per day.
+
+Seeds --days of daily snapshots for each user in the legacy layout, migrates
+them with scripts/migrate_snapshots.py, then counts documents stored and the
+reads and writes of common operations in both layouts:
+
+    python scripts/bench_snapshots.py --users 1000 10000 --days 365
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from datetime import date, timedelta
+from unittest.mock import patch
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+# In-memory Firestore stand-in, kept with the backend tests
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend', 'tests'))
+
+from app.db.firestore import get_documents
+from app.services.snapshot_series import SERIES_COLLECTION, load_series, values_between, series_ref
+from firestore_stub import FakeFirestore
+from migrate_snapshots import LEGACY_COLLECTION, migrate
+
+WINDOWS = [1, 7, 30, 90]
+
+
+def seed(users: int, days: int) -> FakeFirestore:
+    rng = random.Random(users)
+    db = FakeFirestore()
+    today = date.today()
+    for i in range(users):
+        user_id = f"user{i:06d}"
+        db.collection("users").document(user_id).set({"username": user_id})
+        value = 100000.0
+        for offset in range(days, -1, -1):
+            day = today - timedelta(days=offset)
+            value *= 1 + rng.gauss(0, 0.01)
+            db.collection(LEGACY_COLLECTION).document(f"{user_id}_{day.isoformat()}").set({
+                "user_id": user_id, "date": day.isoformat(), "total_value": round(value, 2), "timestamp": day
+            })
+    return db
+
+
+def measure(db, operation):
+    db.ops.clear()
+    operation()
+    return db.ops["read"], db.ops["write"], db.ops["round_trip"]
+
+
+def legacy_operations(db, user_ids, today):
+    window_ids = [f"{u}_{(today - timedelta(days=d)).isoformat()}" for u in user_ids for d in [0, *WINDOWS]]
+    range_ids = [f"{user_ids[0]}_{(today - timedelta(days=d)).isoformat()}" for d in range(91)]
+    tomorrow = today + timedelta(days=1)
+    return {
+        "leaderboard reads": lambda: get_documents(db, LEGACY_COLLECTION, window_ids),
+        "90-day range (1 user)": lambda: get_documents(db, LEGACY_COLLECTION, range_ids),
+        "daily snapshot write": lambda: daily_write(db, user_ids, tomorrow),
+    }
+
+
+def daily_write(db, user_ids, day):
+    # Evaluation checks for an existing snapshot before writing one
+    existing = get_documents(db, LEGACY_COLLECTION, [f"{u}_{day.isoformat()}" for u in user_ids])
+    for u in user_ids:
+        if f"{u}_{day.isoformat()}" not in existing:
+            db.collection(LEGACY_COLLECTION).document(f"{u}_{day.isoformat()}").set({"total_value": 1.0})
+
+
+def series_operations(db, user_ids, today):
+    years = {today.year, *((today - timedelta(days=d)).year for d in WINDOWS)}
+    tomorrow = today + timedelta(days=1)
+
+    def series_daily_write():
+        series = load_series(db, user_ids, [tomorrow.year])
+        for u in user_ids:
+            series[(u, tomorrow.year)].set(tomorrow, 1.0)
+            series_ref(db, u, tomorrow.year).set(series[(u, tomorrow.year)].to_doc())
+
+    return {
+        "leaderboard reads": lambda: load_series(db, user_ids, years),
+        "90-day range (1 user)": lambda: values_between(db, user_ids[:1], today - timedelta(days=90), today),
+        "daily snapshot write": series_daily_write,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    today = date.today()
+    for users in args.users:
+        db = seed(users, args.days)
+        user_ids = sorted(db.data["users"])
+        legacy_documents = len(db.data[LEGACY_COLLECTION])
+        legacy = {name: measure(db, op) for name, op in legacy_operations(db, user_ids, today).items()}
+        with patch("builtins.print"):
+            asyncio.run(migrate(db, delete=True))
+        series = {name: measure(db, op) for name, op in series_operations(db, user_ids, today).items()}
+
+        print(f"users={users} days={args.days}")
+        print(f"  documents stored         legacy={legacy_documents:>9}  series={len(db.data[SERIES_COLLECTION]):>9}")
+        for name in legacy:
+            (lr, lw, lt), (sr, sw, st) = legacy[name], series[name]
+            print(f"  {name:<24} legacy reads={lr:>7} writes={lw:>6} round_trips={lt:>6}  "
+                  f"series reads={sr:>7} writes={sw:>6} round_trips={st:>6}")
@@ -0,0 +1,65 @@
+"""
+Builds the symbol listing behind /market/symbols and local symbol validation.
+
+Downloads Finnhub's symbol list for an exchange and writes it as a
+symbol,name,exchange,type CSV (SYMBOL_UNIVERSE_FILE by default):
+
+    FINNHUB_API_KEY=... python scripts/fetch_symbol_universe.py --exchange US
+
+Pass --benchmark to time searches against the written listing.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import httpx
+from app.core.config import settings
+from app.services.symbols import LISTING_FIELDS, SymbolUniverse
+
+
+def fetch_listing(exchange: str):
+    response = httpx.get(
+        f"{settings.FINNHUB_BASE_URL}/stock/symbol",
+        params={"exchange": exchange, "token": settings.FINNHUB_API_KEY},
+        timeout=60.0
+    )
+    response.raise_for_status()
+    for row in response.json():
+        yield row.get("symbol", ""), row.get("description", ""), row.get("mic", exchange), row.get("type", "")
+
+
+def benchmark(path: str, queries):
+    universe = SymbolUniverse.from_csv(path)
+    rounds = 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            universe.search(query, 10)
+    per_query = (time.perf_counter() - start) / (rounds * len(queries))
+    print(f"{len(universe)} symbols, {per_query * 1e6:.1f}us per search")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--exchange", default="US")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), '..', 'backend', settings.SYMBOL_UNIVERSE_FILE))
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    rows = sorted(set(fetch_listing(args.exchange)))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    tmp_path = args.output + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(LISTING_FIELDS)
+        writer.writerows(rows)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {len(rows)} symbols to {args.output}")
+
+    if args.benchmark:
+        benchmark(args.output, ["A", "AAP", "APPL", "micro", "bank", "TSLA", "ZZZZ"])
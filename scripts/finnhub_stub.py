@@ -0,0 +1,97 @@
+"""
+Local stand-in for the Finnhub REST API, used by the benchmark scripts.
+
+It speaks just enough HTTP/1.1 (with keep-alive) to serve GET /quote and counts
+the TCP connections and requests it receives, so a benchmark can report how
+many connections the backend opened.
+"""
+import asyncio
+import json
+import random
+from urllib.parse import urlsplit, parse_qs
+
+
+class FinnhubStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.connections_opened = 0
+        self.requests_served = 0
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def reset_counters(self):
+        self.connections_opened = 0
+        self.requests_served = 0
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def quote_payload(self, symbol: str) -> dict:
+        price = round(100.0 + random.uniform(-5, 5), 2)
+        return {"c": price, "d": 0.5, "dp": 0.5, "h": price + 1, "l": price - 1, "o": price, "pc": price - 0.5}
+
+    def route(self, path: str, query: dict):
+        """
+        Returns (status, payload) for a request. Subclasses add endpoints.
+        """
+        if path.endswith("/quote"):
+            symbol = query.get("symbol", [""])[0]
+            return 200, self.quote_payload(symbol)
+        return 404, {"error": "not found"}
+
+    async def _handle_connection(self, reader, writer):
+        self.connections_opened += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "connection" and value.strip().lower() == "close":
+                        keep_alive = False
+
+                _, target, _ = request_line.decode("latin-1").split(" ", 2)
+                parts = urlsplit(target)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status_code, payload = self.route(parts.path, parse_qs(parts.query))
+                self.requests_served += 1
+
+                body = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status_code} OK\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,80 @@
+"""
+Local stand-in for the Finnhub trade WebSocket (wss://ws.finnhub.io), so the
+streaming ingestion mode can be exercised offline.
+
+Clients send {"type": "subscribe"|"unsubscribe", "symbol": ...}; the stub sends
+a {"type": "trade", "data": [...]} message for every subscribed symbol each
+interval, plus periodic pings like the real feed.
+"""
+import asyncio
+import json
+import random
+import time
+
+import websockets
+
+
+class FinnhubWsStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, interval: float = 0.1):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.subscribe_messages = 0
+        self.trades_sent = 0
+        self._prices = {}
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port)
+        self.port = list(self._server.sockets)[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def _next_price(self, symbol: str) -> float:
+        price = self._prices.get(symbol, 100.0) + random.uniform(-0.5, 0.5)
+        self._prices[symbol] = price
+        return round(price, 2)
+
+    async def _publish(self, websocket, symbols: set):
+        ticks = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            ticks += 1
+            if symbols:
+                now_ms = int(time.time() * 1000)
+                data = [{"s": s, "p": self._next_price(s), "t": now_ms, "v": 100} for s in sorted(symbols)]
+                await websocket.send(json.dumps({"type": "trade", "data": data}))
+                self.trades_sent += len(data)
+            if ticks % 50 == 0:
+                await websocket.send(json.dumps({"type": "ping"}))
+
+    async def _handle(self, websocket, path=None):
+        symbols = set()
+        publisher = asyncio.ensure_future(self._publish(websocket, symbols))
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message.get("type") == "subscribe":
+                    self.subscribe_messages += 1
+                    symbols.add(message["symbol"])
+                elif message.get("type") == "unsubscribe":
+                    symbols.discard(message["symbol"])
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            publisher.cancel()
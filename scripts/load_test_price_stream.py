@@ -0,0 +1,119 @@
+"""
+Load test for the server-push price stream with thousands of simulated subscribers.
+
+In-process mode (default) drives the shared PriceBroadcaster directly against a
+local Finnhub stand-in and reports upstream requests and fan-out latency:
+
+    python scripts/load_test_price_stream.py --subscribers 5000 --seconds 5
+
+HTTP mode opens real SSE connections against a running backend:
+
+    python scripts/load_test_price_stream.py --url http://localhost:8000 --token <jwt> --subscribers 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import httpx
+from app.core.config import settings
+from app.services import market_data
+from app.services.price_broadcast import PriceBroadcaster
+from app.services.upstream_scheduler import UpstreamScheduler
+from finnhub_stub import FinnhubStub
+
+SYMBOLS = ["AAPL", "MSFT", "GOOG", "AMZN", "NVDA", "META", "TSLA", "JPM"]
+
+
+def random_symbols():
+    return random.sample(SYMBOLS, random.randint(1, 3))
+
+
+async def in_process(subscribers: int, seconds: float, interval: float):
+    async with FinnhubStub() as stub:
+        settings.FINNHUB_API_KEY = "bench-key"
+        settings.FINNHUB_BASE_URL = stub.base_url
+        market_data.upstream_scheduler = UpstreamScheduler(rate_per_minute=10 ** 9, burst=10 ** 6)
+        market_data.quote_cache.ttl = 0
+        market_data.set_http_client(market_data.create_http_client())
+
+        broadcaster = PriceBroadcaster(market_data.get_real_time_quotes, interval=interval, max_connections=subscribers)
+        latencies = []
+        received = 0
+
+        async def subscriber():
+            nonlocal received
+            subscription = broadcaster.subscribe(random_symbols())
+            deadline = time.perf_counter() + seconds
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    quotes = await subscription.next_batch(timeout=interval * 2)
+                    if quotes:
+                        latencies.append(time.perf_counter() - start)
+                        received += len(quotes)
+            finally:
+                broadcaster.unsubscribe(subscription)
+
+        try:
+            await asyncio.gather(*(subscriber() for _ in range(subscribers)))
+        finally:
+            await broadcaster.stop()
+            await market_data.close_http_client()
+
+        stats = broadcaster.stats()
+        print(
+            f"subscribers={subscribers} seconds={seconds} polls={stats['polls']} "
+            f"upstream_requests={stub.requests_served} updates_delivered={received} "
+            f"wait_p50={statistics.median(latencies) * 1000:.1f}ms"
+        )
+
+
+async def over_http(url: str, token: str, subscribers: int, seconds: float):
+    events = 0
+    failures = 0
+    limits = httpx.Limits(max_connections=subscribers)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=None) as client:
+        async def subscriber():
+            nonlocal events, failures
+            params = {"symbols": ",".join(random_symbols()), "token": token}
+            try:
+                async with client.stream("GET", "/api/v1/market/stream", params=params) as response:
+                    if response.status_code != 200:
+                        failures += 1
+                        return
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: quote"):
+                            events += 1
+            except httpx.HTTPError:
+                failures += 1
+
+        tasks = [asyncio.ensure_future(subscriber()) for _ in range(subscribers)]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"subscribers={subscribers} seconds={seconds} events={events} failed_connections={failures}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--url")
+    parser.add_argument("--token")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(over_http(args.url, args.token, args.subscribers, args.seconds))
+    else:
+        asyncio.run(in_process(args.subscribers, args.seconds, args.interval))
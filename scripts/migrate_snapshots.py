@@ -0,0 +1,105 @@
+"""
+Moves portfolio snapshots from the one-document-per-day layout to compact series.
+
+Reads every portfolio_snapshots/{user_id}_{date} document and merges it into
+portfolio_series/{user_id}_{year} (see app.services.snapshot_series). Values
+already in a series win over legacy ones, so re-running is safe:
+
+    python scripts/migrate_snapshots.py --dry-run
+    python scripts/migrate_snapshots.py
+    python scripts/migrate_snapshots.py --delete   # also remove migrated documents
+
+A group's legacy documents are only deleted once all writes so far have
+succeeded.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from datetime import date
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.db.batch_writer import create_batch_writer
+from app.db.firestore import get_db
+from app.models.snapshot import PortfolioSnapshot
+from app.services.snapshot_series import load_series, series_ref
+
+LEGACY_COLLECTION = "portfolio_snapshots"
+
+
+async def migrate_users(db, writer, snapshots, dry_run: bool) -> int:
+    """
+    Merges one group of users' legacy snapshots into their series. Returns
+    the number of series documents written.
+    """
+    by_series = defaultdict(list)
+    for snapshot in snapshots:
+        day = date.fromisoformat(snapshot.date)
+        by_series[(snapshot.user_id, day.year)].append((day, snapshot.total_value))
+
+    existing = load_series(db, {user_id for user_id, _ in by_series}, {year for _, year in by_series})
+    for (user_id, year), points in by_series.items():
+        series = existing[(user_id, year)]
+        for day, value in points:
+            if day not in series:
+                series.set(day, value)
+        if not dry_run:
+            await writer.set(series_ref(db, user_id, year), series.to_doc())
+    return len(by_series)
+
+
+async def migrate(db, group_users: int = 1000, delete: bool = False, dry_run: bool = False) -> dict:
+    """
+    Streams legacy snapshots (ordered by document id, so each user's days
+    arrive together) and migrates them group_users users at a time.
+    """
+    writer = create_batch_writer(db)
+    stats = {"snapshots": 0, "invalid": 0, "series": 0, "deleted": 0}
+
+    async def finish_group(group, doc_ids):
+        stats["series"] += await migrate_users(db, writer, group, dry_run)
+        report = await writer.flush()
+        if delete and not dry_run and not report["failed_writes"]:
+            for doc_id in doc_ids:
+                await writer.delete(db.collection(LEGACY_COLLECTION).document(doc_id))
+            stats["deleted"] += len(doc_ids)
+
+    group, group_user_ids, doc_ids = [], set(), []
+    for doc in db.collection(LEGACY_COLLECTION).stream():
+        try:
+            snapshot = PortfolioSnapshot(**doc.to_dict())
+        except Exception as exc:
+            stats["invalid"] += 1
+            print(f"Skipping invalid snapshot {doc.id}: {exc}")
+            continue
+        if snapshot.user_id not in group_user_ids and len(group_user_ids) >= group_users:
+            await finish_group(group, doc_ids)
+            group, group_user_ids, doc_ids = [], set(), []
+        group.append(snapshot)
+        group_user_ids.add(snapshot.user_id)
+        doc_ids.append(doc.id)
+        stats["snapshots"] += 1
+    if group:
+        await finish_group(group, doc_ids)
+
+    stats["writes"] = await writer.flush()
+    if stats["writes"]["failed_writes"]:
+        print("Some writes failed; re-run the migration to retry them.")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--group-users", type=int, default=1000, help="Users merged per series read")
+    parser.add_argument("--delete", action="store_true", help="Delete legacy documents after migrating")
+    parser.add_argument("--dry-run", action="store_true", help="Read and merge without writing")
+    args = parser.parse_args()
+
+    stats = asyncio.run(migrate(get_db(), args.group_users, args.delete, args.dry_run))
+    print(
+        f"Migrated {stats['snapshots']} snapshots into {stats['series']} series "
+        f"({stats['invalid']} invalid, {stats['writes']['failed_writes']} failed writes, {stats['deleted']} deleted)"
+    )
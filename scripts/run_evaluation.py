@@ -0,0 +1,85 @@
+"""
+Runs a sharded, resumable portfolio evaluation outside the API process.
+
+    python scripts/run_evaluation.py all --shards 8 --workers 8
+
+starts (or resumes) today's run, evaluates its shards in a process pool and
+publishes the leaderboards once every shard is done. As a Cloud Run job, run
+`prepare` once, then `shard` as a job with --tasks equal to the shard count
+(CLOUD_RUN_TASK_INDEX picks the shard); each task publishes the leaderboards
+if it was the last shard to finish:
+
+    python scripts/run_evaluation.py prepare --shards 8
+    python scripts/run_evaluation.py shard
+    python scripts/run_evaluation.py publish
+
+A run is resumed from its checkpoints whenever one of these is re-run.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Add backend directory to python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.db.firestore import get_db
+from app.services import evaluation
+
+
+def latest_run(db, run_id=None) -> dict:
+    if run_id is None:
+        latest = db.collection("evaluation_runs").document(evaluation.LATEST_RUN).get()
+        if not latest.exists:
+            sys.exit("No evaluation run found; run `prepare` first.")
+        run_id = latest.to_dict()["run_id"]
+    run = evaluation.get_run(db, run_id)
+    if run is None:
+        sys.exit(f"Evaluation run {run_id} not found.")
+    return run
+
+
+def run_shard(run: dict, shard: int) -> dict:
+    # Each worker process needs its own client
+    return asyncio.run(evaluation.evaluate_shard(get_db(), run, shard))
+
+
+def report(checkpoint: dict):
+    state = "done" if checkpoint["done"] else f"stopped: {checkpoint.get('error')}"
+    print(
+        f"shard {checkpoint['shard']}: {checkpoint['portfolios']} portfolios, "
+        f"{checkpoint['snapshots']} snapshots, {state}"
+    )
+
+
+def main(args):
+    db = get_db()
+    if args.command in ("prepare", "all"):
+        run = asyncio.run(evaluation.start_evaluation_run(db, args.shards, args.run_id))
+        print(f"Run {run['run_id']}: {run['portfolios']} portfolios in {run['shard_count']} shards")
+    else:
+        run = latest_run(db, args.run_id)
+
+    if args.command == "shard":
+        shard = args.shard if args.shard is not None else int(os.getenv("CLOUD_RUN_TASK_INDEX", "0"))
+        report(asyncio.run(evaluation.evaluate_shard(db, run, shard)))
+    elif args.command == "all":
+        shards = range(run["shard_count"])
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for checkpoint in pool.map(run_shard, [run] * len(shards), shards):
+                report(checkpoint)
+
+    if args.command != "prepare":
+        published = asyncio.run(evaluation.publish_if_complete(db, run["run_id"]))
+        print("Leaderboards published." if published else "Run not complete yet; leaderboards not published.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["prepare", "shard", "publish", "all"])
+    parser.add_argument("--run-id", help="Run to work on (default: today's unpublished run, or the latest)")
+    parser.add_argument("--shards", type=int, help="Shards for a new run (default: EVALUATION_SHARDS)")
+    parser.add_argument("--shard", type=int, help="Shard to evaluate (default: CLOUD_RUN_TASK_INDEX)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    main(parser.parse_args())